@@ -0,0 +1,631 @@
+#-*- coding:utf-8 -*-
+
+import os
+import re
+import time
+import argparse
+
+import fieldSpec
+import get_findata
+import replay
+import utils
+import webClient
+
+# recorded reports checked when neither stock code nor -fixture is given
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "fixtures")
+# sources every report of the fixture must have
+SOURCE_LIST = ["stock_num", "fin_state", "inc_state", "cash_state"]
+# BeautifulSoup backends to compare, the first one is the reference
+PARSER_LIST = ["html.parser", "lxml"]
+# sections of a report compared for each page type
+PAGE_TYPE_LIST = ["stock_num", "fin_state", "fin_state_comment",
+                  "business_content"]
+FINSTATE_TARGET_LIST = ["curr_asset", "noncurr_asset", "total_asset",
+                        "curr_liabilities", "noncurr_liabilities",
+                        "total_liabilities", "total_equity", "minor_equity"]
+INCSTATE_TARGET_LIST = ["net_income", "minor_income", "major_income"]
+CASHSTATE_TARGET_LIST = ["deprec_cost"]
+# statement: (target of dart_crawl_target, CompanyData function reading it
+#             from the fields of the plan, None for cash_deprec_cost)
+STATEMENT_TARGET_DICT = {"fin_state": [("asset", "crawl_asset"),
+                                       ("liabilities", "crawl_liabilities"),
+                                       ("equity", "crawl_equity")],
+                         "inc_state": [("net_income", "crawl_net_income")],
+                         "cash_state": [("deprec_cost", None)]}
+
+def make_table_html(head_list, row_list, p_format=False):
+    """ This function writes a statement table in the html of DART pages
+        after utils.format_page_html (lines of a cell are joined by '\n')
+        @param head_list - list of <th> texts of each <tr> of <thead>
+        @param row_list - list of <td> texts of each <tr> of <tbody>
+        @param p_format - whether the texts are in <p> (new format)
+    """
+    cell_format = "<TD><P>%s</P></TD>" if p_format else "<TD>%s</TD>"
+    head_html = "".join("<TR>%s</TR>" % "".join("<TH>%s</TH>" % th
+                                                 for th in th_list)
+                        for th_list in head_list)
+    body_html = "".join("<TR>%s</TR>" % "".join(cell_format % td
+                                                for td in td_list)
+                        for td_list in row_list)
+    return ("<TABLE border=\"1\"><THEAD>%s</THEAD><TBODY>%s</TBODY></TABLE>"
+            % (head_html, body_html))
+
+# statement tables in the layouts the parse functions of CompanyData handle,
+# checked offline by check_statement_tables
+# (name, statement, unit, html of table)
+STATEMENT_TABLE_LIST = [
+    ("fin_state p rows", "fin_state", "백만", make_table_html(
+        [["과 목", "제 10 기", "제 9 기"]],
+        [["유동자산", "1,000", "900"], ["비유동자산", "2,000", "1,800"],
+         ["자산총계", "3,000", "2,700"], ["유동부채", "500", "400"],
+         ["비유동부채", "600", "500"], ["부채총계", "1,100", "900"],
+         ["자본총계", "1,900", "1,800"], ["비지배지분", "", "50"]],
+        p_format=True)),
+    ("fin_state td rows", "fin_state", "천", make_table_html(
+        [["과 목", "제 10 기", "제 9 기"]],
+        [["유동자산", "", "900"], ["비유동자산", "2,000", "1,800"],
+         ["자산총계", "2,900", "2,700"], ["유동부채", "500", "400"],
+         ["비유동부채", "600", "500"], ["부채총계", "1,100", "900"],
+         ["자본총계", "1,800", "1,800"], ["비지배지분", "(30)", "20"]])),
+    ("fin_state lines split name", "fin_state", "", make_table_html(
+        [["과 목", "제 10 기", "제 9 기"], ["금 액", "금 액", "금 액", "금 액"]],
+        [["자산\n유동자산\n비유동자산\n자산총계\n부채\n유동부채\n비유동부채"
+          "\n부채총계\n(당기순이익)이익잉여금\n자본총계",
+          "\n100\n200\n300\n\n50\n60\n110\n\n40\n190",
+          "\n90\n180\n270\n\n40\n50\n90\n\n30\n180"]])),
+    ("fin_state lines blank value", "fin_state", "", make_table_html(
+        [["과 목", "제 10 기", "제 9 기"], ["금 액", "금 액", "금 액", "금 액"]],
+        [["유동자산\n비유동자산\n자산총계\n유동부채\n비유동부채\n부채총계"
+          "\n자본총계",
+          "\n100\n200\n300\n50\n60\n110\n190",
+          "90\n180\n270\n40\n50\n90\n180"]])),
+    ("inc_state p rows", "inc_state", "백만", make_table_html(
+        [["과 목", "3개월", "누적", "3개월", "누적"]],
+        [["매출액", "1,000", "3,000", "900", "2,700"],
+         ["당기순이익", "30", "90", "20", "60"],
+         ["지배기업소유주지분", "25", "80", "15", "50"],
+         ["비지배지분", "5", "10", "5", "10"]], p_format=True)),
+    ("inc_state td rows", "inc_state", "", make_table_html(
+        [["과 목", "제 10 기", "제 9 기"]],
+        [["매출액", "1,000", "900"], ["영업손실", "(20)", "10"],
+         ["당기순손실", "", "40"]])),
+    ("inc_state lines more values", "inc_state", "", make_table_html(
+        [["과 목", "제 10 기", "제 9 기"], ["금 액", "금 액", "금 액", "금 액"]],
+        [["매출액\n영업이익\n당기순이익", "1,000\n100\n\n80",
+          "900\n90\n70"]])),
+    ("cash_state td rows th < td", "cash_state", "천", make_table_html(
+        [["과 목", "당 분 기", "누 적"]],
+        [["영업활동현금흐름", "", "", "", ""],
+         ["당기순이익", "50", "150", "40", "120"],
+         ["감가상각비", "100", "300", "90", "250"],
+         ["무형자산상각비", "10", "30", "", "25"],
+         ["투자활동현금흐름", "", "", "", ""]])),
+    ("cash_state td rows 13 td", "cash_state", "", make_table_html(
+        [["과 목", "당 기", "전 기"]],
+        [["영업활동현금흐름"] + [""] * 12,
+         ["당기순이익"] + ["50"] * 12,
+         ["감가상각비", "100", "", "70"] + ["60"] * 9,
+         ["투자활동현금흐름"] + [""] * 12,
+         ["재무활동현금흐름"] + [""] * 12])),
+    ("cash_state p rows", "cash_state", "백만", make_table_html(
+        [["과 목", "3개월", "누적", "3개월", "누적"]],
+        [["영업활동현금흐름", "", "", "", ""],
+         ["당기순이익", "30", "90", "20", "60"],
+         ["감가상각비", "10", "40", "10", "35"],
+         ["무형자산상각비", "", "", "2", "5"],
+         ["투자활동현금흐름", "", "", "", ""]], p_format=True)),
+    ("cash_state lines", "cash_state", "", make_table_html(
+        [["과 목", "당 기", "누 적"], ["금 액", "금 액"]],
+        [["영업활동현금흐름\n감가상각비\n무형자산상각비",
+          "\n10\n2", "\n40\n5"]])),
+]
+
+def call_parser(parse_func, *args):
+    """ This function calls parse_func and returns its output
+        Exceptions are returned as output so that they can be compared
+    """
+    try:
+        return parse_func(*args)
+    except Exception as e:
+        return "%s: %s" % (type(e).__name__, e)
+
+def parse_report(company_data, rcp_no):
+    """ This function parses the report with the current backend
+        @return - dictionary of parse function(target): output, including
+                  the report of dart_crawl_report, the units and text of the
+                  statements of dart_page_source and the fields read by the
+                  extraction plan
+    """
+    company_data.debug = False
+    result_dict = {"dart_crawl_report": call_parser(
+        company_data.dart_crawl_report, rcp_no)}
+    source_dict = company_data.dart_page_source(rcp_no)
+    company_data.reset_warning()
+    for statement in fieldSpec.STATEMENT_LIST:
+        source = source_dict[statement]
+        result_dict["dart_page_source(%s_unit)" % statement] = \
+            source_dict[statement + "_unit"]
+        result_dict["dart_page_source(%s)" % statement] = \
+            None if source is None else source.get_text()
+    plan = company_data.get_extraction_plan()
+    result_dict["extract"] = call_parser(lambda: plan.extract(
+        company_data.get_matrix_dict(source_dict, plan)))
+    source = source_dict["fin_state_comment"].get()
+    if source is not None:
+        result_dict["parse_finstate_comment(deprec_cost)"] = call_parser(
+            company_data.parse_finstate_comment, source, "deprec_cost")
+    source, unit = source_dict["finstate_summary"].get()
+    if source is not None:
+        result_dict["parse_finstate_summary(deprec_cost)"] = call_parser(
+            company_data.parse_finstate_summary, source, "deprec_cost")
+    source = source_dict["stock_num"]
+    if source is not None:
+        result_dict["parse_stock_num"] = call_parser(company_data.parse_stock_num,
+                                                     source)
+    source = source_dict["fin_state"]
+    if source is not None:
+        for target in FINSTATE_TARGET_LIST:
+            result_dict["parse_finstate(%s)" % target] = call_parser(
+                company_data.parse_finstate, source, target)
+    source = source_dict["inc_state"]
+    if source is not None:
+        for target in INCSTATE_TARGET_LIST:
+            result_dict["parse_incstate(%s)" % target] = call_parser(
+                company_data.parse_incstate, source, target)
+    source = source_dict["cash_state"]
+    if source is not None:
+        for target in CASHSTATE_TARGET_LIST:
+            result_dict["parse_cashstate(%s)" % target] = call_parser(
+                company_data.parse_cashstate, source, target)
+    return result_dict
+
+def check_parser_conformance(company_data, rcp_no_list, parser_list=PARSER_LIST):
+    """ This function checks that parse functions give identical outputs
+        with every backend in parser_list
+        @return - list of (rcp_no, parse function, outputs of each backend)
+                  for outputs that differ
+    """
+    default_parser = utils.HTML_PARSER
+    mismatch_list = []
+    try:
+        for rcp_no in rcp_no_list:
+            result_list = []
+            for parser in parser_list:
+                utils.set_html_parser(parser)
+                result_list.append(parse_report(company_data, rcp_no))
+            for key, output in result_list[0].items():
+                output_list = [result.get(key) for result in result_list]
+                if any(other != output for other in output_list[1:]):
+                    mismatch_list.append((rcp_no, key, output_list))
+    finally:
+        utils.set_html_parser(default_parser)
+    return mismatch_list
+
+def check_price_page(company_data, parser_list=PARSER_LIST):
+    """ This function checks that the first page of daily prices is parsed
+        into identical non-empty rows with every backend in parser_list
+        @return - list of outputs of each backend if they differ or are empty
+    """
+    page_html = webClient.fetch(company_data.PRICE_URL + company_data.stock_code)
+    default_parser = utils.HTML_PARSER
+    output_list = []
+    try:
+        for parser in parser_list:
+            utils.set_html_parser(parser)
+            output_list.append(call_parser(company_data.parse_price_page,
+                                           page_html))
+    finally:
+        utils.set_html_parser(default_parser)
+    if len(output_list[0]) == 0 or \
+       any(output != output_list[0] for output in output_list[1:]):
+        return [output_list]
+    return []
+
+def check_report_sources(company_data, rcp_no_list, source_list=SOURCE_LIST):
+    """ This function checks that every source of source_list is found
+        in the reports, so that no check passes on a missing source
+        @return - list of (rcp_no, source) not found
+    """
+    mismatch_list = []
+    for rcp_no in rcp_no_list:
+        source_dict = company_data.dart_page_source(rcp_no)
+        mismatch_list += [(rcp_no, source) for source in source_list
+                          if source_dict[source] is None]
+    return mismatch_list
+
+def compare_statement_targets(company_data, rcp_no, source_dict, field_dict,
+                              statement_list=STATEMENT_TARGET_DICT):
+    """ This function compares the targets read by the extraction plan with
+        the ones parsed by dart_crawl_target
+        @param statement_list - statements of source_dict to compare
+        @return - list of (rcp_no, target, parsed output, plan output)
+                  for outputs that differ
+    """
+    mismatch_list = []
+    for statement in statement_list:
+        for target, crawl_func in STATEMENT_TARGET_DICT[statement]:
+            if crawl_func is None:
+                output = field_dict["cash_deprec_cost"]
+            else:
+                output = getattr(company_data, crawl_func)(field_dict)
+            company_data.reset_warning()
+            parsed = call_parser(company_data.dart_crawl_target, rcp_no,
+                                 source_dict[statement],
+                                 source_dict[statement + "_unit"], target)
+            # dart_crawl_target gives strings, the plan gives int
+            if isinstance(output, tuple):
+                output = tuple(None if value is None else str(value)
+                               for value in output)
+                if parsed is None:
+                    parsed = (None, None, None)
+            elif output is not None:
+                output = str(output)
+            if parsed != output:
+                mismatch_list.append((rcp_no, target, parsed, output))
+    return mismatch_list
+
+def check_statement_matrix(company_data, rcp_no_list):
+    """ This function checks that the targets read by the extraction plan of
+        CompanyData are the same as the ones parsed by dart_crawl_target
+        @return - list of (rcp_no, target, parsed output, plan output)
+                  for outputs that differ
+    """
+    company_data.debug = False
+    plan = company_data.get_extraction_plan()
+    mismatch_list = []
+    for rcp_no in rcp_no_list:
+        source_dict = company_data.dart_page_source(rcp_no)
+        company_data.reset_warning()
+        field_dict = plan.extract(company_data.get_matrix_dict(source_dict,
+                                                               plan))
+        mismatch_list += compare_statement_targets(company_data, rcp_no,
+                                                   source_dict, field_dict)
+    return mismatch_list
+
+def check_statement_tables(company_data, table_list=STATEMENT_TABLE_LIST):
+    """ This function runs check_statement_matrix on the statement tables of
+        table_list without network, one table at a time
+        @param table_list - list of (name, statement, unit, html of table)
+        @return - list of (table name, target, parsed output, plan output)
+                  for outputs that differ
+    """
+    company_data.debug = False
+    plan = company_data.get_extraction_plan()
+    mismatch_list = []
+    for name, statement, unit, table_html in table_list:
+        source_dict = {statement: utils.make_soup(table_html).find("table"),
+                       statement + "_unit": unit}
+        company_data.reset_warning()
+        matrix = company_data.get_statement_matrix(source_dict[statement], unit)
+        field_dict = plan.extract({statement: matrix})
+        mismatch_list += compare_statement_targets(company_data, name,
+                                                   source_dict, field_dict,
+                                                   [statement])
+    return mismatch_list
+
+def get_page_html(company_data, rcp_no, page_type):
+    """ This function returns the formatted html of page_type of the report
+        @return - html in string, None if the page does not exist
+    """
+    report_index = company_data.get_report_index(rcp_no)
+    if page_type == "fin_state":
+        url_name_list = ["conn_fin_state", "gen_fin_state", "unconn_fin_state",
+                         "gen_fin_state2"]
+    elif page_type == "fin_state_comment":
+        url_name_list = ["conn_fin_state_comment", "unconn_fin_state_comment"]
+    else:
+        url_name_list = [page_type]
+    for url_name in url_name_list:
+        url = report_index.get_url(url_name)
+        if url is not None:
+            return utils.format_page_html(webClient.fetch(url)).decode('utf-8')
+    return None
+
+def legacy_format_page_html(page_html):
+    """ This function is utils.format_page_html before it was merged into
+        a single pass, kept as the reference of check_format_page_html
+    """
+    page_html = re.sub(r'\s*&nbsp;\s*','', page_html)
+    page_html = re.sub(r'<BR/>', '\n', page_html)
+    page_html = re.sub(r'<SPAN.*?>', '', page_html)
+    page_html = re.sub(r'</SPAN>', '', page_html)
+    return page_html
+
+# html snippets in the markup of DART pages that format_page_html handles,
+# checked offline by check_format_samples
+FORMAT_SAMPLE_LIST = [
+    "<P>자산 &nbsp; 총계</P>",
+    "&nbsp;<BR/>&nbsp;",
+    "유동자산<BR/>비유동자산<BR/><BR/>자산총계",
+    "<TD>\t&nbsp;\n\r\x0b\x0c1,000</TD>",
+    "<SPAN style=\"width:10px\">&nbsp;</SPAN>부채",
+    "<SPAN &nbsp; class=a>x</SPAN><SPAN class=b \u3000&nbsp;\u3000>y</SPAN>",
+    "<SPAN a<BR/>b>c</SPAN>",
+    "<SPAN\nclass=a>x</SPAN>",
+    "<SPAN class=\"자산\">1</SPAN></SPAN><SPAN>",
+    # tags and entity in other cases are not removed
+    "<br/><Br/><BR><BR /><span>x</span><Span>y</SPAN>&NBSP;&Nbsp;",
+    # multibyte whitespace around &nbsp;, and characters sharing their
+    # leading utf-8 bytes that are not whitespace
+    "\u3000&nbsp;\u3000\xa0&nbsp;\u2003\u205f\u1680&nbsp;\u2028\u2029",
+    "\u200b&nbsp;\u200b\u3001&nbsp;\u3001\xa1&nbsp;\x84\u2060&nbsp;",
+    "\x1c\x1d\x1e\x1f\x85&nbsp;\u202f\u200a&nbsp;\u2009",
+    "",
+]
+
+def check_format_samples(sample_list=FORMAT_SAMPLE_LIST):
+    """ This function checks that utils.format_page_html gives the same
+        output as legacy_format_page_html byte for byte on the samples and on
+        &nbsp; surrounded by each whitespace character of \\s, for both
+        str and utf-8 bytes input, without network
+        @return - list of samples whose outputs differ
+    """
+    # surrogates cannot be encoded in utf-8
+    space_list = [chr(code) for code in range(0x110000)
+                  if not 0xd800 <= code <= 0xdfff
+                  and re.match(r'\s', chr(code))]
+    sample_list = list(sample_list) + ["a%s&nbsp;%sb<SPAN%s&nbsp;>c" %
+                                       (space, space, space)
+                                       for space in space_list]
+    mismatch_list = []
+    for sample in sample_list:
+        expected = legacy_format_page_html(sample)
+        if utils.format_page_html(sample) != expected or \
+           utils.format_page_html(sample.encode('utf-8')) != \
+           expected.encode('utf-8'):
+            mismatch_list.append(sample)
+    return mismatch_list
+
+def check_format_page_html(company_data, rcp_no_list):
+    """ This function checks that utils.format_page_html gives the same
+        output as legacy_format_page_html byte for byte, both for str and
+        for utf-8 bytes input, on every section page of the reports
+        @return - list of urls whose outputs differ
+    """
+    mismatch_list = []
+    for rcp_no in rcp_no_list:
+        report_index = company_data.get_report_index(rcp_no)
+        url_list = [report_index.get_url(target) for target in utils.page_pattern]
+        for url in sorted(set(url for url in url_list if url is not None)):
+            content = webClient.fetch(url)
+            expected = legacy_format_page_html(content.decode('utf-8'))
+            if utils.format_page_html(content.decode('utf-8')) != expected or \
+               utils.format_page_html(content) != expected.encode('utf-8'):
+                mismatch_list.append(url)
+    return mismatch_list
+
+def benchmark_format_page_html(company_data, rcp_no_list, repeat=10):
+    """ This function compares legacy_format_page_html on decoded pages
+        with utils.format_page_html on the bytes of pages
+        @return - dictionary of method: seconds per report
+    """
+    content_list = []
+    for rcp_no in rcp_no_list:
+        report_index = company_data.get_report_index(rcp_no)
+        url_list = [report_index.get_url(target) for target in utils.page_pattern]
+        for url in set(url for url in url_list if url is not None):
+            content_list.append(webClient.fetch(url))
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for content in content_list:
+            legacy_format_page_html(content.decode('utf-8'))
+    legacy_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for content in content_list:
+            utils.format_page_html(content)
+    single_time = time.perf_counter() - start_time
+    report_num = repeat * len(rcp_no_list)
+    return {"four_pass": legacy_time / report_num,
+            "single_pass": single_time / report_num}
+
+def benchmark_parser(company_data, rcp_no_list, parser_list=PARSER_LIST,
+                     repeat=3):
+    """ This function measures the time to parse each page type
+        @return - dictionary of (page_type, parser): seconds per page
+    """
+    time_dict = {}
+    for page_type in PAGE_TYPE_LIST:
+        page_list = [get_page_html(company_data, rcp_no, page_type)
+                     for rcp_no in rcp_no_list]
+        page_list = [page_html for page_html in page_list
+                     if page_html is not None]
+        if len(page_list) == 0:
+            continue
+        for parser in parser_list:
+            start_time = time.perf_counter()
+            for _ in range(repeat):
+                for page_html in page_list:
+                    utils.make_soup(page_html, parser)
+            elapsed = time.perf_counter() - start_time
+            time_dict[(page_type, parser)] = elapsed / (repeat * len(page_list))
+    return time_dict
+
+def benchmark_reports(company_data, rcp_no_list, repeat=3):
+    """ This function measures dart_page_source, each parse function and
+        the whole crawl of a report (dart_crawl_report)
+        @return - dictionary of name: seconds per report
+    """
+    time_dict = {}
+    def add_time(name, elapsed):
+        time_dict[name] = time_dict.get(name, 0) + elapsed
+
+    company_data.debug = False
+    for _ in range(repeat):
+        for rcp_no in rcp_no_list:
+            start_time = time.perf_counter()
+            source_dict = company_data.dart_page_source(rcp_no)
+            add_time("dart_page_source", time.perf_counter() - start_time)
+            company_data.reset_warning()
+            parse_list = [("parse_stock_num", company_data.parse_stock_num,
+                           source_dict["stock_num"], [None])]
+            parse_list.append(("parse_finstate", company_data.parse_finstate,
+                               source_dict["fin_state"], FINSTATE_TARGET_LIST))
+            parse_list.append(("parse_incstate", company_data.parse_incstate,
+                               source_dict["inc_state"], INCSTATE_TARGET_LIST))
+            parse_list.append(("parse_cashstate", company_data.parse_cashstate,
+                               source_dict["cash_state"], CASHSTATE_TARGET_LIST))
+            parse_list.append(("parse_finstate_comment",
+                               company_data.parse_finstate_comment,
+                               source_dict["fin_state_comment"].get(),
+                               ["deprec_cost"]))
+            parse_list.append(("parse_finstate_summary",
+                               company_data.parse_finstate_summary,
+                               source_dict["finstate_summary"].get()[0],
+                               ["deprec_cost"]))
+            for name, parse_func, source, target_list in parse_list:
+                if source is None:
+                    continue
+                start_time = time.perf_counter()
+                for target in target_list:
+                    if target is None:
+                        call_parser(parse_func, source)
+                    else:
+                        call_parser(parse_func, source, target)
+                add_time(name, time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            company_data.dart_crawl_report(rcp_no)
+            add_time("dart_crawl_report", time.perf_counter() - start_time)
+    for name in time_dict:
+        time_dict[name] /= repeat * len(rcp_no_list)
+    return time_dict
+
+def benchmark_target_pattern(company_data, rcp_no_list, repeat=10):
+    """ This function compares classifying the rows of statement tables by
+        trying each pattern of target_pattern_list and by the merged patterns
+        of utils.target_pattern
+        @return - dictionary of method: seconds per report
+    """
+    target_list = FINSTATE_TARGET_LIST + INCSTATE_TARGET_LIST \
+                  + CASHSTATE_TARGET_LIST
+    text_list_list = []
+    for rcp_no in rcp_no_list:
+        source_dict = company_data.dart_page_source(rcp_no)
+        text_list = []
+        for source_name in ["fin_state", "inc_state", "cash_state"]:
+            if source_dict[source_name] is not None:
+                text_list += [element.string for element
+                              in source_dict[source_name].find_all(["td", "p"])
+                              if element.string is not None]
+        text_list_list.append(text_list)
+
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for text_list in text_list_list:
+            for target in target_list:
+                for pattern in utils.target_pattern_list[target]:
+                    for text in text_list:
+                        re.search(pattern, text)
+    pattern_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for text_list in text_list_list:
+            for target in target_list:
+                target_pattern = utils.target_pattern[target]
+                for text in text_list:
+                    target_pattern.match_idx_list(text)
+    merged_time = time.perf_counter() - start_time
+    report_num = repeat * len(rcp_no_list)
+    return {"pattern_list": pattern_time / report_num,
+            "merged_pattern": merged_time / report_num}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark html parsing.")
+    parser.add_argument('stock_code', nargs='?',
+                        help="stock code to crawl, the reports of -fixture "
+                             "are replayed if not set")
+    parser.add_argument('-rcp', nargs='+', default=None,
+                        help="rcp_no's to use, the first 4 reports if not set")
+    parser.add_argument('-repeat', type=int, default=3)
+    parser.add_argument('-record', help="directory to record the reports to")
+    parser.add_argument('-fixture', help="directory of recorded reports to "
+                                         "replay without network, "
+                                         "fixtures next to benchmark.py "
+                                         "if stock code is not set")
+    args = vars(parser.parse_args())
+
+    # the checks without network run first
+    mismatch_list = check_format_samples()
+    for sample in mismatch_list:
+        print("mismatch - format_page_html sample %r" % sample)
+    print("format_page_html sample conformance: %d mismatches"
+          % len(mismatch_list))
+    mismatch_num = len(mismatch_list)
+
+    mismatch_list = check_statement_tables(get_findata.CompanyData(
+        args["stock_code"] or "", rcp_no_list=[], fin_period_list=[]))
+    for name, target, parsed, output in mismatch_list:
+        print("mismatch - table %s %s: parsed %s, plan %s" % (name, target,
+                                                             parsed, output))
+    print("statement table conformance: %d mismatches" % len(mismatch_list))
+    mismatch_num += len(mismatch_list)
+    if args["stock_code"] is None and args["fixture"] is None:
+        args["fixture"] = FIXTURE_DIR
+
+    if args["fixture"] is not None:
+        # a missing page would only skip the checks reading it
+        try:
+            replay.check_fixture(args["fixture"])
+        except AssertionError as e:
+            parser.error("fixture is incomplete - %s" % e)
+        replay.install_replay(args["fixture"])
+        company_data = replay.load_company(args["fixture"])
+    else:
+        company_data = get_findata.CompanyData(args["stock_code"])
+    rcp_no_list = args["rcp"] or company_data.rcp_no_list[:4]
+    if args["record"] is not None:
+        replay.record_reports(company_data, rcp_no_list, args["record"])
+
+    mismatch_list = check_report_sources(company_data, rcp_no_list)
+    for rcp_no, source in mismatch_list:
+        print("mismatch - rcp %s has no %s" % (rcp_no, source))
+    print("report source check: %d mismatches" % len(mismatch_list))
+    mismatch_num += len(mismatch_list)
+
+    mismatch_list = check_format_page_html(company_data, rcp_no_list)
+    for url in mismatch_list:
+        print("mismatch - format_page_html %s" % url)
+    print("format_page_html conformance: %d mismatches" % len(mismatch_list))
+    mismatch_num += len(mismatch_list)
+    time_dict = benchmark_format_page_html(company_data, rcp_no_list)
+    for name, elapsed in time_dict.items():
+        print("format_page_html %-12s %.6fs per report" % (name, elapsed))
+
+    mismatch_list = check_statement_matrix(company_data, rcp_no_list)
+    for rcp_no, target, parsed, output in mismatch_list:
+        print("mismatch - rcp %s %s: parsed %s, plan %s" % (rcp_no, target,
+                                                           parsed, output))
+    print("statement matrix conformance: %d mismatches" % len(mismatch_list))
+    mismatch_num += len(mismatch_list)
+
+    mismatch_list = check_parser_conformance(company_data, rcp_no_list)
+    for rcp_no, key, output_list in mismatch_list:
+        print("mismatch - rcp %s %s: %s" % (rcp_no, key, output_list))
+    print("parser conformance: %d mismatches" % len(mismatch_list))
+    mismatch_num += len(mismatch_list)
+
+    mismatch_list = check_price_page(company_data)
+    for output_list in mismatch_list:
+        print("mismatch - price page: %s" % output_list)
+    print("price page conformance: %d mismatches" % len(mismatch_list))
+    mismatch_num += len(mismatch_list)
+
+    time_dict = benchmark_parser(company_data, rcp_no_list,
+                                 repeat=args["repeat"])
+    for (page_type, parser_name), elapsed in time_dict.items():
+        print("%-20s %-12s %.4fs per page" % (page_type, parser_name, elapsed))
+
+    time_dict = benchmark_target_pattern(company_data, rcp_no_list)
+    for name, elapsed in time_dict.items():
+        print("row classification by %-16s %.6fs per report" % (name, elapsed))
+
+    time_dict = benchmark_reports(company_data, rcp_no_list,
+                                  repeat=args["repeat"])
+    for name, elapsed in time_dict.items():
+        print("%-24s %.4fs per report" % (name, elapsed))
+    if mismatch_num != 0:
+        parser.exit(1, "error - %d conformance mismatches\n" % mismatch_num)
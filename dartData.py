@@ -1,11 +1,12 @@
 #-*- coding:utf-8 -*-
 
-import requests
 import json
 import datetime
 import os
 import re
 
+import webClient
+
 def get_rcp_period(rcp_nm_list):
     """ This function obtains the period rcp belongs to using 
         the input rcp_nm_list
@@ -37,8 +38,8 @@ def search_dart(stock_code, start_yr=2000, data_target = 1):
         @param start_yr - starting year of data
         @param data_target - 1 for data every quarter (분기/반기/사업보고서), 
                              2 for only year data (사업보고서)
-        TODO:
-        - implement code for data_target == 2
+        @return - (list of rcp_no, list of periods "YYYY-quarter")
+                  periods of 사업보고서 are "YYYY-4" for both data_target
     """
     now = datetime.datetime.now()
     curr_yr, curr_month = now.year, now.month
@@ -65,9 +66,9 @@ def search_dart(stock_code, start_yr=2000, data_target = 1):
             "fin_rpt": "Y",
             "page_set": str(data_num),
         }
-        response = requests.get("http://dart.fss.or.kr/api/search.json?auth="
-                                + os.environ["DART_API_KEY"], params=params)
-        content = response.content
+        content = webClient.fetch("http://dart.fss.or.kr/api/search.json?auth="
+                                  + os.environ["DART_API_KEY"], params=params,
+                                  ttl=webClient.SEARCH_TTL)
         result_list = json.loads(content.decode('UTF-8'))["list"]
         rcp_no_list += list(map(lambda x: x['rcp_no'], result_list)) # 접수번호
         rcp_dt_list += list(map(lambda x: x['rcp_dt'], result_list)) # 공시접수일자
@@ -0,0 +1,310 @@
+#-*- coding:utf-8 -*-
+
+import re
+
+import numpy as np
+
+import utils
+
+class TableScanner:
+    """ This class indexes the tables of a DART financial statement page
+        The tables of the parsed page are listed once, and the grouping of
+        tables and the name of each table group are found once for every
+        statement read from the page
+        Tables stay in the parsed page, so their neighbours e.g. the <p>
+        before a table are the same as in the page
+    """
+
+    unit_pattern = re.compile(r"\(\s*?단위")
+
+    def __init__(self, source):
+        """ Initializes TableScanner object
+            @param source - BeautifulSoup object of the page formatted by
+                            utils.format_page_html
+        """
+        self.source = source
+        self.table_list = source.findAll("table")
+        self.text_list = [None] * len(self.table_list)
+        self.layout = None
+        self.group_name_list = None
+
+    @property
+    def table_num(self):
+        """ number of tables in the page """
+        return len(self.table_list)
+
+    def get_text(self, idx):
+        """ This function returns the text of idx-th table """
+        if self.text_list[idx] is None:
+            self.text_list[idx] = self.table_list[idx].text
+        return self.text_list[idx]
+
+    def is_bordered(self, idx):
+        """ This function checks whether idx-th table has border="1" """
+        attrs = self.table_list[idx].attrs
+        return "border" in attrs and attrs["border"] == '1'
+
+    def remove(self, idx):
+        """ This function removes idx-th table from the index
+            (the table is not removed from the page)
+        """
+        del self.table_list[idx]
+        del self.text_list[idx]
+        self.layout, self.group_name_list = None, None
+
+    def get_table(self, idx):
+        """ This function returns idx-th table as BeautifulSoup object """
+        return self.table_list[idx]
+
+    def get_layout(self):
+        """ This function obtains how tables are grouped in the page
+            @return table_group_cnt - number of tables in a table group
+                                      i.e. one dataset
+                    table_head_idx - index of table head (includes '단위')
+                                     in a table group
+                    table_main_idx - index of main table in a table group
+                    table_name_idx - index of table containing the table name
+                                     table_head_idx if None
+        """
+        if self.layout is not None:
+            return self.layout
+        unit_table_idx_list = []
+        for i in range(self.table_num):
+            if re.search(self.unit_pattern, self.get_text(i)) is not None:
+                unit_table_idx_list.append(i)
+
+        if len(unit_table_idx_list) >= 2:
+            table_group_cnt = unit_table_idx_list[1] - unit_table_idx_list[0]
+            group_cnt_diff = []
+            for i in range(len(unit_table_idx_list)-1):
+                group_cnt_diff.append(unit_table_idx_list[i+1]
+                                      - unit_table_idx_list[i])
+            if table_group_cnt == 2: # each data set is composed of 2 tables
+                table_head_idx, table_main_idx = 0, 1
+                table_name_idx = table_head_idx
+            elif table_group_cnt == 3: # each data set is composed of 3 tables
+                table_head_idx, table_main_idx = 1, 2
+                table_name_idx = 0
+                if group_cnt_diff[:4] == [3, 3, 2, 2]: # case for 20000515000288
+                    table_head_idx, table_main_idx = 0, 1
+                    table_name_idx = table_head_idx
+            elif table_group_cnt == 4:
+                table_head_idx, table_main_idx = 0, 1
+                table_name_idx = table_head_idx
+        else: # if unit has not been found
+            """ TODO: add case when len(table_list) % 6 first """
+            if self.table_num % 2 == 0:
+                table_group_cnt, table_head_idx, table_main_idx = 2, 0, 1
+                table_name_idx = table_head_idx
+            elif self.table_num % 3 == 0:
+                table_group_cnt, table_head_idx, table_main_idx = 3, 1, 2
+                table_name_idx = 0
+        self.layout = (table_group_cnt, table_head_idx, table_main_idx,
+                       table_name_idx)
+        return self.layout
+
+    def get_prev_p_text_list(self, idx):
+        """ This function returns the text of the <p> right before idx-th
+            table at the same level and the two <p>'s before that <p>
+            The list stops at the first <p> that is not found
+        """
+        p_text_list = []
+        name_p = self.table_list[idx].find_previous_sibling('p')
+        while name_p is not None and len(p_text_list) < 3:
+            p_text_list.append(name_p.text)
+            name_p = name_p.find_previous('p')
+        return p_text_list
+
+    def get_group_name_list(self):
+        """ This function returns the texts naming each table group
+            i.e. text of the name table and the <p>'s before it
+        """
+        if self.group_name_list is None:
+            table_group_cnt, _, _, table_name_idx = self.get_layout()
+            self.group_name_list = []
+            for idx in range(int(self.table_num/table_group_cnt)):
+                name_idx = table_group_cnt*idx + table_name_idx
+                self.group_name_list.append([self.get_text(name_idx)]
+                                        + self.get_prev_p_text_list(name_idx))
+        return self.group_name_list
+
+    def find_group(self, pattern=None):
+        """ This function finds the index of table group whose name contains
+            the input pattern, the first group is not searched
+            @return - index of the table group, 0 if not found
+        """
+        if pattern is None:
+            return 0
+        for idx, name_list in enumerate(self.get_group_name_list()):
+            if idx == 0:
+                continue
+            for name in name_list:
+                if re.search(pattern, name) is not None:
+                    return idx
+        return 0
+
+    def get_statement(self, pattern=None):
+        """ This function returns the tables of the statement named pattern
+            @param pattern - pattern of the statement name
+                             the first statement if None
+            @return - (table head containing unit, main table)
+        """
+        table_group_cnt, table_head_idx, table_main_idx, _ = self.get_layout()
+        table_idx = self.find_group(pattern)
+        head_table = self.get_table(table_group_cnt*table_idx + table_head_idx)
+        main_table = self.get_table(table_group_cnt*table_idx + table_main_idx)
+        return head_table, main_table
+
+
+class StatementMatrix:
+    """ This class converts a statement table into row labels and an int64
+        value matrix once, so that every target of the statement is a lookup
+        Each line of the cells joined by <BR/> in old formats is a row
+        Values are signed ('(', '△' or '-' for negative) and scaled by the
+        unit of the statement, invalid cells are False in mask
+    """
+
+    acc_pattern = re.compile(r'누\s*?적')
+    value_pattern = re.compile(r'^(?P<sign>[-(△]*)(?P<num>\d+)\)?$')
+    # label line written with the item following it, e.g. "(당기순이익)이익잉여금"
+    split_label_pattern = re.compile(r'(?P<pre_item>\(.*?순이익.*?\))(?P<item>\w+)')
+
+    def __init__(self, table, unit=""):
+        """ Initializes StatementMatrix object
+            @param table - BeautifulSoup object of the statement table
+            @param unit - unit of the values in utils.unit_convert e.g. "백만"
+        """
+        scale = 10 ** len(utils.unit_convert[unit or ""])
+        tr_list = table.find_all("tr")
+        self.tr_num = len(tr_list)
+        table_head = table.find("thead")
+        self.head_th_num = (0 if table_head is None
+                            else len(table_head.find_all("th")))
+        self.label_list = []
+        # layout of the <tr> of each row, which decides the columns to read
+        self.td_num_list = [] # number of <td> in the <tr>
+        self.p_format_list = [] # whether the <tr> is in new format
+        self.line_num_list = [] # number of lines of each <td> of the <tr>
+        self.group_list = [] # (first row, end row) of the rows of the <tr>
+        cell_row_list = []
+        for tr in tr_list:
+            td_list = tr.find_all("td")
+            if len(td_list) == 0:
+                continue
+            first_row = len(self.label_list)
+            p_format = td_list[0].find("p") is not None
+            if p_format:
+                # new format, one row for each <tr>
+                self.label_list.append(td_list[0].get_text())
+                cell_row_list.append([td.get_text() for td in td_list[1:]])
+                line_num_list = [1] * len(td_list)
+            else:
+                # old format, lines of a cell are rows
+                line_list_list = [self.get_string(td).split('\n')
+                                  for td in td_list]
+                line_num_list = [len(line_list) for line_list in line_list_list]
+                label_list = line_list_list[0]
+                if len(td_list) > 1 and len(label_list) < line_num_list[1]:
+                    label_list = self.split_label(label_list)
+                # value lines without label are kept as rows labeled ""
+                for line_idx in range(max(line_num_list + [len(label_list)])):
+                    self.label_list.append(label_list[line_idx]
+                                           if line_idx < len(label_list) else "")
+                    cell_row_list.append([line_list[line_idx]
+                                          if line_idx < len(line_list) else ""
+                                          for line_list in line_list_list[1:]])
+            for _ in range(first_row, len(self.label_list)):
+                self.td_num_list.append(len(td_list))
+                self.p_format_list.append(p_format)
+                self.line_num_list.append(line_num_list)
+                self.group_list.append((first_row, len(self.label_list)))
+        column_num = max([len(cell_list) for cell_list in cell_row_list] + [0])
+        # column 0 of value is the first column after the label (td index 1)
+        self.value = np.zeros((len(cell_row_list), column_num), dtype=np.int64)
+        self.mask = np.zeros(self.value.shape, dtype=bool)
+        for row, cell_list in enumerate(cell_row_list):
+            for column, cell in enumerate(cell_list):
+                value = self.parse_value(cell)
+                if value is not None:
+                    self.value[row, column] = value * scale
+                    self.mask[row, column] = True
+
+        # whether the table has a column of values accumulated in the year
+        if table_head is not None:
+            head_text = table_head.get_text()
+        else:
+            head_text = " ".join(tr.get_text() for tr in tr_list
+                                 if tr.find("td") is None or
+                                    tr.find("th") is not None)
+        self.acc_col_exist = self.acc_pattern.search(head_text) is not None
+
+    @classmethod
+    def split_label(cls, label_list):
+        """ This function splits the label lines holding two items, which
+            make a cell have fewer label lines than value lines
+            @return - list of label lines
+        """
+        split_list = []
+        for label in label_list:
+            label_match = cls.split_label_pattern.search(label)
+            if label_match is None:
+                split_list.append(label)
+            else:
+                split_list += [label_match.group("pre_item"),
+                               label_match.group("item")]
+        return split_list
+
+    @staticmethod
+    def get_string(td):
+        """ This function returns the string of td (its text if td has tags) """
+        return td.string if td.string is not None else td.get_text()
+
+    @classmethod
+    def parse_value(cls, cell):
+        """ This function converts the text of a cell into int
+            @return - int value, None if the cell is not a number
+        """
+        value_match = cls.value_pattern.match(utils.num_format(cell))
+        if value_match is None:
+            return None
+        value = int(value_match.group("num"))
+        return -value if value_match.group("sign") else value
+
+    @property
+    def curr_column(self):
+        """ td index of the values for the current period """
+        return 2 if self.acc_col_exist else 1
+
+    def classify(self, target_pattern):
+        """ This function classifies the rows by the patterns of
+            utils.TargetPattern in one pass over the row labels
+            @return - list whose i-th element is the list of rows whose label
+                      contains i-th pattern
+        """
+        row_list_list = [[] for _ in target_pattern.pattern_list]
+        for row, label in enumerate(self.label_list):
+            for pattern_idx in target_pattern.match_idx_list(label):
+                row_list_list[pattern_idx].append(row)
+        return row_list_list
+
+    def read_value(self, row, column_list=(1,), default=None):
+        """ This function reads the value of the row
+            @param column_list - td indices to read in order, the first valid
+                                 value is returned
+            @param default - value returned when the row has no valid value
+            @return - int value
+        """
+        for column in column_list:
+            if 0 < column <= self.value.shape[1] and self.mask[row, column-1]:
+                return int(self.value[row, column-1])
+        return default
+
+    def line_num_diff(self, row, column):
+        """ This function compares the number of lines of the cell of the row
+            in the column with the label cell of its <tr>
+            @return - number of value lines minus number of label lines
+        """
+        line_num_list = self.line_num_list[row]
+        if column >= len(line_num_list):
+            return 0
+        return line_num_list[column] - line_num_list[0]
@@ -0,0 +1,242 @@
+#-*- coding:utf-8 -*-
+
+import utils
+
+# statements of the fin_state page a field can be read from
+STATEMENT_LIST = ["fin_state", "inc_state", "cash_state"]
+
+class FieldSpec:
+    """ This class declares how one financial item is read from a statement
+        A new item is added by declaring its FieldSpec in FIELD_SPEC_LIST
+    """
+
+    def __init__(self, name, statement, pattern_list, column="first",
+                 sign="signed", aggregate="first", blank=None,
+                 negative_pattern_list=(), last_line=False):
+        """ Initializes FieldSpec object
+            @param name - name of the field
+            @param statement - statement in STATEMENT_LIST
+            @param pattern_list - patterns of the row label in order of
+                                  priority, the rows of the first pattern
+                                  found in the table are used
+            @param column - "first" for the first column after the label
+                            (balance sheet), "curr" for the current period,
+                            the accumulated column if exists (income and
+                            cash statements), for rows in new format
+                            (other layouts are read as the parse function
+                            of the statement reads them)
+            @param sign - "signed" to keep the sign of the table,
+                          "abs" for items that are never negative
+            @param aggregate - "first" for the value of the first row,
+                               "sum" for the sum of every row
+            @param blank - value of a row found without a valid value
+            @param negative_pattern_list - patterns meaning a negative value
+                                           e.g. '당기순손실'
+            @param last_line - whether the value is the last line of the cell
+                               when the cell has more lines than its label
+        """
+        assert statement in STATEMENT_LIST
+        assert column in ("first", "curr") and sign in ("signed", "abs")
+        assert aggregate in ("first", "sum")
+        self.name = name
+        self.statement = statement
+        self.pattern_list = list(pattern_list)
+        self.column = column
+        self.sign = sign
+        self.aggregate = aggregate
+        self.blank = blank
+        self.negative_pattern_list = list(negative_pattern_list)
+        self.last_line = last_line
+
+    def get_column_list(self, matrix, row):
+        """ This function returns the td indices to read the row from, by the
+            layout of its <tr> as CompanyData.parse_finstate, parse_incstate
+            and parse_cashstate read the statement
+            @return - tuple of td indices, the first valid value is read
+        """
+        td_num = matrix.td_num_list[row]
+        head_th_num = matrix.head_th_num
+        if self.statement == "cash_state":
+            column = matrix.curr_column
+            if matrix.tr_num > 4 and not matrix.p_format_list[row] and \
+               head_th_num < td_num:
+                # the columns of the current period are not the ones in
+                # <thead>, the values are in the middle of the row
+                if td_num == 13:
+                    start = 3
+                else:
+                    start = 1 + int((td_num - 1) / 2) * (column - 1)
+                return tuple(range(start, start + column))
+            return (column,)
+        if matrix.p_format_list[row]:
+            if self.column == "curr":
+                return (matrix.curr_column,)
+            # new formats of balance sheet have 3 or 4 columns
+            return (1,) if td_num in range(3, 5) else ()
+        if head_th_num <= td_num or head_th_num == 0:
+            # each cell is one row, the first column with value is read
+            if self.statement == "fin_state":
+                return (1, 2)
+            return tuple(range(1, td_num))
+        if self.statement == "inc_state":
+            return (matrix.curr_column,)
+        # lines of a cell are rows in balance sheet
+        if td_num in range(3, 6) or td_num == 2:
+            return (1,)
+        elif td_num == 7: # some columns may be empty
+            return tuple(range(1, 7))
+        return ()
+
+    def read_row(self, matrix, row):
+        """ This function reads the value of the row, falling back to the
+            other lines of its cell when the lines of the label and value
+            cells do not match
+            @return - value in int, None if not found
+        """
+        column_list = self.get_column_list(matrix, row)
+        if len(column_list) == 0:
+            return None
+        column = column_list[0]
+        first_row, end_row = matrix.group_list[row]
+        line_num_diff = matrix.line_num_diff(row, column)
+        if self.last_line and line_num_diff > 0:
+            # blank lines were added to the value cell, the field is the
+            # last line with value
+            for line_row in range(end_row - 1, first_row - 1, -1):
+                value = matrix.read_value(line_row, (column,))
+                if value is not None:
+                    return value
+            return None
+        value = matrix.read_value(row, column_list)
+        if value is None and self.statement == "fin_state" and \
+           line_num_diff != 0 and row + 1 < end_row:
+            # the lines of the label and value cells do not match, the value
+            # is in the next line
+            value = matrix.read_value(row + 1, column_list)
+        return value
+
+    def read(self, matrix, pattern_idx, row_list):
+        """ This function reads the value of the field from the rows found
+            @param pattern_idx - index of the pattern that found row_list
+            @return - value in int, None if not found
+        """
+        if len(row_list) == 0:
+            return None
+        if self.aggregate == "sum":
+            value = 0
+            for row in row_list:
+                row_value = self.read_row(matrix, row)
+                if row_value is not None:
+                    value += row_value
+        else:
+            value = self.read_row(matrix, row_list[0])
+            if value is None:
+                value = self.blank
+        if value is None:
+            return None
+        if self.sign == "abs":
+            value = abs(value)
+        if self.pattern_list[pattern_idx] in self.negative_pattern_list:
+            value = -abs(value)
+        return value
+
+
+FIELD_SPEC_LIST = [
+    FieldSpec("curr_asset", "fin_state",
+              utils.target_pattern_list["curr_asset"], sign="abs"),
+    FieldSpec("noncurr_asset", "fin_state",
+              utils.target_pattern_list["noncurr_asset"], sign="abs"),
+    FieldSpec("total_asset", "fin_state",
+              utils.target_pattern_list["total_asset"], sign="abs"),
+    FieldSpec("curr_liabilities", "fin_state",
+              utils.target_pattern_list["curr_liabilities"], sign="abs"),
+    FieldSpec("noncurr_liabilities", "fin_state",
+              utils.target_pattern_list["noncurr_liabilities"], sign="abs"),
+    FieldSpec("total_liabilities", "fin_state",
+              utils.target_pattern_list["total_liabilities"], sign="abs"),
+    FieldSpec("total_equity", "fin_state",
+              utils.target_pattern_list["total_equity"]),
+    FieldSpec("minor_equity", "fin_state",
+              utils.target_pattern_list["minor_equity"], blank=0),
+    FieldSpec("total_income", "inc_state",
+              utils.target_pattern_list["net_income"], column="curr",
+              negative_pattern_list=[r"당\s*?기\s*?순\s*?손\s*?실"],
+              last_line=True),
+    FieldSpec("minor_income", "inc_state",
+              utils.target_pattern_list["minor_income"], column="curr",
+              blank=0),
+    FieldSpec("major_income", "inc_state",
+              utils.target_pattern_list["major_income"], column="curr",
+              blank=0),
+    FieldSpec("revenue", "inc_state",
+              [r"^\s*?매\s*?출\s*?액", r"^\s*?영\s*?업\s*?수\s*?익",
+               r"^\s*?수\s*?익\s*?\(\s*?매\s*?출\s*?액\s*?\)"],
+              column="curr"),
+    FieldSpec("operating_income", "inc_state",
+              [r"영\s*?업\s*?이\s*?익", r"영\s*?업\s*?손\s*?실"],
+              column="curr",
+              negative_pattern_list=[r"영\s*?업\s*?손\s*?실"]),
+    FieldSpec("cash_deprec_cost", "cash_state",
+              utils.target_pattern_list["deprec_cost"], column="curr",
+              aggregate="sum"),
+    FieldSpec("capex", "cash_state",
+              [r"유\s*?형\s*?자\s*?산\s*?의\s*?취\s*?득"], column="curr",
+              sign="abs", aggregate="sum"),
+]
+FIELD_SPEC_DICT = {spec.name: spec for spec in FIELD_SPEC_LIST}
+
+class ExtractionPlan:
+    """ This class compiles the FieldSpecs of the requested fields into one
+        merged pattern per statement, so that every field of a statement is
+        found in a single pass over the row labels of its StatementMatrix
+    """
+
+    def __init__(self, field_list=None):
+        """ Initializes ExtractionPlan object
+            @param field_list - names of the fields in FIELD_SPEC_DICT,
+                                every field if None
+        """
+        if field_list is None:
+            field_list = [spec.name for spec in FIELD_SPEC_LIST]
+        self.spec_list = [FIELD_SPEC_DICT[field] for field in field_list]
+        # statement: (list of (spec, index of its first pattern),
+        #             merged TargetPattern of every pattern)
+        self.plan_dict = {}
+        for statement in STATEMENT_LIST:
+            spec_list = [spec for spec in self.spec_list
+                         if spec.statement == statement]
+            if len(spec_list) == 0:
+                continue
+            offset_list, pattern_list = [], []
+            for spec in spec_list:
+                offset_list.append((spec, len(pattern_list)))
+                pattern_list += spec.pattern_list
+            self.plan_dict[statement] = (offset_list,
+                                         utils.TargetPattern(pattern_list))
+
+    @property
+    def statement_list(self):
+        """ statements needed by the plan """
+        return list(self.plan_dict)
+
+    def extract(self, matrix_dict):
+        """ This function reads every field of the plan
+            @param matrix_dict - dictionary of statement: StatementMatrix
+                                 (None if the statement is not found)
+            @return - dictionary of field name: value in int (None if the
+                      field is not found)
+        """
+        value_dict = {spec.name: None for spec in self.spec_list}
+        for statement, (offset_list, target_pattern) in self.plan_dict.items():
+            matrix = matrix_dict.get(statement)
+            if matrix is None:
+                continue
+            row_list_list = matrix.classify(target_pattern)
+            for spec, offset in offset_list:
+                for pattern_idx in range(len(spec.pattern_list)):
+                    row_list = row_list_list[offset + pattern_idx]
+                    if len(row_list) != 0:
+                        value_dict[spec.name] = spec.read(matrix, pattern_idx,
+                                                          row_list)
+                        break
+        return value_dict
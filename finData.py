@@ -1,236 +1,381 @@
 #-*- coding:utf-8 -*-
 
-import csv
-import os
+import numpy as np
+
+import finStore
+
+# columns of raw fin data in the order of raw_fin_data table
+RAW_COLUMN_LIST = finStore.get_column_list("raw_fin_data")
+# raw columns stored as float64, the others (except period) are int64
+FLOAT_COLUMN_LIST = [column for column, column_type
+                     in finStore.TABLE_SCHEMA["raw_fin_data"]
+                     if column_type == "float"]
+# key of fin_dict (crawled data) for each raw column
+FIN_DICT_KEY = {"price_mean": "stock_price_mean",
+                "price_median": "stock_price_median",
+                "price_max": "stock_price_max", "price_min": "stock_price_min",
+                "price_stdev": "stock_price_stdev", "stock_num": "stock_num",
+                "curr_asset": "curr_asset", "noncurr_asset": "noncurr_asset",
+                "total_asset": "total_asset", "curr_liab": "curr_liabilities",
+                "noncurr_liab": "noncurr_liabilities",
+                "total_liab": "total_liabilities", "equity": "equity",
+                "net_income": "net_income", "deprec_cost": "deprec_cost"}
+# financial ratios in the order of fin_data table
+RATIO_LIST = finStore.get_column_list("fin_data")[1:]
+# raw columns each ratio is calculated from (see get_ratio_columns)
+RATIO_COLUMN_DICT = {
+    "per": ["stock_num", "price_mean", "net_income"],
+    "pbr": ["stock_num", "price_mean", "equity"],
+    "roe": ["net_income", "equity"],
+    "curr_ratio": ["curr_asset", "curr_liab"],
+    "debt_equity": ["total_liab", "equity"],
+    "pcr": ["stock_num", "price_mean", "net_income", "deprec_cost"],
+    "peg": ["stock_num", "price_mean", "net_income"],
+}
+ROUND_PT = 4
+OUTPUT_FORMAT = "{0:.4f}"
+# number of quarters summed for trailing net income
+NET_INCOME_TIMESPAN = 4
+
+def get_raw_column_list(field_list):
+    """ This function obtains the raw columns needed for the fields
+        @param field_list - ratio names (RATIO_LIST) or raw column names
+        @return - list of raw column names in the order of RAW_COLUMN_LIST
+    """
+    column_set = set()
+    for field in field_list:
+        if field in RATIO_COLUMN_DICT:
+            column_set.update(RATIO_COLUMN_DICT[field])
+        elif field in RAW_COLUMN_LIST[1:]:
+            column_set.add(field)
+        else:
+            raise ValueError("unknown field %s" % field)
+    return [column for column in RAW_COLUMN_LIST[1:] if column in column_set]
+
+def accumulate_value(period, value, prev_period, prev_acc_value):
+    """ This function converts the value for the quarter back to the value
+        accumulated from the first quarter of the year
+        i.e. reverses the adjustment of net_income and deprec_cost done in
+        FinancialData for quarterly data
+        @param prev_period - period right before the input period
+        @param prev_acc_value - accumulated value of prev_period
+        @return - accumulated value, "" if it cannot be calculated
+    """
+    if period[-1] == '1':
+        return value
+    yr, quarter = period.split('-')
+    if prev_period != "%s-%d" % (yr, int(quarter) - 1):
+        return ""
+    try:
+        return str(int(prev_acc_value) + int(value))
+    except (ValueError, TypeError):
+        return ""
+
+def format_ratio(value_array, mask):
+    """ This function converts the ratio array into output strings
+        i.e. the same strings as FinancialRatio, "" for invalid values
+    """
+    return [OUTPUT_FORMAT.format(round(value, ROUND_PT)) if valid else ""
+            for value, valid in zip(value_array.tolist(), mask.tolist())]
+
+def divide(numer, numer_mask, denom, denom_mask):
+    """ This function divides the arrays in float as FinancialRatio does
+        @return - (array of quotients, mask of valid quotients)
+                  the quotient is invalid if either input is invalid or
+                  the denominator is 0
+    """
+    mask = numer_mask & denom_mask & (denom != 0)
+    quotient = np.zeros(mask.shape, dtype=np.float64)
+    np.divide(numer.astype(np.float64), denom.astype(np.float64),
+              out=quotient, where=mask)
+    return quotient, mask
+
+def prefix_sum(value_array):
+    """ This function calculates the cumulative sums along the last axis
+        with 0 in front, so that the sum of [start, end) of each series is
+        prefix[..., end] - prefix[..., start]
+        int64 sums stay exact even if the cumulative sum overflows, as long
+        as the sum of each window fits in int64
+    """
+    zero = np.zeros(value_array.shape[:-1] + (1,), dtype=value_array.dtype)
+    return np.concatenate([zero, np.cumsum(value_array, axis=-1,
+                                           dtype=value_array.dtype)], axis=-1)
+
+def window_sum(prefix, start_idx, end_idx):
+    """ This function returns the sums of [start_idx, end_idx) along the last
+        axis from the output of prefix_sum
+    """
+    with np.errstate(over='ignore'):
+        return prefix[..., end_idx] - prefix[..., start_idx]
+
+def trailing_sum(value_array, mask, timespan=NET_INCOME_TIMESPAN):
+    """ This function sums the values of the last timespan periods along
+        the last axis, the first value fills the periods before the first
+        Prefix sums are calculated once so that it takes linear time
+        regardless of timespan
+        @return - (array of sums, mask of valid sums)
+    """
+    period_idx = np.arange(value_array.shape[-1])
+    start_idx = np.maximum(period_idx - timespan + 1, 0)
+    value_prefix = prefix_sum(np.where(mask, value_array, 0))
+    invalid_prefix = prefix_sum((~mask).astype(np.int64))
+    total = window_sum(value_prefix, start_idx, period_idx + 1)
+    total_mask = window_sum(invalid_prefix, start_idx, period_idx + 1) == 0
+    # number of periods before the first period in the window
+    fill_num = timespan - (period_idx + 1 - start_idx)
+    total = total + fill_num * value_array[..., :1]
+    total_mask &= mask[..., :1] | (fill_num == 0)
+    return total, total_mask
+
+def eps_growth_mean(net_income, net_income_mask, stock_num, stock_num_mask,
+                    timespan=NET_INCOME_TIMESPAN):
+    """ This function calculates the mean growth (%) of EPS over the last
+        timespan periods along the last axis, as FinancialRatio.get_PEG
+        EPS of the past periods are divided by the current stock_num, so the
+        growths are summed per offset rather than from prefix sums to keep
+        the same floating point result
+        @return - (array of mean growth, mask of valid values)
+    """
+    period_idx = np.arange(net_income.shape[-1])
+    start_idx = np.maximum(period_idx - timespan, 0)
+    growth_num = period_idx - start_idx
+    # every net income in the window is valid and none but the last is 0
+    invalid_prefix = prefix_sum((~net_income_mask).astype(np.int64))
+    zero_prefix = prefix_sum((net_income_mask & (net_income == 0)).astype(np.int64))
+    mask = stock_num_mask & (stock_num != 0) & (growth_num > 0) \
+           & (window_sum(invalid_prefix, start_idx, period_idx + 1) == 0) \
+           & (window_sum(zero_prefix, start_idx, period_idx) == 0)
+    stock_num = np.where(mask, stock_num, 1).astype(np.float64)
+    prev_eps = net_income[..., start_idx] / stock_num
+    growth_sum = np.zeros(mask.shape, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # growths are summed in the order of periods to match sum()
+        for offset in range(1, timespan+1):
+            used = offset <= growth_num
+            eps = net_income[..., np.minimum(start_idx + offset, period_idx)] \
+                  / stock_num
+            growth = ((eps / prev_eps) - 1) * 100
+            growth_sum = np.where(used, growth_sum + growth, growth_sum)
+            prev_eps = eps
+    growth_mean = np.zeros(mask.shape, dtype=np.float64)
+    np.divide(growth_sum, growth_num, out=growth_mean, where=mask)
+    return growth_mean, mask
+
+def read_raw_columns(stock_code, file_format="csv", column_list=None,
+                     data_target=1):
+    """ This function reads raw_fin_data table of the company into column
+        arrays
+        @param column_list - raw columns to read except period, every column
+                             if None
+        @param data_target - 1 for quarterly data, 2 for yearly data
+                             (raw_fin_data_yr table)
+        @return - (list of periods, dictionary of column: value array,
+                   dictionary of column: valid mask)
+    """
+    if column_list is None:
+        column_list = RAW_COLUMN_LIST[1:]
+    column_dict, mask_dict = finStore.read_table(stock_code,
+                                finStore.get_table_name("raw_fin_data",
+                                                        data_target),
+                                file_format=file_format,
+                                column_list=["period"] + column_list)
+    period_list = list(column_dict.pop("period"))
+    del mask_dict["period"]
+    return period_list, column_dict, mask_dict
+
+def get_ratio_columns(column_dict, mask_dict, data_target=1):
+    """ This function calculates the financial ratios of all periods at once
+        The columns may have any leading shape, periods are the last axis
+        @param column_dict - dictionary of raw column name: value array
+        @param mask_dict - dictionary of raw column name: valid mask
+        @param data_target - 1 for quarterly data, where PER and ROE use the
+                             net income of the last 4 quarters
+                             2 for yearly data, where they use the net income
+                             of the year and PEG uses the growth of 4 years
+        @return - dictionary of ratio name: (value array, valid mask)
+    """
+    col, mask = column_dict, mask_dict
+    market_cap = col["stock_num"] * col["price_mean"]
+    market_cap_mask = mask["stock_num"] & mask["price_mean"]
+    if data_target == 1:
+        # sum of net_incomes for 4 quarters
+        net_income_acc, net_income_acc_mask = trailing_sum(col["net_income"],
+                                                           mask["net_income"])
+    else:
+        net_income_acc, net_income_acc_mask = col["net_income"], mask["net_income"]
+    ratio_dict = {}
+    ratio_dict["per"] = divide(market_cap, market_cap_mask,
+                               net_income_acc, net_income_acc_mask)
+    ratio_dict["pbr"] = divide(market_cap, market_cap_mask,
+                               col["equity"], mask["equity"])
+    ratio_dict["roe"] = divide(net_income_acc, net_income_acc_mask,
+                               col["equity"], mask["equity"])
+    ratio_dict["curr_ratio"] = divide(col["curr_asset"], mask["curr_asset"],
+                                      col["curr_liab"], mask["curr_liab"])
+    ratio_dict["debt_equity"] = divide(col["total_liab"], mask["total_liab"],
+                                       col["equity"], mask["equity"])
+    # PCR uses cash flow (net income + depreciation cost) of the period
+    cps = divide(col["net_income"] + col["deprec_cost"],
+                 mask["net_income"] & mask["deprec_cost"],
+                 col["stock_num"], mask["stock_num"])
+    ratio_dict["pcr"] = divide(col["price_mean"], mask["price_mean"], *cps)
+    growth_mean = eps_growth_mean(col["net_income"], mask["net_income"],
+                                  col["stock_num"], mask["stock_num"])
+    ratio_dict["peg"] = divide(*ratio_dict["per"], *growth_mean)
+    return ratio_dict
 
 class FinancialData():
-    def __init__(self, stock_code, fin_dict, data_target=1, read_csv=False):
+    def __init__(self, stock_code, fin_dict, data_target=1, read_csv=False,
+                 file_format="csv"):
         """ Initializes financial data
+            Each raw column is kept as int64 (float64 for price_stdev) array
+            in column_dict with its valid mask in mask_dict
             @param fin_dict - dictionary of financial data
                              data_name: list of values
                              None if read_csv is True
             @param data_target - 1 for data every quarter (분기/반기/사업보고서), 
                                  2 for only year data (사업보고서)
+            @param read_csv - reads the stored raw_fin_data table
+                              instead of fin_dict
+            @param file_format - format of the tables (finStore.FORMAT_LIST)
         """
         self.stock_code = stock_code
         self.data_target = data_target
-        # set directories
-        HOME_DIR = os.path.join(os.path.expanduser("~"), "workspace")
-        DATA_DIR = os.path.join(HOME_DIR, "data")
-        self.COMPANY_DIR = os.path.join(DATA_DIR, self.stock_code)
-        if not os.path.isdir(self.COMPANY_DIR):
-            os.makedirs(self.COMPANY_DIR)
+        self.file_format = file_format
+        # raw_fin_data and fin_data tables, "_yr" tables for yearly data
+        self.raw_table_name = finStore.get_table_name("raw_fin_data",
+                                                      data_target)
+        self.table_name = finStore.get_table_name("fin_data", data_target)
+        # company directory, created by finStore when a table is written
+        # in a file format
+        self.COMPANY_DIR = finStore.get_company_dir(self.stock_code)
+        self.column_dict, self.mask_dict = {}, {}
         
         if read_csv:
-            """ TODO: fix the manual order of elements to a scalable form """
-            filename = "raw_fin_data_%s.csv" % self.stock_code
-            assert os.path.isfile(os.path.join(self.COMPANY_DIR, filename))
-            self.period_list, self.stock_price_mean_list = [], []
-            self.stock_price_median_list, self.stock_price_stdev_list = [], []
-            self.stock_price_max_list, self.stock_price_min_list = [], []
-            self.stock_num_list, self.curr_asset_list = [], []
-            self.noncurr_asset_list, self.total_asset_list = [], []
-            self.curr_liab_list, self.noncurr_liab_list = [], []
-            self.total_liab_list, self.equity_list = [], []
-            self.net_income_list, self.deprec_cost_list = [], []
-            print("Reading raw_fin_data_%s.csv" % self.stock_code)
-            with open(os.path.join(self.COMPANY_DIR, filename),
-                      'r', newline='') as raw_fin_data_file:
-                fr = csv.reader(raw_fin_data_file, delimiter=',', quotechar='|')
-                next(fr)
-                for row in fr:
-                    self.period_list.append(row[0])
-                    self.stock_price_mean_list.append(row[1])
-                    self.stock_price_median_list.append(row[2])
-                    self.stock_price_max_list.append(row[3])
-                    self.stock_price_min_list.append(row[4])
-                    self.stock_price_stdev_list.append(row[5])
-                    self.stock_num_list.append(row[6])
-                    self.curr_asset_list.append(row[7])
-                    self.noncurr_asset_list.append(row[8])
-                    self.total_asset_list.append(row[9])
-                    self.curr_liab_list.append(row[10])
-                    self.noncurr_liab_list.append(row[11])
-                    self.total_liab_list.append(row[12])
-                    self.equity_list.append(row[13])
-                    self.net_income_list.append(row[14])
-                    self.deprec_cost_list.append(row[15])
+            assert finStore.table_exists(self.stock_code, self.raw_table_name,
+                                         self.file_format)
+            print("Reading %s_%s" % (self.raw_table_name, self.stock_code))
+            self.period_list, self.column_dict, self.mask_dict = \
+                read_raw_columns(self.stock_code, self.file_format,
+                                 data_target=self.data_target)
                     
         else:
             self.period_list = fin_dict["period"] # list of periods for rcp_no
-            self.curr_asset_list = fin_dict["curr_asset"]
-            self.noncurr_asset_list = fin_dict["noncurr_asset"]
-            self.total_asset_list = fin_dict["total_asset"]
-            self.curr_liab_list = fin_dict["curr_liabilities"]
-            self.noncurr_liab_list = fin_dict["noncurr_liabilities"]
-            self.total_liab_list = fin_dict["total_liabilities"]
-            self.equity_list = fin_dict["equity"]
-            self.stock_num_list = fin_dict["stock_num"]
-            self.stock_price_mean_list = fin_dict["stock_price_mean"]
-            self.stock_price_median_list = fin_dict["stock_price_median"]
-            self.stock_price_max_list = fin_dict["stock_price_max"]
-            self.stock_price_min_list = fin_dict["stock_price_min"]
-            self.stock_price_stdev_list = fin_dict["stock_price_stdev"]
-            # income, deprec_cost is accumulated so they need to be adjusted
-            net_income_list_temp = fin_dict["net_income"]
-            deprec_cost_list_temp = fin_dict["deprec_cost"]
-            self.net_income_list, self.deprec_cost_list = [], []
+            for column in RAW_COLUMN_LIST[1:]:
+                self.set_column(column, fin_dict[FIN_DICT_KEY[column]])
             
             if self.data_target == 1:
+                # income, deprec_cost is accumulated so they need to be adjusted
+                self.split_accumulated("net_income", fin_dict["net_income"])
+                self.split_accumulated("deprec_cost", fin_dict["deprec_cost"])
+                deprec_cost = self.column_dict["deprec_cost"]
+                deprec_cost_mask = self.mask_dict["deprec_cost"]
+                deprec_cost_list_temp = fin_dict["deprec_cost"]
+                # case when quaterly depreciation cost is blank in table
                 for idx, period in enumerate(self.period_list):
-                    # for net_income, every value is accumulated so they need
-                    # to be processed as the value for the quarter
-                    if period[-1] == '1':
-                        self.net_income_list.append(net_income_list_temp[idx])
-                        self.deprec_cost_list.append(deprec_cost_list_temp[idx])
-                    else:
-                        # if net_income or deprec_cost has not been crawled or
-                        # are in wrong format, set to "" and print warning
-                        try:
-                            quarter_income = str(int(net_income_list_temp[idx])
-                                             - int(net_income_list_temp[idx-1]))
-                        except ValueError: # cannot be converted to int
-                            print("warning : net_income - inappropriate period \
-                                   %s data" % period)
-                            quarter_income = ""
-                        except TypeError:
-                            print("warning : net_income - period %s data \
-                                   is None" % period)
-                            quarter_income = ""
-                        self.net_income_list.append(quarter_income)
-                        
+                    if period[-1] != '4' or idx < 2:
+                        continue
+                    # if deprec_cost exists only in yearly report
+                    if deprec_cost_mask[idx-1] and deprec_cost[idx-1] == 0 and \
+                       deprec_cost_mask[idx-2] and deprec_cost[idx-2] == 0:
                         try:
-                            quarter_deprec_cost = str(int(deprec_cost_list_temp[idx])
-                                                - int(deprec_cost_list_temp[idx-1]))
-                        except ValueError:
-                            print("warning : deprec_cost - inappropriate \
-                                   period %s data" % period)
-                            quarter_deprec_cost = ""
-                        except TypeError:
-                            print("warning : deprec_cost - period %s \
-                                   data is None" % period)
-                            quarter_deprec_cost = ""
-                        
-                        # case when quaterly depreciation cost is blank in table
-                        if period[-1] == '4':
-                            # if deprec_cost exists only in yearly report
-                            if idx >= 2:
-                                if self.deprec_cost_list[idx-1] == '0' and self.deprec_cost_list[idx-2] == '0':
-                                    try:
-                                        quarter_deprec_cost = int(float(deprec_cost_list_temp[idx])/4)
-                                    except ValueError: # deprec_cost_list_temp[idx] is string
-                                        print(deprec_cost_list_temp[idx])
-                                        quarter_deprec_cost = 0
-                                    self.deprec_cost_list[idx-3] = quarter_deprec_cost
-                                    self.deprec_cost_list[idx-2] = quarter_deprec_cost
-                                    self.deprec_cost_list[idx-1] = quarter_deprec_cost
-                                    print("warning : deprec_cost - quaterly \
-                                    data does not exist for yr %s" % period[:4])
-
-                        # if the first period is not "yr-1" i.e. first quarter
-                        if idx == 0:
-                            # divide the accumulated deprec_cost by quarter_num
-                            self.quarter_deprec_cost = int(float(deprec_cost_list_temp[idx])/int(period[-1]))
-
-                        self.deprec_cost_list.append(quarter_deprec_cost)
+                            quarter_deprec_cost = int(float(deprec_cost_list_temp[idx])/4)
+                        except (ValueError, TypeError): # deprec_cost_list_temp[idx] is string
+                            print(deprec_cost_list_temp[idx])
+                            quarter_deprec_cost = 0
+                        deprec_cost[max(idx-3, 0):idx+1] = quarter_deprec_cost
+                        deprec_cost_mask[max(idx-3, 0):idx+1] = True
+                        print("warning : deprec_cost - quaterly \
+                        data does not exist for yr %s" % period[:4])
+                # if the first period is not "yr-1" i.e. first quarter
+                if len(self.period_list) > 0 and self.period_list[0][-1] != '1':
+                    # divide the accumulated deprec_cost by quarter_num
+                    try:
+                        self.quarter_deprec_cost = int(float(deprec_cost_list_temp[0])
+                                                       / int(self.period_list[0][-1]))
+                    except (ValueError, TypeError):
+                        self.quarter_deprec_cost = None
                         
             elif self.data_target == 2:
-                """ TODO: implement data processing for yearly data """
+                # net_income and deprec_cost of 사업보고서 are already the
+                # values for the whole year, so they are used as crawled
                 pass
-            # check whether the length of lists are all the same
-            list_lens = [len(self.stock_price_mean_list),
-                         len(self.stock_price_median_list),
-                         len(self.stock_price_max_list),
-                         len(self.stock_price_stdev_list),
-                         len(self.stock_price_stdev_list),
-                         len(self.stock_num_list), len(self.curr_asset_list),
-                         len(self.noncurr_asset_list),
-                         len(self.total_asset_list),
-                         len(self.curr_liab_list), len(self.noncurr_liab_list),
-                         len(self.total_liab_list), len(self.equity_list),
-                         len(self.net_income_list), len(self.deprec_cost_list)]
-            assert all(list_len == len(self.period_list) for list_len in list_lens)
+        # check whether the length of columns are all the same
+        assert all(len(self.column_dict[column]) == len(self.period_list)
+                   for column in RAW_COLUMN_LIST[1:])
+
+    def set_column(self, column, value_list):
+        """ This function sets the raw column from the list of values """
+        dtype = np.float64 if column in FLOAT_COLUMN_LIST else np.int64
+        self.column_dict[column], self.mask_dict[column] = finStore.to_column(
+            value_list, dtype)
+
+    def get_column_list(self, column):
+        """ This function returns the raw column as list of strings """
+        return finStore.column_to_str(self.column_dict[column],
+                                      self.mask_dict[column],
+                                      finStore.FLOAT_FORMAT.get(column,
+                                          finStore.DEFAULT_FLOAT_FORMAT))
+
+    def split_accumulated(self, column, value_list):
+        """ This function converts the values of column accumulated from the
+            first quarter of the year into the values for each quarter
+            @param value_list - list of accumulated values in string
+        """
+        acc_value, acc_mask = self.column_dict[column], self.mask_dict[column]
+        is_first = np.array([period[-1] == '1' for period in self.period_list],
+                            dtype=bool)
+        # value right before each period (the last one for the first period)
+        prev_value, prev_mask = np.roll(acc_value, 1), np.roll(acc_mask, 1)
+        self.column_dict[column] = np.where(is_first, acc_value,
+                                            acc_value - prev_value)
+        self.mask_dict[column] = acc_mask & (is_first | prev_mask)
+        # if values have not been crawled or are in wrong format, print warning
+        for idx in np.flatnonzero(~self.mask_dict[column] & ~is_first):
+            if value_list[idx] is None or value_list[idx-1] is None:
+                print("warning : %s - period %s data is None"
+                      % (column, self.period_list[idx]))
+            else:
+                print("warning : %s - inappropriate period %s data"
+                      % (column, self.period_list[idx]))
         
     def write_raw_fin_data(self):
         """ This function writes raw fin data (before processing)
-            to csv file """
-        filename = "raw_fin_data_%s.csv" % self.stock_code
-        print("Writing %s" % filename)
-        with open(os.path.join(self.COMPANY_DIR, filename),
-                  'w', newline='') as data_file:
-            wr = csv.writer(data_file, delimiter=',',
-                            quotechar='|', quoting=csv.QUOTE_MINIMAL)
-            header_row = ["period", "price_mean", "price_median", "price_max",
-                          "price_min", "price_stdev",
-                          "stock_num", "curr_asset",
-                          "noncurr_asset", "total_asset", "curr_liab",
-                          "noncurr_liab", "total_liab", "equity",
-                          "net_income", "deprec_cost"]
-            wr.writerow(header_row)              
-            raw_fin_data = zip(self.period_list, self.stock_price_mean_list,
-                               self.stock_price_median_list, self.stock_price_max_list,
-                               self.stock_price_min_list, self.stock_price_stdev_list,
-                               self.stock_num_list, self.curr_asset_list,
-                               self.noncurr_asset_list, self.total_asset_list,
-                               self.curr_liab_list, self.noncurr_liab_list,
-                               self.total_liab_list, self.equity_list,
-                               self.net_income_list, self.deprec_cost_list)
-            for row in raw_fin_data:
-                wr.writerow(row)
+            to raw_fin_data table (raw_fin_data_yr for yearly data) """
+        print("Writing %s_%s" % (self.raw_table_name, self.stock_code))
+        column_dict = dict(self.column_dict, period=self.period_list)
+        finStore.write_table(self.stock_code, self.raw_table_name, column_dict,
+                             self.mask_dict, file_format=self.file_format)
                 
     def get_fin_data(self):
-        """ This function processes raw data to financial ratios """
-        self.per_list, self.pbr_list, self.roe_list = [], [], []
-        self.peg_list, self.pcr_list, self.curr_ratio_list = [], [], []
-        self.debt_equity_list = []
-        
-        net_income_timespan = 4
-        # get list of net_incomes of 4 quarters
-        for idx in range(len(self.period_list)):
-            if idx <= net_income_timespan:
-                net_income_temp_list = self.net_income_list[:idx+1]
-            else:
-                net_income_temp_list = self.net_income_list[idx-4:idx+1]
-            fin_value_dict = {
-                "stock_price": self.stock_price_mean_list[idx],
-                "stock_num": self.stock_num_list[idx],
-                "curr_asset": self.curr_asset_list[idx],
-                "noncurr_asset": self.noncurr_asset_list[idx],
-                "total_asset": self.total_asset_list[idx],
-                "curr_liab": self.curr_liab_list[idx],
-                "noncurr_liab": self.noncurr_liab_list[idx],
-                "total_liab": self.total_liab_list[idx],
-                "equity": self.equity_list[idx],
-                "net_income": self.net_income_list[idx],
-                "deprec_cost": self.deprec_cost_list[idx],
-                "net_income_list": net_income_temp_list,
-            }
-            
-            fin_ratio = FinancialRatio(fin_value_dict,
-                                       data_target=self.data_target)
-            self.per_list.append(fin_ratio.get_PER())
-            self.pbr_list.append(fin_ratio.get_PBR())
-            self.roe_list.append(fin_ratio.get_ROE(acc=True))
-            self.curr_ratio_list.append(fin_ratio.get_CURR_RATIO())
-            self.debt_equity_list.append(fin_ratio.get_DEBT_EQUITY())
-            self.pcr_list.append(fin_ratio.get_PCR())
-            self.peg_list.append(fin_ratio.get_PEG())
+        """ This function processes raw data to financial ratios
+            Ratios of all periods are calculated at once as column operations,
+            a ratio is "" if its inputs are missing or its denominator is 0
+        """
+        self.ratio_dict = get_ratio_columns(self.column_dict, self.mask_dict,
+                                            data_target=self.data_target)
+        self.per_list = format_ratio(*self.ratio_dict["per"])
+        self.pbr_list = format_ratio(*self.ratio_dict["pbr"])
+        self.roe_list = format_ratio(*self.ratio_dict["roe"])
+        self.curr_ratio_list = format_ratio(*self.ratio_dict["curr_ratio"])
+        self.debt_equity_list = format_ratio(*self.ratio_dict["debt_equity"])
+        self.pcr_list = format_ratio(*self.ratio_dict["pcr"])
+        self.peg_list = format_ratio(*self.ratio_dict["peg"])
             
     def write_fin_data(self):
+        """ This function writes financial ratios to fin_data table
+            (fin_data_yr for yearly data)
+            Ratios are rounded as in the output strings
+        """
         print("Writing fin data")
-        filename = "fin_data_%s.csv" % self.stock_code
-        with open(os.path.join(self.COMPANY_DIR, filename),
-                  'w', newline='') as data_file:
-            wr = csv.writer(data_file, delimiter=',',
-                            quotechar='|', quoting=csv.QUOTE_MINIMAL)
-            header_row = ["period", "per", "pbr", "roe", "curr_ratio",
-                          "debt_equity", "pcr", "peg"]
-            wr.writerow(header_row)              
-            fin_data = zip(self.period_list, self.per_list, self.pbr_list,
-                           self.roe_list, self.curr_ratio_list,
-                           self.debt_equity_list, self.pcr_list, self.peg_list)
-            for row in fin_data:
-                wr.writerow(row)
+        column_dict, mask_dict = {"period": self.period_list}, {}
+        for ratio in RATIO_LIST:
+            value_array, mask_dict[ratio] = self.ratio_dict[ratio]
+            column_dict[ratio] = np.array([round(value, ROUND_PT) for value
+                                           in value_array.tolist()],
+                                          dtype=np.float64)
+        finStore.write_table(self.stock_code, self.table_name, column_dict,
+                             mask_dict, file_format=self.file_format)
 
 class FinancialRatio():
     """ This class calculates financial ratios based on the input financial data
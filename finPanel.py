@@ -0,0 +1,240 @@
+#-*- coding:utf-8 -*-
+
+import re
+import time
+import operator
+import argparse
+
+import numpy as np
+
+import finData
+import finStore
+import utils
+
+# raw columns loaded into the panel (price_stdev is not used by any ratio)
+PANEL_COLUMN_LIST = [column for column in finData.RAW_COLUMN_LIST[1:]
+                     if column not in finData.FLOAT_COLUMN_LIST]
+OPERATOR_DICT = {"<": operator.lt, "<=": operator.le, ">": operator.gt,
+                 ">=": operator.ge, "==": operator.eq, "!=": operator.ne}
+condition_pattern = re.compile(r'^\s*(?P<field>\w+)\s*(?P<op><=|>=|==|!=|<|>)'
+                               r'\s*(?P<value>-?[\d.]+)\s*$')
+
+def parse_condition(condition):
+    """ This function parses the screening condition such as "per<10"
+        @return - (field, operator, value)
+    """
+    condition_match = condition_pattern.match(condition)
+    if condition_match is None:
+        raise ValueError("invalid condition %s" % condition)
+    return (condition_match.group("field"), condition_match.group("op"),
+            float(condition_match.group("value")))
+
+class FinancialPanel():
+    """ This class holds raw financial data of many companies in one
+        (company x period x field) array so that financial ratios of the
+        whole universe are calculated and screened at once
+        Periods of each company are aligned from its first period
+        as in FinancialData, so period_array gives the period of each slot
+    """
+
+    def __init__(self, stock_code_list=None, file_format="csv", data_target=1):
+        """ Initializes FinancialPanel object by reading raw_fin_data tables
+            Only the columns in PANEL_COLUMN_LIST are read
+            @param stock_code_list - companies to load,
+                                     every company with raw_fin_data if None
+            @param file_format - format of the tables (finStore.FORMAT_LIST)
+            @param data_target - 1 for quarterly data, 2 for yearly data
+                                 (raw_fin_data_yr tables)
+        """
+        self.data_target = data_target
+        if file_format == "sqlite":
+            company_list = self.query_companies(stock_code_list, data_target)
+        else:
+            if stock_code_list is None:
+                stock_code_list = finStore.find_stock_codes(
+                    finStore.get_table_name("raw_fin_data", data_target),
+                    file_format)
+            company_list = []
+            for stock_code in stock_code_list:
+                try:
+                    company_list.append((stock_code,) + finData.read_raw_columns(
+                        stock_code, file_format, column_list=PANEL_COLUMN_LIST,
+                        data_target=data_target))
+                except (OSError, StopIteration):
+                    print("warning - panel: unable to read raw fin data of %s"
+                          % stock_code)
+        self.stock_code_list = [company[0] for company in company_list]
+        # at least one slot so that an empty panel can still be queried
+        period_num = max([len(company[1]) for company in company_list] + [1])
+        shape = (len(company_list), period_num)
+        # "" for the slots after the last period of each company
+        self.period_array = np.full(shape, "", dtype="U7")
+        self.value = np.zeros(shape + (len(PANEL_COLUMN_LIST),), dtype=np.int64)
+        self.mask = np.zeros(self.value.shape, dtype=bool)
+        for company_idx, (_, period_list, column_dict, mask_dict) \
+                in enumerate(company_list):
+            length = len(period_list)
+            self.period_array[company_idx, :length] = period_list
+            for field_idx, column in enumerate(PANEL_COLUMN_LIST):
+                self.value[company_idx, :length, field_idx] = column_dict[column]
+                self.mask[company_idx, :length, field_idx] = mask_dict[column]
+        self.ratio_dict = None
+
+    @staticmethod
+    def query_companies(stock_code_list=None, data_target=1):
+        """ This function reads raw_fin_data of the companies from the sqlite
+            store with one query
+            @return - list of (stock_code, period_list, column_dict, mask_dict)
+        """
+        code_list, column_dict, mask_dict = finStore.query_range(
+            finStore.get_table_name("raw_fin_data", data_target),
+            stock_code_list=stock_code_list,
+            column_list=["period"] + PANEL_COLUMN_LIST, file_format="sqlite")
+        company_list = []
+        # rows are ordered by stock code, so each company is a slice
+        boundary_list = [idx for idx in range(1, len(code_list))
+                         if code_list[idx] != code_list[idx-1]]
+        for start, end in zip([0] + boundary_list,
+                              boundary_list + [len(code_list)]):
+            if start == end:
+                continue
+            company_list.append((code_list[start],
+                                 column_dict["period"][start:end],
+                                 {column: column_dict[column][start:end]
+                                  for column in PANEL_COLUMN_LIST},
+                                 {column: mask_dict[column][start:end]
+                                  for column in PANEL_COLUMN_LIST}))
+        return company_list
+
+    def get_column(self, column):
+        """ This function returns the raw column of every company
+            @return - ((company x period) value array, valid mask)
+        """
+        field_idx = PANEL_COLUMN_LIST.index(column)
+        return self.value[..., field_idx], self.mask[..., field_idx]
+
+    def get_ratio(self):
+        """ This function calculates the financial ratios of every company
+            and every period at once
+            @return - dictionary of ratio name: ((company x period) array,
+                      valid mask)
+        """
+        if self.ratio_dict is None:
+            column_dict, mask_dict = {}, {}
+            for column in PANEL_COLUMN_LIST:
+                column_dict[column], mask_dict[column] = self.get_column(column)
+            self.ratio_dict = finData.get_ratio_columns(column_dict, mask_dict,
+                                                data_target=self.data_target)
+        return self.ratio_dict
+
+    def get_last_period(self):
+        """ This function returns the latest period in the panel """
+        period_list = [period for period in np.unique(self.period_array)
+                       if period != ""]
+        if len(period_list) == 0:
+            return None
+        return max(period_list, key=utils.period_key)
+
+    def get_field(self, field, period):
+        """ This function returns the ratio or raw column of every company
+            at the input period
+            @param field - ratio name (finData.RATIO_LIST) or raw column name
+            @return - (value array, valid mask) over companies
+                      invalid for companies without the period
+        """
+        if field in finData.RATIO_LIST:
+            value, mask = self.get_ratio()[field]
+        else:
+            value, mask = self.get_column(field)
+        is_period = self.period_array == period
+        has_period = is_period.any(axis=1)
+        period_idx = is_period.argmax(axis=1)
+        company_idx = np.arange(len(self.stock_code_list))
+        return (value[company_idx, period_idx],
+                mask[company_idx, period_idx] & has_period)
+
+    def screen(self, condition_list, period=None):
+        """ This function finds the companies satisfying every condition
+            @param condition_list - list of (field, operator, value)
+                                    e.g. [("per", "<", 10)]
+                                    or strings such as "per<10"
+            @param period - period to screen, the latest period if None
+            @return - list of stock codes satisfying the conditions
+        """
+        if period is None:
+            period = self.get_last_period()
+        selected = np.ones(len(self.stock_code_list), dtype=bool)
+        for condition in condition_list:
+            if isinstance(condition, str):
+                condition = parse_condition(condition)
+            field, op, threshold = condition
+            value, mask = self.get_field(field, period)
+            selected &= mask & OPERATOR_DICT[op](value, threshold)
+        return [self.stock_code_list[idx] for idx in np.flatnonzero(selected)]
+
+    def rank(self, field, period=None, ascending=True, top=None,
+             stock_code_list=None):
+        """ This function ranks the companies by the input field
+            Companies whose field is not valid are left out
+            @param stock_code_list - companies to rank e.g. output of screen
+                                     every company if None
+            @param top - number of companies to return, all if None
+            @return - list of (stock code, value) in ranked order
+        """
+        if period is None:
+            period = self.get_last_period()
+        value, mask = self.get_field(field, period)
+        if stock_code_list is not None:
+            stock_code_set = set(stock_code_list)
+            mask = mask & np.array([stock_code in stock_code_set for stock_code
+                                    in self.stock_code_list], dtype=bool)
+        idx_array = np.flatnonzero(mask)
+        order = np.argsort(value[idx_array], kind="stable")
+        if not ascending:
+            order = order[::-1]
+        idx_array = idx_array[order][:top]
+        return [(self.stock_code_list[idx], value[idx].item())
+                for idx in idx_array]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Screen companies by "
+                                                 "financial ratios.")
+    parser.add_argument('conditions', nargs='*',
+                        help='conditions such as "per<10" "curr_ratio>1.5"')
+    parser.add_argument('-period', help="period to screen e.g. 2019-3, "
+                                        "the latest period if not set")
+    parser.add_argument('-rank', help="field to rank the screened companies by")
+    parser.add_argument('-desc', action="store_true",
+                        help="rank in descending order")
+    parser.add_argument('-top', type=int, default=None)
+    parser.add_argument('-format', default="csv", choices=finStore.FORMAT_LIST,
+                        help="format of the stored tables")
+    parser.add_argument('-yearly', action="store_true",
+                        help="screen the yearly data (raw_fin_data_yr tables)")
+    args = vars(parser.parse_args())
+
+    start_time = time.time()
+    panel = FinancialPanel(file_format=args["format"],
+                           data_target=2 if args["yearly"] else 1)
+    print("Loaded %d companies in %.2fs" % (len(panel.stock_code_list),
+                                            time.time() - start_time))
+    period = args["period"] or panel.get_last_period()
+    start_time = time.time()
+    stock_code_list = panel.screen(args["conditions"], period=period)
+    if args["rank"] is not None:
+        result_list = panel.rank(args["rank"], period=period,
+                                 ascending=not args["desc"], top=args["top"],
+                                 stock_code_list=stock_code_list)
+    else:
+        result_list = [(stock_code, None) for stock_code
+                       in stock_code_list[:args["top"]]]
+    elapsed = time.time() - start_time
+    for stock_code, value in result_list:
+        if value is None:
+            print(stock_code)
+        else:
+            print("%s %s" % (stock_code, finData.OUTPUT_FORMAT.format(
+                round(value, finData.ROUND_PT))))
+    print("%d companies in period %s (%.4fs)" % (len(stock_code_list), period,
+                                                 elapsed))
@@ -0,0 +1,550 @@
+#-*- coding:utf-8 -*-
+
+import csv
+import os
+import sqlite3
+import argparse
+import threading
+from contextlib import closing
+
+import numpy as np
+try:
+    import pyarrow
+    import pyarrow.feather
+except ImportError: # feather format is not available
+    pyarrow = None
+
+# data of each company under ~/workspace/data/<stock_code> directory
+HOME_DIR = os.path.join(os.path.expanduser("~"), "workspace")
+DATA_DIR = os.path.join(HOME_DIR, "data")
+
+# csv - text file of strings
+# feather - typed columnar file (Arrow IPC) read with memory map
+# sqlite - one database of every company indexed by (stock_code, period)
+FORMAT_LIST = ["csv", "feather", "sqlite"]
+# formats storing each table of a company in a file of the company directory
+FILE_EXT = {"csv": ".csv", "feather": ".feather"}
+DB_PATH = os.path.join(DATA_DIR, "fin_data.sqlite")
+# columns of each table in order, with type "str", "int" or "float"
+TABLE_SCHEMA = {
+    "raw_fin_data": [("period", "str"), ("price_mean", "int"),
+                     ("price_median", "int"), ("price_max", "int"),
+                     ("price_min", "int"), ("price_stdev", "float"),
+                     ("stock_num", "int"), ("curr_asset", "int"),
+                     ("noncurr_asset", "int"), ("total_asset", "int"),
+                     ("curr_liab", "int"), ("noncurr_liab", "int"),
+                     ("total_liab", "int"), ("equity", "int"),
+                     ("net_income", "int"), ("deprec_cost", "int")],
+    "fin_data": [("period", "str"), ("per", "float"), ("pbr", "float"),
+                 ("roe", "float"), ("curr_ratio", "float"),
+                 ("debt_equity", "float"), ("pcr", "float"), ("peg", "float")],
+    "stock_data": [("period", "str"), ("price_mean", "int"),
+                   ("price_median", "int"), ("price_max", "int"),
+                   ("price_min", "int"), ("price_stdev", "float")],
+    "raw_stock_data": [("date", "str"), ("end", "int"), ("start", "int"),
+                       ("high", "int"), ("low", "int"), ("volume", "int")],
+}
+# yearly data (data_target 2) is kept in separate tables with the same columns
+# e.g. raw_fin_data_yr, periods are "YYYY-4" as the period of 사업보고서
+YEARLY_SUFFIX = "_yr"
+YEARLY_TABLE_LIST = ["raw_fin_data", "fin_data", "stock_data"]
+for table_name in YEARLY_TABLE_LIST:
+    TABLE_SCHEMA[table_name + YEARLY_SUFFIX] = TABLE_SCHEMA[table_name]
+# tables whose csv files have no header row
+NO_HEADER_TABLE_LIST = ["raw_stock_data"]
+# format of float columns written as string, DEFAULT_FLOAT_FORMAT if not set
+FLOAT_FORMAT = {"price_stdev": "{0:.2f}"}
+DEFAULT_FLOAT_FORMAT = "{0:.4f}"
+DTYPE = {"int": np.int64, "float": np.float64}
+SQL_TYPE = {"str": "TEXT", "int": "INTEGER", "float": "REAL"}
+# maximum number of parameters in one sql statement
+SQL_PARAM_NUM = 500
+# threads crawling different companies write to the database one at a time
+db_lock = threading.Lock()
+# database paths whose tables have been created in this process
+schema_path_set = set()
+schema_lock = threading.Lock()
+
+def check_format(file_format):
+    """ This function checks whether file_format can be used """
+    if file_format not in FORMAT_LIST:
+        raise ValueError("unknown file format %s" % file_format)
+    if file_format == "feather" and pyarrow is None:
+        raise ImportError("pyarrow is needed for feather format")
+
+def get_column_list(table_name):
+    """ This function returns the names of columns of the table in order """
+    return [column for column, _ in TABLE_SCHEMA[table_name]]
+
+def get_table_name(table_name, data_target=1):
+    """ This function returns the name of the table for the data_target
+        @param data_target - 1 for quarterly data, 2 for yearly data
+    """
+    if data_target == 1 or table_name not in YEARLY_TABLE_LIST:
+        return table_name
+    elif data_target == 2:
+        return table_name + YEARLY_SUFFIX
+    raise ValueError("data_target parameter is invalid")
+
+def get_company_dir(stock_code):
+    """ This function returns the directory of the company """
+    return os.path.join(DATA_DIR, stock_code)
+
+def get_key_column(table_name):
+    """ This function returns the column identifying the rows of a company
+        i.e. period or date
+    """
+    return TABLE_SCHEMA[table_name][0][0]
+
+def get_path(stock_code, table_name, file_format="csv"):
+    """ This function returns the path of the table file of the company """
+    filename = "%s_%s%s" % (table_name, stock_code, FILE_EXT[file_format])
+    return os.path.join(get_company_dir(stock_code), filename)
+
+def table_exists(stock_code, table_name, file_format="csv"):
+    """ This function checks whether the table of the company is stored """
+    if file_format == "sqlite":
+        with closing(connect_db()) as conn:
+            return conn.execute("SELECT 1 FROM %s WHERE stock_code = ? LIMIT 1"
+                                % table_name, (stock_code,)).fetchone() is not None
+    return os.path.isfile(get_path(stock_code, table_name, file_format))
+
+def find_stock_codes(table_name, file_format="csv"):
+    """ This function finds the companies whose table is stored
+        @return - list of stock codes in sorted order
+    """
+    if file_format == "sqlite":
+        with closing(connect_db()) as conn:
+            return [row[0] for row in conn.execute(
+                "SELECT DISTINCT stock_code FROM %s ORDER BY stock_code"
+                % table_name)]
+    if not os.path.isdir(DATA_DIR):
+        return []
+    return [stock_code for stock_code in sorted(os.listdir(DATA_DIR))
+            if table_exists(stock_code, table_name, file_format)]
+
+def connect_db():
+    """ This function connects to the sqlite database, creating the tables
+        if they do not exist at the first connection to the database
+        The default rollback journal is kept as WAL does not work on
+        network filesystems
+        @return - sqlite3 connection
+    """
+    if not os.path.isdir(DATA_DIR):
+        os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=60)
+    if DB_PATH not in schema_path_set:
+        with schema_lock:
+            if DB_PATH not in schema_path_set:
+                create_schema(conn)
+                schema_path_set.add(DB_PATH)
+    return conn
+
+def create_schema(conn):
+    """ This function creates the tables of TABLE_SCHEMA and their indices
+        in the database if they do not exist
+    """
+    for table_name, schema in TABLE_SCHEMA.items():
+        key_column = get_key_column(table_name)
+        column_def = ", ".join("%s %s" % (column, SQL_TYPE[column_type])
+                               for column, column_type in schema)
+        # rows are clustered by (stock_code, key) for range queries of a
+        # company, and indexed by key for queries of a period
+        conn.execute("CREATE TABLE IF NOT EXISTS %s (stock_code TEXT NOT NULL, "
+                     "%s, PRIMARY KEY (stock_code, %s)) WITHOUT ROWID"
+                     % (table_name, column_def, key_column))
+        conn.execute("CREATE INDEX IF NOT EXISTS %s_%s_idx ON %s (%s)"
+                     % (table_name, key_column, table_name, key_column))
+
+def to_column(value_list, dtype=np.int64):
+    """ This function converts the list of values into a column array
+        @param value_list - list of values in string
+        @param dtype - np.int64 or np.float64
+        @return - (array of values, mask of valid values)
+                  invalid values such as "" or None are set to 0 in the array
+    """
+    convert = float if dtype == np.float64 else int
+    value_array = np.zeros(len(value_list), dtype=dtype)
+    mask = np.zeros(len(value_list), dtype=bool)
+    for idx, value in enumerate(value_list):
+        try:
+            value_array[idx] = convert(value)
+            mask[idx] = True
+        except (ValueError, TypeError, OverflowError):
+            pass
+    return value_array, mask
+
+def column_to_str(value_array, mask, float_format=DEFAULT_FLOAT_FORMAT):
+    """ This function converts the column array back into strings as written
+        in csv files, "" for invalid values
+    """
+    if value_array.dtype == np.float64:
+        return [float_format.format(value) if valid else ""
+                for value, valid in zip(value_array.tolist(), mask.tolist())]
+    return [str(value) if valid else ""
+            for value, valid in zip(value_array.tolist(), mask.tolist())]
+
+def rows_to_columns(table_name, row_list):
+    """ This function converts rows of strings into typed columns
+        @return - (dictionary of column: value array or list of strings,
+                   dictionary of column: valid mask)
+    """
+    value_list_list = [list(value_list) for value_list in zip(*row_list)] \
+                      or [[] for _ in TABLE_SCHEMA[table_name]]
+    column_dict, mask_dict = {}, {}
+    for (column, column_type), value_list in zip(TABLE_SCHEMA[table_name],
+                                                 value_list_list):
+        if column_type == "str":
+            column_dict[column] = value_list
+            mask_dict[column] = np.ones(len(value_list), dtype=bool)
+        else:
+            column_dict[column], mask_dict[column] = to_column(
+                value_list, DTYPE[column_type])
+    return column_dict, mask_dict
+
+def columns_to_rows(table_name, column_dict, mask_dict=None):
+    """ This function converts typed columns into rows of strings as written
+        in csv files
+    """
+    value_list_list = []
+    for column, column_type in TABLE_SCHEMA[table_name]:
+        if column_type == "str":
+            value_list_list.append(list(column_dict[column]))
+        else:
+            value_array = np.asarray(column_dict[column], dtype=DTYPE[column_type])
+            if mask_dict is None or column not in mask_dict:
+                mask = np.ones(len(value_array), dtype=bool)
+            else:
+                mask = mask_dict[column]
+            value_list_list.append(column_to_str(value_array, mask,
+                FLOAT_FORMAT.get(column, DEFAULT_FLOAT_FORMAT)))
+    return [list(row) for row in zip(*value_list_list)]
+
+def write_csv(path, table_name, row_list, mode='w'):
+    """ This function writes rows of strings to the csv file """
+    with open(path, mode, newline='') as data_file:
+        wr = csv.writer(data_file, delimiter=',',
+                        quotechar='|', quoting=csv.QUOTE_MINIMAL)
+        if mode == 'w' and table_name not in NO_HEADER_TABLE_LIST:
+            wr.writerow(get_column_list(table_name))
+        for row in row_list:
+            wr.writerow(row)
+
+def read_csv_header(path):
+    """ This function reads the header row of the csv file """
+    with open(path, 'r', newline='') as data_file:
+        return next(csv.reader(data_file, delimiter=',', quotechar='|'))
+
+def read_csv(path, table_name):
+    """ This function reads rows of strings from the csv file
+        Columns are mapped by the header row, so the rows are in the order
+        of columns of TABLE_SCHEMA whatever the order in the file, and
+        columns not in the file are ""
+    """
+    with open(path, 'r', newline='') as data_file:
+        fr = csv.reader(data_file, delimiter=',', quotechar='|')
+        if table_name in NO_HEADER_TABLE_LIST:
+            return list(fr)
+        header = next(fr)
+        column_list = get_column_list(table_name)
+        if header == column_list:
+            return list(fr)
+        idx_list = [header.index(column) if column in header else None
+                    for column in column_list]
+        return [[row[idx] if idx is not None and idx < len(row) else ""
+                 for idx in idx_list] for row in fr]
+
+def write_feather(path, table_name, column_dict, mask_dict=None):
+    """ This function writes typed columns to the feather file
+        Invalid values are written as null
+    """
+    array_list = []
+    for column, column_type in TABLE_SCHEMA[table_name]:
+        if column_type == "str":
+            array_list.append(pyarrow.array(list(column_dict[column]),
+                                            type=pyarrow.string()))
+        else:
+            value_array = np.asarray(column_dict[column], dtype=DTYPE[column_type])
+            mask = None
+            if mask_dict is not None and column in mask_dict:
+                mask = ~np.asarray(mask_dict[column], dtype=bool)
+            array_list.append(pyarrow.array(value_array, mask=mask))
+    table = pyarrow.Table.from_arrays(array_list,
+                                      names=get_column_list(table_name))
+    # uncompressed so that the file can be memory mapped without copying
+    pyarrow.feather.write_feather(table, path, compression="uncompressed")
+
+def read_feather(path, table_name, column_list):
+    """ This function reads typed columns from the feather file by name
+        with memory map, columns without null are not copied
+    """
+    table = pyarrow.feather.read_table(path, columns=column_list,
+                                       memory_map=True)
+    column_type_dict = dict(TABLE_SCHEMA[table_name])
+    column_dict, mask_dict = {}, {}
+    for column in column_list:
+        chunked_array = table.column(column)
+        if chunked_array.num_chunks == 1:
+            array = chunked_array.chunk(0)
+        else:
+            array = chunked_array.combine_chunks()
+        if column_type_dict[column] == "str":
+            column_dict[column] = array.to_pylist()
+            mask_dict[column] = np.ones(len(array), dtype=bool)
+        elif array.null_count == 0:
+            column_dict[column] = array.to_numpy()
+            mask_dict[column] = np.ones(len(array), dtype=bool)
+        else:
+            column_dict[column] = array.fill_null(0).to_numpy()
+            mask_dict[column] = array.is_valid().to_numpy(zero_copy_only=False)
+    return column_dict, mask_dict
+
+def columns_to_sql_rows(stock_code, table_name, column_dict, mask_dict=None):
+    """ This function converts typed columns into rows of the sql table
+        Invalid values are converted to None (NULL)
+    """
+    value_list_list = [[stock_code] * len(column_dict[get_key_column(table_name)])]
+    for column, column_type in TABLE_SCHEMA[table_name]:
+        if column_type == "str":
+            value_list_list.append(list(column_dict[column]))
+            continue
+        value_list = np.asarray(column_dict[column],
+                                dtype=DTYPE[column_type]).tolist()
+        if mask_dict is not None and column in mask_dict:
+            value_list = [value if valid else None for value, valid
+                          in zip(value_list, np.asarray(mask_dict[column]).tolist())]
+        value_list_list.append(value_list)
+    return list(zip(*value_list_list))
+
+def sql_rows_to_columns(table_name, column_list, row_list):
+    """ This function converts rows of the sql query into typed columns
+        @return - (dictionary of column: value array or list of strings,
+                   dictionary of column: valid mask)
+    """
+    column_type_dict = dict(TABLE_SCHEMA[table_name])
+    value_list_list = [list(value_list) for value_list in zip(*row_list)] \
+                      or [[] for _ in column_list]
+    column_dict, mask_dict = {}, {}
+    for column, value_list in zip(column_list, value_list_list):
+        mask = np.array([value is not None for value in value_list], dtype=bool)
+        if column_type_dict[column] == "str":
+            column_dict[column] = value_list
+        else:
+            column_dict[column] = np.array([value if value is not None else 0
+                                            for value in value_list],
+                                           dtype=DTYPE[column_type_dict[column]])
+        mask_dict[column] = mask
+    return column_dict, mask_dict
+
+def write_sqlite(stock_code, table_name, column_dict, mask_dict=None,
+                 replace=True):
+    """ This function upserts the rows of the company in one transaction
+        @param replace - removes the rows of the company not in column_dict
+    """
+    column_list = get_column_list(table_name)
+    insert_sql = "INSERT OR REPLACE INTO %s (stock_code, %s) VALUES (?%s)" % (
+        table_name, ", ".join(column_list), ", ?" * len(column_list))
+    row_list = columns_to_sql_rows(stock_code, table_name, column_dict,
+                                   mask_dict)
+    with db_lock, closing(connect_db()) as conn:
+        with conn:
+            if replace:
+                conn.execute("DELETE FROM %s WHERE stock_code = ?" % table_name,
+                             (stock_code,))
+            conn.executemany(insert_sql, row_list)
+
+def query_sqlite(table_name, column_list, stock_code_list=None, start=None,
+                 end=None):
+    """ This function reads the rows within [start, end] of the key column
+        @return - list of (stock_code, values of column_list) ordered by
+                  (stock_code, key)
+    """
+    key_column = get_key_column(table_name)
+    condition_list, param_list = [], []
+    if start is not None:
+        condition_list.append("%s >= ?" % key_column)
+        param_list.append(start)
+    if end is not None:
+        condition_list.append("%s <= ?" % key_column)
+        param_list.append(end)
+    sql = "SELECT stock_code, %s FROM %s" % (", ".join(column_list), table_name)
+    row_list = []
+    with closing(connect_db()) as conn:
+        if stock_code_list is None:
+            where = " WHERE " + " AND ".join(condition_list) if condition_list else ""
+            row_list = conn.execute(sql + where + " ORDER BY stock_code, %s"
+                                    % key_column, param_list).fetchall()
+        else:
+            stock_code_list = sorted(set(stock_code_list))
+            for idx in range(0, len(stock_code_list), SQL_PARAM_NUM):
+                code_list = stock_code_list[idx:idx+SQL_PARAM_NUM]
+                where = " WHERE " + " AND ".join(condition_list + [
+                    "stock_code IN (%s)" % ", ".join("?" * len(code_list))])
+                row_list += conn.execute(sql + where + " ORDER BY stock_code, %s"
+                                         % key_column,
+                                         param_list + code_list).fetchall()
+    return row_list
+
+def write_table(stock_code, table_name, column_dict, mask_dict=None,
+                file_format="csv"):
+    """ This function writes the table of the company
+        The file is written to a temporary file first and replaced atomically,
+        and the rows in sqlite are replaced in one transaction
+        @param column_dict - dictionary of column: value array
+                             (list of strings for str columns)
+        @param mask_dict - dictionary of column: valid mask
+                           every value is valid if None
+    """
+    check_format(file_format)
+    if file_format == "sqlite":
+        write_sqlite(stock_code, table_name, column_dict, mask_dict)
+        return
+    path = get_path(stock_code, table_name, file_format)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    if file_format == "csv":
+        write_csv(temp_path, table_name,
+                  columns_to_rows(table_name, column_dict, mask_dict))
+    elif file_format == "feather":
+        write_feather(temp_path, table_name, column_dict, mask_dict)
+    os.replace(temp_path, path)
+
+def read_table(stock_code, table_name, file_format="csv", column_list=None):
+    """ This function reads the table of the company by column names
+        @param column_list - names of columns to read, every column if None
+        @return - (dictionary of column: value array or list of strings,
+                   dictionary of column: valid mask)
+    """
+    check_format(file_format)
+    if column_list is None:
+        column_list = get_column_list(table_name)
+    if file_format == "sqlite":
+        row_list = query_sqlite(table_name, column_list, [stock_code])
+        return sql_rows_to_columns(table_name, column_list,
+                                   [row[1:] for row in row_list])
+    path = get_path(stock_code, table_name, file_format)
+    if file_format == "csv":
+        column_dict, mask_dict = rows_to_columns(table_name,
+                                                 read_csv(path, table_name))
+    elif file_format == "feather":
+        column_dict, mask_dict = read_feather(path, table_name, column_list)
+    return ({column: column_dict[column] for column in column_list},
+            {column: mask_dict[column] for column in column_list})
+
+def write_rows(stock_code, table_name, row_list, file_format="csv"):
+    """ This function writes the table of the company from rows of strings
+        in the order of columns of TABLE_SCHEMA
+    """
+    check_format(file_format)
+    if file_format == "csv":
+        path = get_path(stock_code, table_name, file_format)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_csv(path + ".tmp", table_name, row_list)
+        os.replace(path + ".tmp", path)
+    else:
+        write_table(stock_code, table_name,
+                    *rows_to_columns(table_name, row_list),
+                    file_format=file_format)
+
+def read_rows(stock_code, table_name, file_format="csv"):
+    """ This function reads the table of the company as rows of strings
+        in the order of columns of TABLE_SCHEMA
+    """
+    check_format(file_format)
+    if file_format == "csv":
+        return read_csv(get_path(stock_code, table_name, file_format),
+                        table_name)
+    return columns_to_rows(table_name,
+                           *read_table(stock_code, table_name, file_format))
+
+def append_rows(stock_code, table_name, row_list, file_format="csv"):
+    """ This function appends rows of strings to the table of the company
+        Rows are upserted by key in sqlite, and the table is rewritten for
+        formats that cannot be appended
+    """
+    check_format(file_format)
+    # rows are appended to a csv file only if its columns are in order
+    if file_format == "csv" and (table_name in NO_HEADER_TABLE_LIST or
+            read_csv_header(get_path(stock_code, table_name, file_format))
+            == get_column_list(table_name)):
+        write_csv(get_path(stock_code, table_name, file_format), table_name,
+                  row_list, mode='a')
+    elif file_format == "sqlite":
+        write_sqlite(stock_code, table_name,
+                     *rows_to_columns(table_name, row_list), replace=False)
+    else:
+        write_rows(stock_code, table_name,
+                   read_rows(stock_code, table_name, file_format) + row_list,
+                   file_format=file_format)
+
+def query_range(table_name, start=None, end=None, stock_code_list=None,
+                column_list=None, file_format="sqlite"):
+    """ This function reads the rows of many companies whose period (date for
+        raw_stock_data) is within [start, end]
+        Periods "YYYY-quarter" and dates "YYYY.MM.DD" are compared as string
+        @param stock_code_list - companies to read, every company if None
+        @param column_list - names of columns to read, every column if None
+        @return - (list of stock code of each row,
+                   dictionary of column: value array or list of strings,
+                   dictionary of column: valid mask)
+                  rows are ordered by stock code and period
+    """
+    check_format(file_format)
+    if column_list is None:
+        column_list = get_column_list(table_name)
+    key_column = get_key_column(table_name)
+    if file_format == "sqlite":
+        row_list = query_sqlite(table_name, column_list, stock_code_list,
+                                start, end)
+        column_dict, mask_dict = sql_rows_to_columns(table_name, column_list,
+                                    [row[1:] for row in row_list])
+        return [row[0] for row in row_list], column_dict, mask_dict
+    # tables of the companies are read one by one for file formats
+    if stock_code_list is None:
+        stock_code_list = find_stock_codes(table_name, file_format)
+    row_list, code_list = [], []
+    for stock_code in sorted(set(stock_code_list)):
+        if not table_exists(stock_code, table_name, file_format):
+            continue
+        key_idx = get_column_list(table_name).index(key_column)
+        for row in read_rows(stock_code, table_name, file_format):
+            if (start is None or row[key_idx] >= start) and \
+               (end is None or row[key_idx] <= end):
+                row_list.append(row)
+                code_list.append(stock_code)
+    column_dict, mask_dict = rows_to_columns(table_name, row_list)
+    return (code_list, {column: column_dict[column] for column in column_list},
+            {column: mask_dict[column] for column in column_list})
+
+def copy_tables(stock_code_list, from_format, to_format):
+    """ This function copies every table of the companies between formats
+        e.g. to move the company directories into the sqlite database
+    """
+    check_format(from_format)
+    check_format(to_format)
+    for stock_code in stock_code_list:
+        for table_name in TABLE_SCHEMA:
+            if table_exists(stock_code, table_name, from_format):
+                write_table(stock_code, table_name,
+                            *read_table(stock_code, table_name, from_format),
+                            file_format=to_format)
+        print("Copied tables of code %s" % stock_code)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy stored tables between "
+                                                 "formats.")
+    parser.add_argument('-src', default="csv", choices=FORMAT_LIST)
+    parser.add_argument('-dst', default="sqlite", choices=FORMAT_LIST)
+    parser.add_argument('-codes', nargs='+', default=None,
+                        help="stock codes to copy, every company if not set")
+    args = vars(parser.parse_args())
+    stock_code_list = args["codes"]
+    if stock_code_list is None:
+        stock_code_set = set()
+        for table_name in TABLE_SCHEMA:
+            stock_code_set.update(find_stock_codes(table_name, args["src"]))
+        stock_code_list = sorted(stock_code_set)
+    copy_tables(stock_code_list, args["src"], args["dst"])
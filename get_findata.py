@@ -1,47 +1,295 @@
 #-*- coding:utf-8 -*-
 
 import re
-import csv
+import json
 import time
-import os
 import argparse
-from urllib.request import urlopen
+import traceback
 from urllib.parse import urlencode
 from socket import timeout
-
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
 
 import dartData
+import dartTable
+import fieldSpec
 import finData
+import finStore
+import htmlArchive
 import utils
+import webClient
+
+class ReportIndex:
+    """ This class holds the urls of every section of one DART report
+        main.do of the report is downloaded and searched only once, and the
+        urls are looked up from memory afterwards
+    """
+    
+    script_pattern = re.compile(r'<script[^>]*>(?P<script>.*?)</script>',
+                                re.IGNORECASE | re.DOTALL)
+    main_url = "http://dart.fss.or.kr/dsaf001/main.do?rcpNo="
+    
+    def __init__(self, rcp_no, page_html=None):
+        """ Initializes ReportIndex object
+            @param rcp_no - report number for target company data
+            @param page_html - main.do of the report, downloaded if None
+        """
+        self.rcp_no = rcp_no
+        if page_html is None:
+            page_html = webClient.fetch(self.main_url + rcp_no).decode('utf-8')
+        self.url_dict = self.parse_index(page_html)
+    
+    @classmethod
+    def parse_index(cls, page_html):
+        """ This function obtains the urls of all sections in utils.page_pattern
+            from the scripts of main.do
+            @return - dictionary of section name: url (None if not found)
+        """
+        url_dict = dict.fromkeys(utils.page_pattern)
+        base_url = "http://dart.fss.or.kr/report/viewer.do?{}"
+        # url for target datasheet is in script wrapped in certain patterns
+        # the first script matching the pattern has the url for the section
+        for script_match in cls.script_pattern.finditer(page_html):
+            script = script_match.group("script")
+            for target, pattern in utils.page_pattern.items():
+                if url_dict[target] is not None:
+                    continue
+                match = pattern.search(script)
+                if match:
+                    url_params = {"rcpNo": match.group("rcpNo"),
+                                  "dcmNo": match.group("dcmNo"),
+                                  "eleId": match.group("eleId"),
+                                  "offset": match.group("offset"),
+                                  "length": match.group("length"),
+                                  "dtd": match.group("dtd"),}
+                    url_dict[target] = base_url.format(urlencode(url_params))
+            if all(url is not None for url in url_dict.values()):
+                break
+        return url_dict
+    
+    def get_url(self, target):
+        """ This function returns the url of the target section
+            @return - url if the target page exists
+                      None if not
+        """
+        return self.url_dict[target]
+    
+
+class LazySource:
+    """ This class holds a page source that is fetched and parsed only when
+        it is used for the first time, or in a thread pool once it is known
+        to be needed
+    """
+
+    def __init__(self, load_func, *args):
+        """ Initializes LazySource object
+            @param load_func - function returning the source for args
+        """
+        self.load_func = load_func
+        self.args = args
+        self.loaded = False
+        self.source = None
+        self.future = None
+
+    def submit(self, executor):
+        """ This function starts loading the source in the executor """
+        if not self.loaded and self.future is None:
+            self.future = executor.submit(self.load_func, *self.args)
+
+    def get(self):
+        """ This function returns the source, loading it on the first call
+            or waiting for the load submitted to the executor
+        """
+        if not self.loaded:
+            if self.future is not None:
+                self.source = self.future.result()
+            else:
+                self.source = self.load_func(*self.args)
+            self.loaded = True
+        return self.source
+
 
 class CompanyData:
     """ This class manages stock and financial statement data of the company """
     
-    def __init__(self, stock_code, start_yr=2000, data_target=1):
+    # targets of a report (see dart_crawl_target) and the fieldSpec fields
+    # of the statements combined into each of them
+    TARGET_FIELD_DICT = {
+        "stock_num": [],
+        "asset": ["curr_asset", "noncurr_asset", "total_asset"],
+        "liabilities": ["curr_liabilities", "noncurr_liabilities",
+                        "total_liabilities"],
+        "equity": ["total_equity", "minor_equity"],
+        "net_income": ["total_income", "minor_income", "major_income"],
+        "deprec_cost": ["cash_deprec_cost"],
+    }
+    REPORT_TARGET_LIST = list(TARGET_FIELD_DICT)
+    # report target of each raw_fin_data column, "price" for stock prices
+    COLUMN_TARGET_DICT = {
+        "price_mean": "price", "price_median": "price", "price_max": "price",
+        "price_min": "price", "price_stdev": "price", "stock_num": "stock_num",
+        "curr_asset": "asset", "noncurr_asset": "asset", "total_asset": "asset",
+        "curr_liab": "liabilities", "noncurr_liab": "liabilities",
+        "total_liab": "liabilities", "equity": "equity",
+        "net_income": "net_income", "deprec_cost": "deprec_cost",
+    }
+    # ExtractionPlan of each tuple of report targets
+    extraction_plan_dict = {}
+    # daily prices of the stock code in Naver Finance, page "&page=<n>"
+    PRICE_URL = "http://finance.naver.com/item/sise_day.nhn?code="
+    
+    def __init__(self, stock_code, start_yr=2000, data_target=1,
+                 rcp_no_list=None, fin_period_list=None, file_format="csv",
+                 archive=None, offline=False):
         """ Initializes CompanyData object
             @param stock_code - stock code of target company
             @param start_yr - initial target year for data collection
             @param data_target - 1 for quarterly data, 2 for yearly data only
+            @param rcp_no_list, fin_period_list - reports and their periods
+                                to use instead of searching DART
+            @param file_format - format of the stored tables
+                                 (finStore.FORMAT_LIST)
+            @param archive - htmlArchive.HtmlArchive that DART pages are read
+                             from and added to, pages are not archived if None
+            @param offline - reads DART pages and the report list only from
+                             archive and stock prices only from the stored
+                             stock_data table, used to re-parse archived
+                             reports without network
         """
         self.stock_code = stock_code
         self.start_yr = start_yr
         self.data_target = data_target
-        self.rcp_no_list, self.fin_period_list = dartData.search_dart(self.stock_code,
-                                                    self.start_yr, data_target)
-        # the first report may be the previous year's data
-        if int(self.fin_period_list[0][:4]) < start_yr:
-            self.fin_period_list.pop(0)
-            self.rcp_no_list.pop(0)
+        # stock_data and raw_fin_data tables of the data_target
+        self.stock_table_name = finStore.get_table_name("stock_data",
+                                                        data_target)
+        self.raw_table_name = finStore.get_table_name("raw_fin_data",
+                                                      data_target)
+        self.file_format = file_format
+        finStore.check_format(file_format)
+        self.archive = archive
+        self.offline = offline
+        assert archive is not None or not offline
+        if rcp_no_list is not None:
+            self.rcp_no_list = list(rcp_no_list)
+            self.fin_period_list = list(fin_period_list)
+        else:
+            if offline:
+                self.rcp_no_list, self.fin_period_list = \
+                    self.read_report_list()
+            else:
+                self.rcp_no_list, self.fin_period_list = dartData.search_dart(
+                                self.stock_code, self.start_yr, data_target)
+                if archive is not None:
+                    self.write_report_list()
+            # the first report may be the previous year's data
+            if int(self.fin_period_list[0][:4]) < start_yr:
+                self.fin_period_list.pop(0)
+                self.rcp_no_list.pop(0)
         assert len(self.rcp_no_list) == len(self.fin_period_list)
         
-        # creates company directory in ~/workspace/data directory
-        HOME_DIR = os.path.join(os.path.expanduser("~"), "workspace")
-        DATA_DIR = os.path.join(HOME_DIR, "data")
-        self.COMPANY_DIR = os.path.join(DATA_DIR, self.stock_code)
-        if not os.path.isdir(self.COMPANY_DIR):
-            os.makedirs(self.COMPANY_DIR)
+        # company directory in ~/workspace/data directory, created by
+        # finStore when a table is written in a file format
+        self.COMPANY_DIR = finStore.get_company_dir(self.stock_code)
+        # ReportIndex of each rcp_no that has been requested
+        self.report_index_dict = {}
+        # (rcp_no, section): page downloaded by prefetch_report when neither
+        # the response cache nor the archive keeps it, removed when parsed
+        self.prefetch_dict = {}
     
+    def get_report_list_section(self, data_target=None):
+        """ This function returns the archive section of the report list
+            searched for the data_target (self.data_target if None)
+        """
+        if data_target is None:
+            data_target = self.data_target
+        if data_target == 2:
+            return htmlArchive.REPORT_LIST_SECTION + finStore.YEARLY_SUFFIX
+        return htmlArchive.REPORT_LIST_SECTION
+
+    def write_report_list(self):
+        """ This function archives the report list searched at DART under
+            the stock code, replacing the list archived before
+        """
+        content = json.dumps({"rcp_no_list": self.rcp_no_list,
+                              "period_list": self.fin_period_list})
+        self.archive.put(self.stock_code, self.get_report_list_section(),
+                         content.encode('utf-8'), replace=True)
+
+    def read_report_list(self):
+        """ This function reads the report list archived by the last crawl
+            with the archive, so that reports are re-parsed without searching
+            DART. Yearly reports are taken from the quarterly list if only
+            the quarterly list is archived
+            @return - (list of rcp_no, list of periods)
+        """
+        content = self.archive.get(self.stock_code,
+                                   self.get_report_list_section())
+        yearly_only = False
+        if content is None and self.data_target == 2:
+            content = self.archive.get(self.stock_code,
+                                       self.get_report_list_section(1))
+            yearly_only = True
+        assert content is not None, \
+            "report list of %s is not archived, crawl it with -archive first" \
+            % self.stock_code
+        report_list = json.loads(content.decode('utf-8'))
+        rcp_no_list, period_list = [], []
+        for rcp_no, period in zip(report_list["rcp_no_list"],
+                                  report_list["period_list"]):
+            # only 사업보고서 ("YYYY-4") for yearly data
+            if yearly_only and period[-1] != '4':
+                continue
+            rcp_no_list.append(rcp_no)
+            period_list.append(period)
+        return rcp_no_list, period_list
+
+    def get_report_index(self, rcp_no):
+        """ This function returns the ReportIndex of the input rcp_no
+            main.do of each report is downloaded only once per CompanyData
+        """
+        if rcp_no not in self.report_index_dict:
+            try:
+                page_html = self.fetch_page(rcp_no, htmlArchive.MAIN_SECTION)
+                page_html = page_html.decode('utf-8')
+            except KeyError:
+                # every section of a report missing in offline mode is None
+                print("warning - archive: report %s is not archived" % rcp_no)
+                page_html = ""
+            # reports may be indexed from several threads
+            self.report_index_dict.setdefault(rcp_no, ReportIndex(rcp_no,
+                                                                  page_html))
+        return self.report_index_dict[rcp_no]
+
+    def fetch_page(self, rcp_no, target):
+        """ This function returns the target page of input rcp_no
+            The page is read from self.archive if archived, otherwise it is
+            downloaded and added to the archive
+            @param target - section name of utils.page_pattern
+                            or htmlArchive.MAIN_SECTION for main.do
+            @return - page html in bytes
+            KeyError is raised in offline mode if the page is not archived
+        """
+        page_html = self.prefetch_dict.pop((rcp_no, target), None)
+        if page_html is not None:
+            return page_html
+        if self.archive is not None:
+            page_html = self.archive.get(rcp_no, target)
+            if page_html is not None:
+                return page_html
+        if self.offline:
+            raise KeyError("%s page of %s is not archived" % (target, rcp_no))
+        if target == htmlArchive.MAIN_SECTION:
+            url = ReportIndex.main_url + rcp_no
+        else:
+            url = self.dart_page_url(rcp_no, target)
+        if self.archive is None:
+            return webClient.fetch(url)
+        # archived pages are not kept in the response cache again
+        page_html = webClient.fetch(url, use_cache=False)
+        self.archive.put(rcp_no, target, page_html)
+        return page_html
+
     def dart_page_url(self, rcp_no, target=None):
         """ This function sets up crawling for the input target i.e. get url
             @param rcp_no - report number for target company data
@@ -53,101 +301,8 @@ class CompanyData:
             @return - url if the target page exists
                       None if not
         """
-        url = "http://dart.fss.or.kr/dsaf001/main.do?rcpNo=" + rcp_no
-        page_html = urlopen(url).read()
-        source = BeautifulSoup(page_html, "html.parser")
-        pattern = utils.page_pattern[target]
-        assert pattern is not None
-        
-        # url for target datasheet is in script wrapped in certain patterns
-        script = source.find("script", text=pattern)
-        if script:
-            match = pattern.search(script.text)
-            if match:
-                rcp_no, dcm_no = match.group("rcpNo"), match.group("dcmNo")
-                ele_id, offset = match.group("eleId"), match.group("offset")
-                length, dtd = match.group("length"), match.group("dtd")
-                base_url = "http://dart.fss.or.kr/report/viewer.do?{}"
-                url_params = {"rcpNo": rcp_no, "dcmNo": dcm_no, "eleId": ele_id,
-                              "offset": offset, "length": length, "dtd": dtd,}
-                target_url = base_url.format(urlencode(url_params))
-            else:
-                target_url = None
-        else:
-            target_url = None
-        return target_url
-    
-    @staticmethod
-    def get_target_table_idx(table_list, pattern=None):
-        """ This function obtains indices of table_list for the input pattern
-            @param table_list - list of table sources to be analyzed
-            @param pattern - pattern to be searched in table_list
-            @return table_group_cnt - number of tables in a table group
-                                      i.e. one dataset
-                    table_head_idx - index of table head (includes '단위')
-                                     in a table group
-                    table_main_idx - index of main table in a table group
-                    table_name_idx - index of table containing the table name
-                                     table_head_idx if None
-        """
-        
-        unit_pattern = re.compile(r"\(\s*?단위")
-        unit_table_idx_list = []
-        for i, table in enumerate(table_list):
-            if re.search(unit_pattern, table.text) is not None:
-                unit_table_idx_list.append(i)
-                
-        if len(unit_table_idx_list) >= 2:
-            table_group_cnt = unit_table_idx_list[1] - unit_table_idx_list[0]
-            group_cnt_diff = []
-            for i in range(len(unit_table_idx_list)-1):
-                group_cnt_diff.append(unit_table_idx_list[i+1]
-                                      - unit_table_idx_list[i])
-            if table_group_cnt == 2: # each data set is composed of 2 tables
-                table_head_idx, table_main_idx = 0, 1
-                table_name_idx = table_head_idx
-            elif table_group_cnt == 3: # each data set is composed of 3 tables
-                table_head_idx, table_main_idx = 1, 2
-                table_name_idx = 0
-                if group_cnt_diff[:4] == [3, 3, 2, 2]: # case for 20000515000288
-                    table_head_idx, table_main_idx = 0, 1
-                    table_name_idx = table_head_idx
-            elif table_group_cnt == 4:
-                table_head_idx, table_main_idx = 0, 1
-                table_name_idx = table_head_idx
-        else: # if unit has not been found
-            """ TODO: add case when len(table_list) % 6 first """
-            if len(table_list) % 2 == 0:
-                table_group_cnt, table_head_idx, table_main_idx = 2, 0, 1
-                table_name_idx = table_head_idx
-            elif len(table_list) % 3 == 0:
-                table_group_cnt, table_head_idx, table_main_idx = 3, 1, 2
-                table_name_idx = 0
-        
-        # find the index of the table that contains the input pattern
-        table_idx = 0
-        pattern_found = False
-        if pattern is not None:
-            for idx in range(1, int(len(table_list)/table_group_cnt)):
-                name_table = table_list[table_group_cnt*idx + table_name_idx]
-                if re.search(pattern, name_table.text) is not None:
-                    table_idx = idx
-                    pattern_found = True
-                    break
-                # if the name is not written in the table
-                name_p = name_table.find_previous_sibling('p')
-                name_p_list = [name_p]
-                for _ in range(2):
-                    name_p = name_p.find_previous('p')
-                    name_p_list.append(name_p)
-                for name_p in name_p_list:
-                    if re.search(pattern, name_p.text) is not None:
-                        table_idx = idx
-                        pattern_found = True
-                        break
-                if pattern_found:
-                    break
-        return table_group_cnt, table_head_idx, table_main_idx, table_name_idx, table_idx
+        assert utils.page_pattern[target] is not None
+        return self.get_report_index(rcp_no).get_url(target)
     
     @staticmethod
     def get_table_unit(source, unit_target="money"):
@@ -181,112 +336,134 @@ class CompanyData:
             unit = ""
         return unit
     
-    def dart_page_source(self, rcp_no):
+    def dart_page_source(self, rcp_no, stock_num=True,
+                         statement_list=fieldSpec.STATEMENT_LIST):
         """ This function obtains the data source of input rcp_no
+            @param stock_num - whether to read the stock_num page
+            @param statement_list - statements to read from the fin_state
+                                    page, the page is not read if empty
             @return - dictionary containing sources of financial statements,
                       income statements, cash flow statements, business summary,
-                      and the units used in them
+                      and the units used in them (None if not read)
+                      fin_state_comment and finstate_summary ((source, unit))
+                      are LazySource fetched and parsed when first used
         """
-        rcp_exist = True
         # stock number source
-        url = self.dart_page_url(rcp_no, "stock_num")
-        try:
-            page_html = urlopen(url).read().decode('utf-8')
-        except:
-            print("warning : unable to read rcp for stock_num")
-            rcp_exist = False
-        
-        if rcp_exist:
-            page_html = utils.format_page_html(page_html)
-            stock_num_source = BeautifulSoup(page_html, "html.parser")
-        else:
-            stock_num_source = None
+        stock_num_source = None
+        if stock_num:
+            rcp_exist = True
+            try:
+                page_html = self.fetch_page(rcp_no, "stock_num")
+            except:
+                print("warning : unable to read rcp for stock_num")
+                rcp_exist = False
+            if rcp_exist:
+                page_html = utils.format_page_html(page_html)
+                stock_num_source = utils.make_soup(page_html, encoding='utf-8')
             
         no_conn = False # when "연결재무제표" has "해당내용 없음" as content
-        rcp_exist = True
-        url_page_list = ["conn_fin_state", "gen_fin_state", "unconn_fin_state",
-                         "gen_fin_state2",] # list of possible urls
-        for url_name in url_page_list:
-            url = self.dart_page_url(rcp_no, url_name)
-            if url is not None:
-                break
-        try:
-            page_html = urlopen(url).read().decode('utf-8')
-        except:
-            print("warning : unable to read rcp for fin_state")
-            rcp_exist = False
-        if rcp_exist:
-            page_html = utils.format_page_html(page_html)
-            fin_page_source = BeautifulSoup(page_html, "html.parser")
-            fin_page_tables = fin_page_source.findAll("table")
-        else:
-            fin_page_source = None
-            fin_page_tables = None
+        fin_page_source = None
+        fin_page_tables = None
+        if len(statement_list) != 0:
+            rcp_exist = True
+            url_page_list = ["conn_fin_state", "gen_fin_state",
+                             "unconn_fin_state", "gen_fin_state2",] # list of possible urls
+            for url_name in url_page_list:
+                url = self.dart_page_url(rcp_no, url_name)
+                if url is not None:
+                    break
+            try:
+                page_html = self.fetch_page(rcp_no, url_name)
+            except:
+                print("warning : unable to read rcp for fin_state")
+                rcp_exist = False
+            if rcp_exist:
+                page_html = utils.format_page_html(page_html).decode('utf-8')
+                fin_page_source = utils.make_soup(page_html)
+                fin_page_tables = dartTable.TableScanner(fin_page_source)
 
+        fin_state_source, fin_state_unit = None, None
+        inc_state_source, inc_state_unit = None, None
+        cash_state_source, cash_state_unit = None, None
         # if "연결재무제표" has no content, move to "재무제표"
         if fin_page_tables is not None:
-            if len(fin_page_tables) == 0:
+            if fin_page_tables.table_num == 0:
                 no_conn = True
-                url = self.dart_page_url(rcp_no, "unconn_fin_state")
-                page_html = urlopen(url).read().decode('utf-8')
-                page_html = utils.format_page_html(page_html)
-                fin_page_source = BeautifulSoup(page_html, "html.parser")
-                fin_page_tables = fin_page_source.findAll("table")
-            if len(fin_page_tables) % 2 != 0:
+                page_html = self.fetch_page(rcp_no, "unconn_fin_state")
+                page_html = utils.format_page_html(page_html).decode('utf-8')
+                fin_page_source = utils.make_soup(page_html)
+                fin_page_tables = dartTable.TableScanner(fin_page_source)
+            if fin_page_tables.table_num % 2 != 0:
                 print("warning - finstate table: the number of tables is odd")
             # finstate page may have a bordered announcement box at the top
-            if ("border" in fin_page_tables[0].attrs) and fin_page_tables[0].attrs["border"] == '1':
-                fin_page_tables.pop(0)
-            table_indices = self.get_target_table_idx(fin_page_tables)
-            table_group_cnt, table_head_idx, table_main_idx, table_name_idx, table_idx = table_indices
+            if fin_page_tables.is_bordered(0):
+                fin_page_tables.remove(0)
             
             # financial statement source is the first table of the page
-            fin_state_unit = self.get_table_unit(fin_page_tables[table_group_cnt*0 
-                                                                + table_head_idx])
-            fin_state_source = fin_page_tables[table_group_cnt*0 + table_main_idx]
+            if "fin_state" in statement_list:
+                head_table, fin_state_source = fin_page_tables.get_statement()
+                fin_state_unit = self.get_table_unit(head_table)
     
             # income statement table index is unknown so needs to be fetched
-            inc_state_pattern = re.compile(r'손\s*?익\s*?계\s*?산\s*?서')
-            table_indices = self.get_target_table_idx(fin_page_tables, inc_state_pattern)
-            table_group_cnt, table_head_idx, table_main_idx, table_name_idx, table_idx = table_indices
-            inc_state_unit = self.get_table_unit(fin_page_tables[table_group_cnt*table_idx
-                                                                + table_head_idx])
-            inc_state_source = fin_page_tables[table_group_cnt*table_idx + table_main_idx]
+            if "inc_state" in statement_list:
+                inc_state_pattern = re.compile(r'손\s*?익\s*?계\s*?산\s*?서')
+                head_table, inc_state_source = fin_page_tables.get_statement(inc_state_pattern)
+                inc_state_unit = self.get_table_unit(head_table)
             # cash statement table index is unknown so needs to be fetched
-            cash_state_pattern = re.compile(r'현.*?금.*?표')
-            table_indices = self.get_target_table_idx(fin_page_tables, cash_state_pattern)
-            table_group_cnt, table_head_idx, table_main_idx, table_name_idx, table_idx = table_indices
-            cash_state_unit = self.get_table_unit(fin_page_tables[table_group_cnt*table_idx
-                                                    + table_head_idx])
-            cash_state_source = fin_page_tables[table_group_cnt*table_idx
-                                                + table_main_idx]
-        else:
-            fin_state_source = None
-            fin_state_unit = None
-            inc_state_source = None
-            inc_state_unit = None
-            cash_state_source = None
-            cash_state_unit = None
+            if "cash_state" in statement_list:
+                cash_state_pattern = re.compile(r'현.*?금.*?표')
+                head_table, cash_state_source = fin_page_tables.get_statement(cash_state_pattern)
+                cash_state_unit = self.get_table_unit(head_table)
             
-        # financial statement comment source
+        source_dict = {
+            "stock_num": stock_num_source,
+            "fin_state": fin_state_source,
+            "fin_state_unit": fin_state_unit,
+            "inc_state": inc_state_source,
+            "inc_state_unit": inc_state_unit,
+            "cash_state": cash_state_source,
+            "cash_state_unit": cash_state_unit,
+            # the largest pages of a report are needed only when deprec_cost
+            # is not in the cash flow statement
+            "fin_state_comment": LazySource(self.get_comment_source, rcp_no,
+                                            no_conn, fin_page_source),
+            "finstate_summary": LazySource(self.get_summary_source, rcp_no),
+        }
+        return source_dict
+
+    def get_comment_source(self, rcp_no, no_conn, fin_page_source):
+        """ This function obtains the financial statement comment source
+            @param no_conn - True when "연결재무제표" has no content
+            @param fin_page_source - fin_state page used when the report has
+                                     no comment page
+            @return - source of "재무제표 주석" or "부속명세서", None if not found
+        """
         rcp_exist = True
+        fin_state_comment_source = None
         if no_conn:
-            url = self.dart_page_url(rcp_no, "unconn_fin_state_comment")
+            comment_target = "unconn_fin_state_comment"
         else:
-            url = self.dart_page_url(rcp_no, "conn_fin_state_comment")
+            comment_target = "conn_fin_state_comment"
+        url = self.dart_page_url(rcp_no, comment_target)
         if url is not None:
             try:
-                page_html = urlopen(url).read().decode('utf-8')
+                page_html = self.fetch_page(rcp_no, comment_target)
             except:
                 print("warning : unable to read rcp for finstate comment")
                 rcp_exist = False
             if rcp_exist:
                 page_html = utils.format_page_html(page_html)
-                fin_state_comment_source = BeautifulSoup(page_html, "html.parser")
+                fin_state_comment_source = utils.make_soup(page_html,
+                                                           encoding='utf-8')
         else:
-            # fin_state_comment_source = None
             fin_state_comment_source = fin_page_source
+        return fin_state_comment_source
 
+    def get_summary_source(self, rcp_no):
+        """ This function obtains the financial summary source
+            from "사업의 내용"
+            @return - (source, unit), source is None if not found
+        """
         # fin_state_summary_source (사업의 내용) is used when 
         # depreciation cost is not mentioned in other sections
         # find "재무현황" at p first then move on to the next table
@@ -300,13 +477,13 @@ class CompanyData:
         rcp_exist = True
         if url is not None:
             try:
-                page_html = urlopen(url).read().decode('utf-8')
+                page_html = self.fetch_page(rcp_no, "business_content")
             except:
                 print("warning - timeout: unable to read rcp for finstate summary")
                 rcp_exist = False
             if rcp_exist:
                 page_html = utils.format_page_html(page_html)
-                summary_source = BeautifulSoup(page_html, "html.parser")
+                summary_source = utils.make_soup(page_html, encoding='utf-8')
                 summary_p = summary_source.find('p', text=target_pattern)
                 if summary_p is not None: # if there exists "재무현황" section
                     unit_match = re.search(unit_pattern, summary_p.text)
@@ -337,26 +514,15 @@ class CompanyData:
                     else:
                         fin_state_summary_source = fin_state_summary_source.find_previous("table")
                         fin_state_summary_unit = ""
-
-        source_dict = {
-            "stock_num": stock_num_source,
-            "fin_state": fin_state_source,
-            "fin_state_unit": fin_state_unit,
-            "inc_state": inc_state_source,
-            "inc_state_unit": inc_state_unit,
-            "cash_state": cash_state_source,
-            "cash_state_unit": cash_state_unit,
-            "fin_state_comment": fin_state_comment_source,
-            "finstate_summary": fin_state_summary_source,
-            "finstate_summary_unit": fin_state_summary_unit,
-        }
-        return source_dict
+        return fin_state_summary_source, fin_state_summary_unit
     
     def parse_stock_num(self, source):
         """ This function parses stock number data from '주식의 총수' page
             @param source - html source to parse stock num from
         """
         pattern_list = utils.target_pattern_list["stock_num"]
+        target_pattern_td = utils.target_pattern["stock_num"].find(source, "td")
+        target_pattern_th = utils.target_pattern["stock_num"].find(source, "th")
         stock_num = None
         stock_num_found = False
         # get the unit of the table
@@ -370,8 +536,8 @@ class CompanyData:
         """ TODO
         identiry the type of format first than iterate through possible patterns
         """
-        for pattern in pattern_list:
-            td = source.find("td", text=re.compile(pattern))
+        for pattern_idx, pattern in enumerate(pattern_list):
+            td = target_pattern_td[pattern_idx]
             if td is not None:
                 tr = td.parent
                 th = source.find("th", text=re.compile("합계"))
@@ -392,7 +558,7 @@ class CompanyData:
                         break
                 else: # if there is no 합계 in the table head
                     # directly find pattern in the table head
-                    th = source.find("th", text=re.compile(pattern))
+                    th = target_pattern_th[pattern_idx]
                     idx = th.parent.findChildren().index(th)
                     stock_num_pattern = re.compile(r'(?P<stock_num>[0-9,]+)주?')
                     if th is not None:
@@ -405,7 +571,7 @@ class CompanyData:
 
             else: # if there is no <td> containing the pattern
                 # find the pattern in th
-                th = source.find("th", text=re.compile(pattern))
+                th = target_pattern_th[pattern_idx]
                 if th is not None:
                     tr = th.parent
                     tr_children = tr.findChildren()
@@ -430,8 +596,9 @@ class CompanyData:
                                    \s*?(?P<unit>\w?)\s*?주'''
                                    , re.MULTILINE | re.DOTALL | re.VERBOSE)]
             pattern_list = utils.target_pattern_list["stock_num_p"]
-            for pattern in pattern_list:
-                p = source.find("p", text=re.compile(pattern))
+            target_pattern_p = utils.target_pattern["stock_num_p"].find(source, "p")
+            for pattern_idx, pattern in enumerate(pattern_list):
+                p = target_pattern_p[pattern_idx]
                 if p is not None:
                     for target_pattern in target_pattern_list:
                         p_match = re.search(target_pattern, p.string)
@@ -451,10 +618,13 @@ class CompanyData:
                              in the source table multiple times
         """
         pattern_list = utils.target_pattern_list[target_name]
+        target_pattern = utils.target_pattern[target_name]
+        target_pattern_p = target_pattern.find(source, "p")
+        target_pattern_td = target_pattern.find(source, "td")
         target_val = None
         target_found = False
-        for pattern in pattern_list:
-            td_p = source.find("p", text=re.compile(pattern))
+        for pattern_idx, pattern in enumerate(pattern_list):
+            td_p = target_pattern_p[pattern_idx]
             if td_p is not None: # the table is in new format
                 tr = td_p.parent.parent
                 # for new fomats, number of columns in each row is either 3 or 4
@@ -468,7 +638,7 @@ class CompanyData:
             else: # the table is in old format
                 """ TODO - currently, two types of format are both used as 'old
                 format' so the two cases need to be divided """
-                td = source.find("td", text=re.compile(pattern))
+                td = target_pattern_td[pattern_idx]
                 if td is not None:
                     tr = td.parent
                     td_list = tr.findAll("td")
@@ -523,7 +693,7 @@ class CompanyData:
                                 print("warning - finstate: name_row > value_row")
                                 self.wrong_value_row = True
                         idx_list = [i for i, item in enumerate(name_list)
-                                    if re.search(pattern, item)]
+                                    if target_pattern.regex_list[pattern_idx].search(item)]
                         target_idx = idx_list[row_idx]
                         target_val = value_list[target_idx]
                         target_val = utils.num_format(target_val)
@@ -557,18 +727,18 @@ class CompanyData:
                        (list becasue there may exist multiple deprec_cost types)
         """
         pattern_list = utils.target_pattern_list["cost_type"]
-        cost_pattern_list = utils.target_pattern_list["deprec_cost"]
+        cost_target_pattern = utils.target_pattern["deprec_cost"]
+        target_pattern_p = utils.target_pattern["cost_type"].find(source, "p")
         target_list = []
         target_table_found = False
         acc_pattern = re.compile(r'누\s*?적')
 
-        for pattern in pattern_list:
-            head_p = source.find("p", text=re.compile(pattern))
+        for pattern_idx, pattern in enumerate(pattern_list):
+            head_p = target_pattern_p[pattern_idx]
             if head_p is not None:
                 cost_table = head_p.find_next("table")
                 table_unit = self.get_table_unit(cost_table)
-                for cost_pattern in cost_pattern_list:
-                    td = cost_table.find("td", text=re.compile(cost_pattern))
+                for td in cost_target_pattern.find(cost_table, "td"):
                     if td is not None:
                         target_table_found = True
                         break
@@ -585,8 +755,7 @@ class CompanyData:
                 else:
                     td_idx = 1
                     
-                for cost_pattern in cost_pattern_list:
-                    td_list = cost_table.findAll("td", text=re.compile(cost_pattern))
+                for td_list in cost_target_pattern.find_all(cost_table, "td"):
                     if len(td_list) == 0:
                         continue
                     for td in td_list:
@@ -601,12 +770,15 @@ class CompanyData:
     def parse_incstate(self, source, target_name, row_idx=0):
         """ This function parses target_name data from '손익계산서' """
         pattern_list = utils.target_pattern_list[target_name]
+        target_pattern = utils.target_pattern[target_name]
+        target_pattern_p = target_pattern.find(source, "p")
+        target_pattern_td = target_pattern.find(source, "td")
         target_val = None
         target_found = False
-        for pattern in pattern_list:
+        for pattern_idx, pattern in enumerate(pattern_list):
             # the right pattern found when breaking out from the loop
             valid_pattern = pattern
-            td_p = source.find("p", text=re.compile(pattern))
+            td_p = target_pattern_p[pattern_idx]
             if td_p is not None: # the table is in new format
                 tr = td_p.parent.parent
                 table_head = tr.parent.parent.find("thead")
@@ -623,7 +795,7 @@ class CompanyData:
                 break
             
             else: # the table is in old format
-                td = source.find("td", text=re.compile(pattern))
+                td = target_pattern_td[pattern_idx]
                 if td is not None:
                     tr = td.parent
                     td_list = tr.findAll("td")
@@ -657,7 +829,7 @@ class CompanyData:
                         name_list = tr.find("td").string.split('\n')
                         # list of indexs that match the names
                         idx_list = [i for i, item in enumerate(name_list)
-                                                if re.search(pattern, item)]
+                                                if target_pattern.regex_list[pattern_idx].search(item)]
                         target_idx = idx_list[row_idx]
                         value_list = td_list[td_index].string.split('\n')
 
@@ -694,13 +866,16 @@ class CompanyData:
             row 2 is the value for the last whole year for 사업보고서
         """
         pattern_list = utils.target_pattern_list[target_name]
+        target_pattern = utils.target_pattern[target_name]
+        target_pattern_p = target_pattern.find_all(source, "p")
+        target_pattern_td = target_pattern.find_all(source, "td")
         target_list = []
         table_tr_num = len(source.findAll("tr"))
         # the number of tr's to decide whether the format is old or new
         tr_threshold = 4
 
-        for pattern in pattern_list:
-            td_p_list = source.findAll("p", text=re.compile(pattern))
+        for pattern_idx, pattern in enumerate(pattern_list):
+            td_p_list = target_pattern_p[pattern_idx]
             if table_tr_num > tr_threshold:
                 if len(td_p_list) != 0: # new format (연결재무제표)
                     for td_p in td_p_list:
@@ -724,7 +899,7 @@ class CompanyData:
                             target_list.append(utils.num_format(tr.findAll("p")[p_idx].text))
                     break
                 else: # new format but in 재무제표 section
-                    td_list = source.findAll("td", text=re.compile(pattern))
+                    td_list = target_pattern_td[pattern_idx]
                     if len(td_list) != 0: # new format
                         for td in td_list:
                             tr = td.parent
@@ -758,7 +933,7 @@ class CompanyData:
                                 target_list.append(utils.num_format(tr.findAll("td")[td_idx].text))
                         break
             else: # old format that uses td as column
-                td = source.find("td", text=re.compile(pattern))
+                td = target_pattern_td[pattern_idx][0] if target_pattern_td[pattern_idx] else None
                 if td is not None:
                     tr = td.parent
                     td_list = tr.findAll("td")
@@ -784,7 +959,7 @@ class CompanyData:
                     name_list = tr.find("td").string.split('\n')
                     # list of indexs that match the names
                     idx_list = [i for i, item in enumerate(name_list)
-                                            if re.search(pattern, item)]
+                                            if target_pattern.regex_list[pattern_idx].search(item)]
                     for idx in idx_list:
                         if acc_col_exist:
                             td_idx = 2
@@ -803,6 +978,7 @@ class CompanyData:
                       list because there exist multiple types of deprec_cost
         """
         pattern_list = utils.target_pattern_list[target_name]
+        target_pattern_td = utils.target_pattern[target_name].find(source, "td")
         head_pattern_list = [re.compile(r"당[반분]?기\s*?$"),
                              re.compile(r"[0-9]+\s*?년")]
         target_list = []
@@ -833,8 +1009,8 @@ class CompanyData:
                 print("warning - finstate_summary: data in years")
                 td_idx -= 1
 
-        for pattern in pattern_list:
-            target_td = source.find("td", text=re.compile(pattern))
+        for pattern_idx, pattern in enumerate(pattern_list):
+            target_td = target_pattern_td[pattern_idx]
             if target_td is not None:
                 target_val = target_td.parent.findAll("td")[td_idx+1].string
                 target_val = utils.num_format(target_val).replace('(', '-').replace(')', '') + unit
@@ -844,6 +1020,10 @@ class CompanyData:
 
     def dart_crawl_target(self, rcp_no, source, unit, target, source_name=None):
         """ This function parses the target data from dart page
+            Statement targets (asset, liabilities, equity, net_income and
+            deprec_cost of cash statement) are read by an ExtractionPlan in
+            dart_crawl_report, and their branches here are the reference of
+            benchmark.check_statement_matrix
             @param source_name - name of source used when there exists multiple
                                  possible sources for one target
         """
@@ -1042,16 +1222,273 @@ class CompanyData:
                     target_data = '0'
         return target_data
     
-    def stock_price_crawl(self, read_data=False, write_data=False, write_raw=False):
+    @staticmethod
+    def get_statement_matrix(source, unit):
+        """ This function converts the statement table into a numeric matrix
+            @return - dartTable.StatementMatrix, None if source is None
+        """
+        if source is None:
+            return None
+        return dartTable.StatementMatrix(source, unit)
+
+    @staticmethod
+    def to_report_value(value):
+        """ This function converts the value into the string of report_dict
+            @return - value in string, "" if value is None
+        """
+        return "" if value is None else str(value)
+
+    @classmethod
+    def get_extraction_plan(cls, target_list=None):
+        """ This function returns the ExtractionPlan reading the statement
+            fields of the report targets
+            @param target_list - report targets in REPORT_TARGET_LIST,
+                                 every target if None
+        """
+        target_list = tuple(cls.REPORT_TARGET_LIST if target_list is None
+                            else target_list)
+        if target_list not in cls.extraction_plan_dict:
+            field_list = [field for target in target_list
+                          for field in cls.TARGET_FIELD_DICT[target]]
+            cls.extraction_plan_dict[target_list] = \
+                fieldSpec.ExtractionPlan(field_list)
+        return cls.extraction_plan_dict[target_list]
+
+    @classmethod
+    def get_report_target_list(cls, field_list=None):
+        """ This function obtains what has to be crawled for the fields
+            @param field_list - ratio names (finData.RATIO_LIST) or raw column
+                                names, every column if None
+            @return - (list of report targets, whether stock prices are needed)
+        """
+        if field_list is None:
+            return list(cls.REPORT_TARGET_LIST), True
+        target_set = set(cls.COLUMN_TARGET_DICT[column] for column
+                         in finData.get_raw_column_list(field_list))
+        return ([target for target in cls.REPORT_TARGET_LIST
+                 if target in target_set], "price" in target_set)
+
+    def get_matrix_dict(self, source_dict, plan):
+        """ This function converts the statements needed by the plan
+            @param source_dict - output of dart_page_source
+            @param plan - fieldSpec.ExtractionPlan
+            @return - dictionary of statement: StatementMatrix or None
+        """
+        return {statement: self.get_statement_matrix(source_dict[statement],
+                                        source_dict[statement + "_unit"])
+                for statement in plan.statement_list}
+
+    def crawl_fields(self, rcp_no, field_list):
+        """ This function reads any fields declared in fieldSpec from the
+            statements of input rcp_no, e.g. revenue, operating_income, capex
+            @param field_list - names of fields in fieldSpec.FIELD_SPEC_DICT
+            @return - dictionary of field name: value in int (None if the
+                      field is not found)
+        """
+        plan = fieldSpec.ExtractionPlan(field_list)
+        source_dict = self.dart_page_source(rcp_no)
+        return plan.extract(self.get_matrix_dict(source_dict, plan))
+
+    def crawl_asset(self, field_dict):
+        """ This function obtains asset values from the fields of "대차대조표"
+            noncurr_asset or total_asset not found is calculated from the
+            others
+            @param field_dict - output of fieldSpec.ExtractionPlan.extract
+            @return - (curr_asset, noncurr_asset, total_asset) in int
+                      None for the values not found
+        """
+        curr_asset = field_dict["curr_asset"]
+        noncurr_asset = field_dict["noncurr_asset"]
+        total_asset = field_dict["total_asset"]
+        if noncurr_asset is None and None not in (curr_asset, total_asset):
+            noncurr_asset = total_asset - curr_asset
+        if total_asset is None and None not in (curr_asset, noncurr_asset):
+            total_asset = curr_asset + noncurr_asset
+        elif None not in (curr_asset, noncurr_asset, total_asset) and \
+             total_asset != curr_asset + noncurr_asset:
+            print("warning - asset: total_asset != curr_asset + noncurr_asset")
+        return (curr_asset, noncurr_asset, total_asset)
+
+    def crawl_liabilities(self, field_dict):
+        """ This function obtains liability values from the fields of
+            "대차대조표"
+            @return - (curr_liabilities, noncurr_liabilities,
+                       total_liabilities) in int, None for the values not found
+        """
+        curr_liab = field_dict["curr_liabilities"]
+        noncurr_liab = field_dict["noncurr_liabilities"]
+        total_liab = field_dict["total_liabilities"]
+        if None not in (curr_liab, noncurr_liab, total_liab) and \
+           total_liab != curr_liab + noncurr_liab:
+            print("warning - asset: total_liab != curr_liab + noncurr_liab")
+        return (curr_liab, noncurr_liab, total_liab)
+
+    def crawl_equity(self, field_dict):
+        """ This function obtains equity of the controlling company, i.e.
+            total equity minus non-controlling interest, from "대차대조표"
+            @return - equity in int, None if not found
+        """
+        total_equity = field_dict["total_equity"]
+        minor_equity = field_dict["minor_equity"]
+        if total_equity is None or minor_equity is None:
+            return total_equity
+        return total_equity - minor_equity
+
+    def crawl_net_income(self, field_dict):
+        """ This function obtains net income of the controlling company
+            from the fields of "손익계산서"
+            @return - net income in int (accumulated in the year for 분기/반기
+                      보고서), None if not found
+        """
+        total_income = field_dict["total_income"]
+        minor_income = field_dict["minor_income"]
+        major_income = field_dict["major_income"]
+        if None in (total_income, minor_income, major_income):
+            return total_income
+        # make sure major_income + minor_income = total_income
+        if total_income == major_income + minor_income:
+            return major_income if major_income != 0 else total_income
+        # when minor_income(비지배지분) equals major_income(지배지분) by error
+        elif total_income == major_income and major_income == minor_income:
+            print("warning - net_income : major_income == minor_income")
+            return total_income
+        elif total_income == major_income:
+            print("warning - net_income: total_income == major_income")
+            return total_income
+        elif major_income == 0 and minor_income == 0:
+            return total_income
+        return major_income
+    
+    @staticmethod
+    def get_price_stats(price_list):
+        """ This function calculates the statistics of prices in a period
+            @return - [mean, median, max, min, stdev] of price_list
+        """
+        return [utils.price_mean_list(price_list),
+                utils.price_median_list(price_list),
+                utils.price_max_list(price_list),
+                utils.price_min_list(price_list),
+                utils.price_stdev_list(price_list)]
+
+    @staticmethod
+    def parse_price_page(page_html):
+        """ This function parses daily prices in a sise_day page
+            @return - list of [date, end, start, high, low, volume]
+                      in descending order of date
+        """
+        stock_source = utils.make_soup(page_html)
+        row_list = []
+        for day_data in stock_source.find_all("tr"):
+            if day_data.span is not None:
+                date = day_data.find_all('td', align='center')[0].text
+                # data_list = [end, change, start, high, low, volume]
+                data_list = day_data.find_all('td', class_='num')
+                del data_list[1] # remove price_change
+                data_list = list(map(lambda x: x.text.replace(',', ''),
+                                     data_list))
+                row_list.append([date] + data_list)
+        return row_list
+
+    def get_price_period(self, date):
+        """ This function returns the period whose prices include the date
+            i.e. the quarter for quarterly data, "YYYY-4" for yearly data
+            @param date - "YYYY.MM.DD"
+        """
+        if self.data_target == 2:
+            return utils.get_year(date)
+        return utils.get_quarter(date)
+
+    def stock_price_update(self, url, max_pgnum, price_ttl):
+        """ This function appends the prices after the last date in
+            raw_stock_data table and recalculates the periods that changed
+            Pages are crawled from the newest until the last stored date
+        """
+        raw_row_list = finStore.read_rows(self.stock_code, "raw_stock_data",
+                                          self.file_format)
+        if len(raw_row_list) == 0:
+            # raw data left empty e.g. by an interrupted first crawl
+            print("warning - raw_stock_data of %s is empty, crawling every price"
+                  % self.stock_code)
+            self.stock_price_crawl(write_data=True, write_raw=True,
+                                   price_ttl=price_ttl)
+            return
+        last_date = raw_row_list[-1][0]
+        
+        # crawl from the newest page until the last stored date is reached
+        new_row_list = []
+        found_last_date = False
+        for pgnum in range(1, max_pgnum + 1):
+            data_url = url + "&page=%d" % pgnum
+            html = webClient.fetch(data_url, ttl=price_ttl)
+            for row in self.parse_price_page(html):
+                # date is "YYYY.MM.DD" so it can be compared as string
+                if row[0] <= last_date:
+                    found_last_date = True
+                    break
+                new_row_list.append(row)
+            if found_last_date:
+                break
+        new_row_list.reverse()
+        print("%d new days of price for code %s" % (len(new_row_list),
+                                                     self.stock_code))
+        
+        # periods in stock data have been complete and remain the same, and
+        # the last period in raw data is not written
+        # raw data may have been extended by the crawl of the other
+        # data_target, so the periods after the last stored one are
+        # recalculated rather than the period of last_date
+        data_row_list = finStore.read_rows(self.stock_code,
+                                           self.stock_table_name,
+                                           self.file_format)
+        last_period = (utils.period_key(data_row_list[-1][0])
+                       if len(data_row_list) != 0 else (0, 0))
+        curr_quarter, price_temp_list = None, []
+        for row in raw_row_list + new_row_list:
+            quarter = self.get_price_period(row[0])
+            if utils.period_key(quarter) <= last_period:
+                continue
+            if quarter != curr_quarter and curr_quarter is not None:
+                data_row_list.append([curr_quarter]
+                                     + self.get_price_stats(price_temp_list))
+                price_temp_list = []
+            curr_quarter = quarter
+            price_temp_list.append(int(row[1]))
+        
+        # stock data is replaced atomically before appending raw data,
+        # so that an interrupted update is recalculated by the next update
+        finStore.write_rows(self.stock_code, self.stock_table_name,
+                            data_row_list, self.file_format)
+        finStore.append_rows(self.stock_code, "raw_stock_data", new_row_list,
+                             self.file_format)
+        
+        for row in data_row_list:
+            self.stock_price_mean_list.append(row[1])
+            self.stock_price_median_list.append(row[2])
+            self.stock_price_max_list.append(row[3])
+            self.stock_price_min_list.append(row[4])
+            self.stock_price_stdev_list.append(row[5])
+
+    def stock_price_crawl(self, read_data=False, write_data=False, write_raw=False,
+                          update=False, price_ttl=None, max_workers=8):
         """ This function crawls past stock prices from Naver Finance page
-        TODO: add reading raw stock price data csv file and updating data
+            Prices are aggregated for each quarter, or for each year
+            if data_target is 2, into stock_data (stock_data_yr) table
+            @param update - appends prices after the last date in raw data
+                            and updates stock data
+                            both raw_stock_data and stock_data files must exist
+            @param price_ttl - seconds for which cached price pages are used
+                               webClient.PRICE_TTL if None
+            @param max_workers - number of threads downloading price pages
         """
-        url = "http://finance.naver.com/item/sise_day.nhn?code=" + self.stock_code
-        page_html = urlopen(url).read()
-        source = BeautifulSoup(page_html, "html.parser")
-        # find the page number of the last page
-        max_pg_href = source.find_all("td", class_="pgRR")[0].a.get("href")
-        max_pgnum = int(max_pg_href[max_pg_href.index("page=")+5:])
+        if price_ttl is None:
+            price_ttl = webClient.PRICE_TTL
+        url = self.PRICE_URL + self.stock_code
+        if update or not read_data:
+            page_html = webClient.fetch(url, ttl=price_ttl)
+            source = utils.make_soup(page_html)
+            # find the page number of the last page
+            max_pg_href = source.find_all("td", class_="pgRR")[0].a.get("href")
+            max_pgnum = int(max_pg_href[max_pg_href.index("page=")+5:])
         price_temp_list = []
         self.stock_price_mean_list = []
         self.stock_price_median_list = []
@@ -1059,298 +1496,720 @@ class CompanyData:
         self.stock_price_min_list = []
         self.stock_price_stdev_list = []
         
-        if read_data:
-            filename = "stock_data_%s.csv" % self.stock_code
-            with open(os.path.join(self.COMPANY_DIR, filename),
-                      'r', newline='') as price_file:
-                fr = csv.reader(price_file, delimiter=',', quotechar='|')
-                next(fr)
-                for row in fr:
-                    self.stock_price_mean_list.append(row[1])
-                    self.stock_price_median_list.append(row[2])
-                    self.stock_price_max_list.append(row[3])
-                    self.stock_price_min_list.append(row[4])
-                    self.stock_price_stdev_list.append(row[5])
+        if update:
+            print("Updating price for code %s" % self.stock_code)
+            self.stock_price_update(url, max_pgnum, price_ttl)
+        elif read_data:
+            for row in finStore.read_rows(self.stock_code,
+                                          self.stock_table_name,
+                                          self.file_format):
+                self.stock_price_mean_list.append(row[1])
+                self.stock_price_median_list.append(row[2])
+                self.stock_price_max_list.append(row[3])
+                self.stock_price_min_list.append(row[4])
+                self.stock_price_stdev_list.append(row[5])
                     
         else:
             print("Crawling price for code %s" % self.stock_code)
-            if write_raw:
-                print("Writing stock price raw data \
-                      for code %s" % self.stock_code)
-                raw_filename = "raw_stock_data_%s.csv" % self.stock_code
-                raw_stock_file = open(os.path.join(self.COMPANY_DIR,
-                                      raw_filename), 'w', newline='')
-                raw_wr = csv.writer(raw_stock_file, delimiter=',',
-                                    quotechar='|', quoting=csv.QUOTE_MINIMAL)
-            if write_data:
-                print("Writing stock price data for code %s" % self.stock_code)
-                data_filename = "stock_data_%s.csv" % self.stock_code
-                data_file = open(os.path.join(self.COMPANY_DIR, data_filename),
-                                 'w', newline='')
-                wr = csv.writer(data_file, delimiter=',',
-                                quotechar='|', quoting=csv.QUOTE_MINIMAL)
-                header_row = ["period", "price_mean", "price_median",
-                              "price_max", "price_min", "price_stdev"]
-                wr.writerow(header_row)
+            # rows of raw_stock_data and stock_data tables
+            raw_row_list, data_row_list = [], []
                   
-            data_url = url + "&page=%d" % max_pgnum
-            html = urlopen(data_url)
-            stock_source = BeautifulSoup(html.read(), "html.parser")
-            found_start_yr = False
-            start_yr_changed = False
-            day_list = stock_source.find_all("tr")
-            
-            # find the first year of company's stock price and change
-            # curr_quarter to the company's first public year if
-            # it is after year 2000
-            while not found_start_yr:
-                for day_data in reversed(day_list):
-                    if day_data.span is not None:
-                        date = day_data.find_all('td',
-                                                 align='center')[0].text
-                        company_start_yr = int(date.split('.')[0])
-                        if company_start_yr > self.start_yr:
-                            curr_quarter = utils.get_quarter(date)
-                            start_yr_changed = True
-                        elif company_start_yr == self.start_yr:
-                            company_start_mth = int(date.split('.')[1])
-                            if company_start_mth > 3:
-                                curr_quarter = utils.get_quarter(date)
-                                start_yr_changed = True
-                        found_start_yr = True
-                        break
-            # if the company's first year for stock price is before year 2000
-            if not start_yr_changed:
-                curr_quarter = "%d-1" % self.start_yr
-
-            # get stock price info in ascending order of date
-            for pgnum in range(max_pgnum, 0, -1):
-                data_url = url + "&page=%d" % pgnum
-                html = urlopen(data_url)
-                stock_source = BeautifulSoup(html.read(), "html.parser")
-                day_list = stock_source.find_all("tr")
-
-                for day_data in reversed(day_list):
-                    if day_data.span is not None:
-                        date = day_data.find_all('td',
-                                                 align='center')[0].text
+            # pages are downloaded and parsed concurrently, and map yields
+            # them from the last page (oldest) to the first page (newest)
+            fetch_page = lambda pgnum: self.parse_price_page(
+                webClient.fetch(url + "&page=%d" % pgnum, ttl=price_ttl))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                page_iter = executor.map(fetch_page, range(max_pgnum, 0, -1))
+                for page_idx, row_list in enumerate(page_iter):
+                    if page_idx == 0:
+                        # find the first year of company's stock price and
+                        # change curr_quarter to the company's first public
+                        # year if it is after year 2000
+                        curr_quarter = self.get_price_period(
+                                                    "%d.01.01" % self.start_yr)
+                        if len(row_list) != 0:
+                            date = row_list[-1][0]
+                            company_start_yr = int(date.split('.')[0])
+                            if company_start_yr > self.start_yr:
+                                curr_quarter = self.get_price_period(date)
+                            elif company_start_yr == self.start_yr:
+                                company_start_mth = int(date.split('.')[1])
+                                if company_start_mth > 3:
+                                    curr_quarter = self.get_price_period(date)
+
+                    # get stock price info in ascending order of date
+                    for row in reversed(row_list):
+                        date, data_list = row[0], row[1:]
                         # only get data after input start_yr
                         if int(date.split('.')[0]) < self.start_yr:
                             continue
-    
-                        # data_list = [end, change, start, high, low, volume] 
-                        data_list = day_data.find_all('td',
-                                                       class_='num')
-                        del data_list[1] # remove price_change
-                        data_list = list(map(lambda x: x.text.replace(',', ''),
-                                             data_list))
                         end_price = int(data_list[0])
                         if write_raw:
-                            raw_wr.writerow([date] + data_list)
+                            raw_row_list.append(row)
                         # add price to list unitl the quarter changes
-                        if utils.get_quarter(date) == curr_quarter:
+                        if self.get_price_period(date) == curr_quarter:
                             price_temp_list.append(end_price)
-                        # when the quarter changes, write average price for the
-                        # quarter on csv
+                        # when the quarter changes, add average price for the
+                        # quarter
                         else:
-                            price_mean = utils.price_mean_list(price_temp_list)
+                            price_stats = self.get_price_stats(price_temp_list)
+                            price_mean, price_median, price_max = price_stats[:3]
+                            price_min, price_stdev = price_stats[3:]
                             self.stock_price_mean_list.append(price_mean)
-                            price_median = utils.price_median_list(price_temp_list)
                             self.stock_price_median_list.append(price_median)
-                            price_max = utils.price_max_list(price_temp_list)
                             self.stock_price_max_list.append(price_max)
-                            price_min = utils.price_min_list(price_temp_list)
                             self.stock_price_min_list.append(price_min)
-                            price_stdev = utils.price_stdev_list(price_temp_list)
                             self.stock_price_stdev_list.append(price_stdev)
                             if write_data:
-                                wr.writerow([curr_quarter, price_mean,
-                                             price_median, price_max,
-                                             price_min, price_stdev])
+                                data_row_list.append([curr_quarter] + price_stats)
                             # reset price_temp_list and curr_quarter as the
                             # quarter changed in this loop
                             price_temp_list = [end_price]
-                            curr_quarter = utils.get_quarter(date)
+                            curr_quarter = self.get_price_period(date)
             
             if write_data:
-                data_file.close()
+                print("Writing stock price data for code %s" % self.stock_code)
+                finStore.write_rows(self.stock_code, self.stock_table_name,
+                                    data_row_list, self.file_format)
             if write_raw:
-                raw_stock_file.close()
+                print("Writing stock price raw data for code %s" % self.stock_code)
+                finStore.write_rows(self.stock_code, "raw_stock_data",
+                                    raw_row_list, self.file_format)
                 
         
             
         print("Crawled price for code %s" % self.stock_code)
 
-    def dart_crawl(self, update=False, debug=False, debug_list=[]):
-        """ This function crawls all the necessary data from DART
-            @param debug - whether to turn on debug mode
-            @param debug_list - list of rcp_no's to crawl
-        TODO: implement updating data on existing file
+    def prefetch_report(self, rcp_no, target_list=None):
+        """ This function downloads the pages of input rcp_no used by
+            dart_page_source so that parsing does not wait for network
+            Errors are ignored here and reported again when the page is parsed
+            @param target_list - report targets to crawl, every target if None
+            @return - rcp_no
         """
-        debug_rcp_no_list = debug_list
+        try:
+            report_index = self.get_report_index(rcp_no)
+        except Exception:
+            return rcp_no
+        if target_list is None:
+            target_list = self.REPORT_TARGET_LIST
+        # comment, business_content and unconn_fin_state (read only when
+        # the consolidated page has no table) pages are fetched when they
+        # are used
+        page_list = []
+        if "stock_num" in target_list:
+            page_list.append("stock_num")
+        if len(self.get_extraction_plan(target_list).statement_list) != 0:
+            # only the first existing fin_state page is used
+            for url_name in ["conn_fin_state", "gen_fin_state",
+                             "unconn_fin_state", "gen_fin_state2"]:
+                if report_index.get_url(url_name) is not None:
+                    page_list.append(url_name)
+                    break
+        # without response cache and archive, the pages are kept in memory
+        # until they are parsed so that they are not downloaded again
+        keep_page = webClient.cache is None and self.archive is None
+        for target in page_list:
+            if report_index.get_url(target) is None:
+                continue
+            try:
+                page_html = self.fetch_page(rcp_no, target)
+            except Exception:
+                continue
+            if keep_page:
+                self.prefetch_dict[(rcp_no, target)] = page_html
+        return rcp_no
 
-        curr_asset_list, noncurr_asset_list, total_asset_list = [], [], []
-        curr_liab_list, noncurr_liab_list, total_liab_list = [], [], []
-        equity_list, net_income_list, deprec_cost_list = [], [], []
-        stock_num_list = []
-        
-        stock_data_file = os.path.join(self.COMPANY_DIR,
-                                       "stock_data_%s.csv" % self.stock_code)
-        if os.path.isfile(stock_data_file):
-            price_data_write, read_csv = False, True
-        else:
-            price_data_write, read_csv = True, False
-        stock_data_raw_file = os.path.join(self.COMPANY_DIR,
-                                    "raw_stock_data_%s.csv" % self.stock_code)
-        if os.path.isfile(stock_data_raw_file):
-            price_raw_write = False
-        else:
-            price_raw_write = True
-        self.stock_price_crawl(read_data=read_csv, write_data=price_data_write,
-                               write_raw=price_raw_write);
+    def reset_warning(self):
+        """ This function resets the attributes that manage printing of
+            warning messages in parsing, so that each warning is printed
+            once per report
+        """
+        self.wrong_name_row, self.wrong_value_row = False, False
+        self.wrong_thead_num, self.inc_wrong_name_row = False, False
+        self.cash_wrong_name_row = False
+
+    def get_warning_state(self):
+        """ This function returns the warning attributes of the report being
+            parsed, to be restored by set_warning_state
+        """
+        return (self.wrong_name_row, self.wrong_value_row,
+                self.wrong_thead_num, self.inc_wrong_name_row,
+                self.cash_wrong_name_row)
+
+    def set_warning_state(self, warning_state):
+        """ This function restores the warning attributes of a report
+            @param warning_state - output of get_warning_state
+        """
+        (self.wrong_name_row, self.wrong_value_row, self.wrong_thead_num,
+         self.inc_wrong_name_row, self.cash_wrong_name_row) = warning_state
+
+    def dart_crawl_report(self, rcp_no, target_list=None, executor=None):
+        """ This function crawls the financial data of input rcp_no
+            Only the pages and statements needed for target_list are read
+            @param target_list - report targets in REPORT_TARGET_LIST,
+                                 every target if None
+            @param executor - thread pool downloading pages, if given and
+                              deprec_cost is not in the cash flow statement,
+                              the comment page is loaded by the pool and
+                              deprec_cost is a LazySource to be resolved by
+                              resolve_report
+            @return - dictionary of target name: value
+                      (targets not in target_list are not included)
+        """
+        if target_list is None:
+            target_list = self.REPORT_TARGET_LIST
+        self.reset_warning()
+        print("rcp %s processing" % rcp_no)
+        plan = self.get_extraction_plan(target_list)
+        source_dict = self.dart_page_source(rcp_no,
+                                stock_num="stock_num" in target_list,
+                                statement_list=plan.statement_list)
+        report_dict = {}
         
-        self.debug = debug
-        if debug:
-            rcp_iter_list = debug_rcp_no_list
-        else:
-            rcp_iter_list = self.rcp_no_list
-            
-        for rcp_no in rcp_iter_list:
-            # attributes to manage printing of warning messages in parsing
-            self.wrong_name_row, self.wrong_value_row = False, False
-            self.wrong_thead_num, self.inc_wrong_name_row = False, False
-            self.cash_wrong_name_row = False
-            print("rcp %s processing" % rcp_no)
-            source_dict = self.dart_page_source(rcp_no)
-            stock_num_source = source_dict["stock_num"]
-            fin_state_source = source_dict["fin_state"]
-            inc_state_source = source_dict["inc_state"]
-            fin_state_unit = source_dict["fin_state_unit"]
-            inc_state_unit = source_dict["inc_state_unit"]
-            fin_state_comment_source = source_dict["fin_state_comment"]
-            cash_state_source = source_dict["cash_state"]
-            cash_state_unit = source_dict["cash_state_unit"]
-            fin_state_summary_source = source_dict["finstate_summary"]
-            fin_state_summary_unit = source_dict["finstate_summary_unit"]
-            
-            stock_num = self.dart_crawl_target(rcp_no, stock_num_source,
+        if "stock_num" in target_list:
+            stock_num = self.dart_crawl_target(rcp_no, source_dict["stock_num"],
                                                None, "stock_num")
-            stock_num_list.append(stock_num)
+            report_dict["stock_num"] = stock_num
             if self.debug:
                 print("processed data - stock_num: %s" % stock_num)
-    
-            asset = self.dart_crawl_target(rcp_no, fin_state_source,
-                                           fin_state_unit, "asset")
-            if asset is None:
-                curr_asset_list.append("")
-                noncurr_asset_list.append("")
-                total_asset_list.append("")
-            else:
-                curr_asset_list.append(asset[0])
-                noncurr_asset_list.append(asset[1])
-                total_asset_list.append(asset[2])
+
+        # every field of the statements is read in one pass over each table
+        field_dict = plan.extract(self.get_matrix_dict(source_dict, plan))
+
+        if "asset" in target_list:
+            asset = self.crawl_asset(field_dict)
+            report_dict["curr_asset"] = self.to_report_value(asset[0])
+            report_dict["noncurr_asset"] = self.to_report_value(asset[1])
+            report_dict["total_asset"] = self.to_report_value(asset[2])
             if self.debug:
                 print("processed data - curr_asset: %s, noncurr_asset: %s, total_asset: %s" % asset)
-    
-            liabilities = self.dart_crawl_target(rcp_no, fin_state_source,
-                                                 fin_state_unit, "liabilities")
-            if liabilities is None:
-                curr_liab_list.append("")
-                noncurr_liab_list.append("")
-                total_liab_list.append("")
-            else:
-                curr_liab_list.append(liabilities[0])
-                noncurr_liab_list.append(liabilities[1])
-                total_liab_list.append(liabilities[2])
+
+        if "liabilities" in target_list:
+            liabilities = self.crawl_liabilities(field_dict)
+            report_dict["curr_liabilities"] = self.to_report_value(liabilities[0])
+            report_dict["noncurr_liabilities"] = self.to_report_value(liabilities[1])
+            report_dict["total_liabilities"] = self.to_report_value(liabilities[2])
             if self.debug:
                 print("processed data - curr_liabilities: %s, noncurr_liabilities: %s, total_liabilities: %s" % liabilities)
-            
-            equity = self.dart_crawl_target(rcp_no, fin_state_source,
-                                            fin_state_unit, "equity")
-            if equity is None:
-                equity_list.append("")
-            else:
-                equity_list.append(equity)
+        
+        if "equity" in target_list:
+            equity = self.crawl_equity(field_dict)
+            report_dict["equity"] = self.to_report_value(equity)
             if self.debug:
                 print("processed data - equity: %s" % equity)
-            
-            net_income = self.dart_crawl_target(rcp_no, inc_state_source,
-                                            inc_state_unit, "net_income")
-            if net_income is None:
-                net_income_list.append("")
-            else:
-                net_income_list.append(net_income)
+        
+        if "net_income" in target_list:
+            net_income = self.crawl_net_income(field_dict)
+            report_dict["net_income"] = self.to_report_value(net_income)
             if self.debug:
                 print("processed data - net_income: %s" % net_income)
-            
-            deprec_cost = self.dart_crawl_target(rcp_no, cash_state_source,
-                                                 cash_state_unit, "deprec_cost")
+        
+        if "deprec_cost" in target_list:
+            deprec_cost = LazySource(self.crawl_deprec_cost, rcp_no,
+                                     source_dict, field_dict)
+            if executor is not None and field_dict["cash_deprec_cost"] is None:
+                source_dict["fin_state_comment"].submit(executor)
+                report_dict["deprec_cost"] = deprec_cost
+            else:
+                report_dict["deprec_cost"] = self.to_report_value(
+                                                deprec_cost.get())
+        return report_dict
 
+    def resolve_report(self, report_dict, warning_state=None):
+        """ This function reads deprec_cost left as LazySource by
+            dart_crawl_report from the fallback pages
+            @param warning_state - warning attributes of the report when
+                                   dart_crawl_report returned, restored while
+                                   the fallback pages are parsed since other
+                                   reports may have been parsed since then
+        """
+        if not isinstance(report_dict.get("deprec_cost"), LazySource):
+            return
+        curr_warning_state = self.get_warning_state()
+        if warning_state is not None:
+            self.set_warning_state(warning_state)
+        try:
+            report_dict["deprec_cost"] = self.to_report_value(
+                                            report_dict["deprec_cost"].get())
+        finally:
+            self.set_warning_state(curr_warning_state)
+
+    def crawl_deprec_cost(self, rcp_no, source_dict, field_dict):
+        """ This function obtains depreciation cost from the cash flow
+            statement, then from "재무제표 주석" or "부속명세서", then from
+            "사업의 내용", fetching the later pages only when needed
+            @return - deprec_cost in string, None if not found
+        """
+        deprec_cost = field_dict["cash_deprec_cost"]
+        if self.debug:
+            print("deprec_cost(cashstate): %s" % deprec_cost)
+        if deprec_cost is not None:
+            deprec_cost = str(deprec_cost)
+
+        if deprec_cost is None:
+            # if "재무제표 주석" or "부속명세서" exists
+            fin_state_comment_source = source_dict["fin_state_comment"].get()
+            if fin_state_comment_source is not None:
+                deprec_cost = self.dart_crawl_target(rcp_no,
+                            fin_state_comment_source, None, "deprec_cost",
+                            source_name="finstate_comment")
+
+            # "사업의 내용" when "주석" or "부속명세서" does not exist
             if deprec_cost is None:
-                # if "재무제표 주석" or "부속명세서" exists
-                if fin_state_comment_source is not None:
-                    deprec_cost = self.dart_crawl_target(rcp_no,
-                                fin_state_comment_source, None, "deprec_cost",
-                                source_name="finstate_comment")
-
-                # "사업의 내용" when "주석" or "부속명세서" does not exist
-                if deprec_cost is None and fin_state_summary_source is not None:
-                    deprec_cost = self.dart_crawl_target(rcp_no,
-                                fin_state_summary_source,
-                                fin_state_summary_unit, "deprec_cost",
-                                source_name="finstate_summary")
-            if deprec_cost is None:
-                deprec_cost_list.append("")
+                fin_state_summary_source, fin_state_summary_unit = \
+                    source_dict["finstate_summary"].get()
+            if deprec_cost is None and fin_state_summary_source is not None:
+                deprec_cost = self.dart_crawl_target(rcp_no,
+                            fin_state_summary_source,
+                            fin_state_summary_unit, "deprec_cost",
+                            source_name="finstate_summary")
+        if self.debug:
+             print("processed data - deprec_cost: %s" % deprec_cost)
+        return deprec_cost
+
+    def read_raw_fin_data(self):
+        """ This function reads the raw_fin_data (raw_fin_data_yr) table of
+            the company
+            @return - dictionary of period: dictionary of target: value
+        """
+        # name of targets in fin_dict for columns of raw_fin_data table
+        column_dict = {"stock_num": "stock_num", "curr_asset": "curr_asset",
+                       "noncurr_asset": "noncurr_asset",
+                       "total_asset": "total_asset",
+                       "curr_liab": "curr_liabilities",
+                       "noncurr_liab": "noncurr_liabilities",
+                       "total_liab": "total_liabilities", "equity": "equity",
+                       "net_income": "net_income", "deprec_cost": "deprec_cost"}
+        # columns are read by name in every format
+        value_dict, mask_dict = finStore.read_table(self.stock_code,
+                                    self.raw_table_name, self.file_format,
+                                    column_list=["period"] + list(column_dict))
+        str_dict = {column: finStore.column_to_str(value_dict[column],
+                                                   mask_dict[column])
+                    for column in column_dict}
+        stored_dict = {}
+        for idx, period in enumerate(value_dict["period"]):
+            stored_dict[period] = {target: str_dict[column][idx]
+                                   for column, target in column_dict.items()}
+        print("Read %d periods from %s_%s" % (len(stored_dict),
+                                              self.raw_table_name,
+                                              self.stock_code))
+        return stored_dict
+
+    def get_recrawl_dict(self, stored_dict, crawl_period_set,
+                         report_target_list):
+        """ This function finds the stored periods whose net_income or
+            deprec_cost accumulated in the year cannot be rebuilt from the
+            stored values for each quarter, i.e. a stored value is blank or
+            the quarters before it in the year are not all known
+            Every report of such a year is crawled again for the target, so
+            that the values are the same as crawling every report
+            @param crawl_period_set - periods whose reports are crawled
+            @param report_target_list - report targets crawled for them
+            @return - dictionary of period: list of targets to crawl again
+        """
+        recrawl_dict = {}
+        for target in ["net_income", "deprec_cost"]:
+            yr_set = set()
+            valid, prev_period = False, None
+            for period in self.fin_period_list:
+                if period in crawl_period_set and target in report_target_list:
+                    # accumulated value is crawled from the report
+                    valid = True
+                else:
+                    yr, quarter = period.split('-')
+                    chained = quarter == '1' or (valid and prev_period
+                                        == "%s-%d" % (yr, int(quarter) - 1))
+                    try:
+                        int(stored_dict[period][target])
+                        valid = chained
+                    except (KeyError, ValueError, TypeError):
+                        valid = False
+                    if not valid:
+                        yr_set.add(yr)
+                prev_period = period
+            for period in self.fin_period_list:
+                if period[:4] in yr_set:
+                    recrawl_dict.setdefault(period, []).append(target)
+        return recrawl_dict
+
+    def dart_crawl(self, update=False, debug=False, debug_list=[], max_workers=8,
+                   executor=None, field_list=None):
+        """ This function crawls all the necessary data from DART
+            Pages of the reports are downloaded by max_workers threads
+            while the downloaded reports are parsed in the order of
+            fin_period_list
+            In offline mode archived reports are parsed without downloading
+            @param update - crawls only the reports whose period is not in
+                            raw_fin_data table and merges them with the
+                            data in the file
+            @param debug - whether to turn on debug mode
+            @param debug_list - list of rcp_no's to crawl
+            @param max_workers - number of threads downloading pages
+                                 requests per host are limited by
+                                 webClient.rate_limiter
+            @param executor - process pool made by get_reparse_executor
+                              that parses archived reports in offline mode,
+                              reports are parsed in this process if None
+            @param field_list - ratios or raw columns to crawl, only the
+                                report pages, statements and price pages they
+                                need are read, and the other columns are
+                                taken from raw_fin_data and stock_data tables
+                                (empty if not stored), every column if None
+        """
+        debug_rcp_no_list = debug_list
+        report_target_list, price_needed = self.get_report_target_list(
+                                                                field_list)
+
+        target_list = ["stock_num", "curr_asset", "noncurr_asset", "total_asset",
+                       "curr_liabilities", "noncurr_liabilities",
+                       "total_liabilities", "equity", "net_income",
+                       "deprec_cost"]
+        self.fin_dict = {"period": self.fin_period_list}
+        for target in target_list:
+            self.fin_dict[target] = []
+        
+        if self.offline or not price_needed:
+            if finStore.table_exists(self.stock_code, self.stock_table_name,
+                                     self.file_format):
+                self.stock_price_crawl(read_data=True)
             else:
-                deprec_cost_list.append(deprec_cost)
-            if self.debug:
-                 print("processed data - deprec_cost: %s" % deprec_cost)
+                assert not price_needed, \
+                    "stock_data of %s is needed in offline mode" % self.stock_code
+                blank_list = [""] * len(self.fin_period_list)
+                self.stock_price_mean_list = list(blank_list)
+                self.stock_price_median_list = list(blank_list)
+                self.stock_price_max_list = list(blank_list)
+                self.stock_price_min_list = list(blank_list)
+                self.stock_price_stdev_list = list(blank_list)
+        else:
+            if finStore.table_exists(self.stock_code, self.stock_table_name,
+                                     self.file_format):
+                price_data_write, read_csv = False, True
+            else:
+                price_data_write, read_csv = True, False
+            if finStore.table_exists(self.stock_code, "raw_stock_data",
+                                     self.file_format):
+                price_raw_write = False
+            else:
+                price_raw_write = True
+            # prices can be updated when both raw and processed data exist
+            price_update = update and not price_data_write and not price_raw_write
+            self.stock_price_crawl(read_data=read_csv,
+                                   write_data=price_data_write,
+                                   write_raw=price_raw_write,
+                                   update=price_update);
+        
+        # stored data is needed for the periods or targets not crawled
+        partial = len(report_target_list) < len(self.REPORT_TARGET_LIST)
+        stored_dict = {}
+        if (update or partial) and not debug and finStore.table_exists(
+                self.stock_code, self.raw_table_name, self.file_format):
+            stored_dict = self.read_raw_fin_data()
+        
+        self.debug = debug
+        # targets to crawl again for the stored periods whose values
+        # accumulated in the year cannot be rebuilt
+        recrawl_dict = {}
+        if debug:
+            rcp_iter_list = debug_rcp_no_list
+        else:
+            crawl_period_set = {period for period in self.fin_period_list
+                                if not update or period not in stored_dict}
+            if len(stored_dict) != 0 and self.data_target == 1:
+                recrawl_dict = self.get_recrawl_dict(stored_dict,
+                                                     crawl_period_set,
+                                                     report_target_list)
+            rcp_iter_list = [rcp_no for rcp_no, period
+                             in zip(self.rcp_no_list, self.fin_period_list)
+                             if period in crawl_period_set
+                             or period in recrawl_dict]
+            if update:
+                print("%d of %d reports to update" % (len(rcp_iter_list),
+                                                      len(self.rcp_no_list)))
+        period_dict = dict(zip(self.rcp_no_list, self.fin_period_list))
+        iter_target_list = [report_target_list + [target for target
+                            in recrawl_dict.get(period_dict.get(rcp_no), [])
+                            if target not in report_target_list]
+                            for rcp_no in rcp_iter_list]
+        
+        report_dict_list = []
+        if self.offline and executor is not None:
+            # reports are parsed in parallel and collected in period order
+            report_num = len(rcp_iter_list)
+            report_dict_list = list(executor.map(reparse_report,
+                                    [self.stock_code] * report_num,
+                                    rcp_iter_list, [debug] * report_num,
+                                    iter_target_list))
+        elif self.offline:
+            for rcp_no, iter_target in zip(rcp_iter_list, iter_target_list):
+                report_dict_list.append(self.dart_crawl_report(rcp_no,
+                                                               iter_target))
+        else:
+            # reports whose deprec_cost waits for the comment page loaded by
+            # the pool while the next reports are parsed, at most max_workers
+            # reports are kept waiting to bound the parsed pages in memory
+            pending_list = []
+            with ThreadPoolExecutor(max_workers=max_workers) as thread_executor:
+                # map yields in the order of rcp_iter_list as soon as each
+                # report has been downloaded
+                for rcp_no, iter_target in zip(thread_executor.map(
+                        self.prefetch_report, rcp_iter_list, iter_target_list),
+                        iter_target_list):
+                    report_dict = self.dart_crawl_report(rcp_no, iter_target,
+                                                executor=thread_executor)
+                    report_dict_list.append(report_dict)
+                    if isinstance(report_dict.get("deprec_cost"), LazySource):
+                        # the next report resets the warnings before this
+                        # one is resolved
+                        pending_list.append((report_dict,
+                                             self.get_warning_state()))
+                        if len(pending_list) > max_workers:
+                            self.resolve_report(*pending_list.pop(0))
+                for report_dict, warning_state in pending_list:
+                    self.resolve_report(report_dict, warning_state)
+        
+        if len(stored_dict) == 0:
+            for report_dict in report_dict_list:
+                for target in target_list:
+                    self.fin_dict[target].append(report_dict.get(target, ""))
+        else:
+            # merge the crawled reports with the stored data in period order
+            crawled_dict = {period_dict[rcp_no]: report_dict for rcp_no,
+                            report_dict in zip(rcp_iter_list, report_dict_list)}
+            prev_period = None
+            for period in self.fin_period_list:
+                report_dict = crawled_dict.get(period, {})
+                stored_report_dict = stored_dict.get(period)
+                for target in target_list:
+                    if target in report_dict:
+                        value = report_dict[target]
+                    elif stored_report_dict is not None:
+                        value = stored_report_dict[target]
+                        # income and deprec_cost are stored as values for the
+                        # quarter, but fin_dict needs values accumulated
+                        # in the year
+                        if self.data_target == 1 and \
+                           target in ["net_income", "deprec_cost"]:
+                            value = finData.accumulate_value(period, value,
+                                prev_period,
+                                self.fin_dict[target][-1] if prev_period else None)
+                    else:
+                        value = ""
+                    self.fin_dict[target].append(value)
+                prev_period = period
             
-        self.fin_dict = {"period": self.fin_period_list,
-                         "curr_asset": curr_asset_list,
-                         "noncurr_asset": noncurr_asset_list,
-                         "total_asset": total_asset_list,
-                         "curr_liabilities": curr_liab_list,
-                         "noncurr_liabilities": noncurr_liab_list,
-                         "total_liabilities": total_liab_list,
-                         "equity": equity_list,
-                         "net_income": net_income_list,
-                         "deprec_cost": deprec_cost_list,
-                         "stock_num": stock_num_list,
-                         "stock_price_mean": self.stock_price_mean_list,
-                         "stock_price_median": self.stock_price_median_list,
-                         "stock_price_max": self.stock_price_max_list,
-                         "stock_price_min": self.stock_price_min_list,
-                         "stock_price_stdev": self.stock_price_stdev_list,
-                         }
+        self.fin_dict["stock_price_mean"] = self.stock_price_mean_list
+        self.fin_dict["stock_price_median"] = self.stock_price_median_list
+        self.fin_dict["stock_price_max"] = self.stock_price_max_list
+        self.fin_dict["stock_price_min"] = self.stock_price_min_list
+        self.fin_dict["stock_price_stdev"] = self.stock_price_stdev_list
         
-    def set_fin_data(self, read_fin_csv=False, debug=False, debug_list=[]):
-        """ This function sets processed financial data using crawled data """
+    def set_fin_data(self, read_fin_csv=False, update=False, debug=False,
+                     debug_list=[], executor=None, field_list=None):
+        """ This function sets processed financial data using crawled data
+            @param update - crawls only the reports not in raw_fin_data
+            @param executor - process pool parsing archived reports
+                              in offline mode (see dart_crawl)
+            @param field_list - ratios or raw columns to crawl (see dart_crawl)
+        """
         if not read_fin_csv:
-            self.dart_crawl(debug=debug, debug_list=debug_list)
+            self.dart_crawl(update=update, debug=debug, debug_list=debug_list,
+                            executor=executor, field_list=field_list)
         else:
             self.fin_dict = None
         self.fin_data = finData.FinancialData(self.stock_code, self.fin_dict,
-                                              read_csv=read_fin_csv)
+                                              data_target=self.data_target,
+                                              read_csv=read_fin_csv,
+                                              file_format=self.file_format)
         return self.fin_data
 
 
+# archive opened in each process of the pool made by get_reparse_executor
+worker_archive = None
+
+def init_reparse_worker(archive_dir):
+    """ This function opens the archive in a process parsing archived reports
+    """
+    global worker_archive
+    worker_archive = htmlArchive.HtmlArchive(archive_dir)
+
+def reparse_report(stock_code, rcp_no, debug=False, target_list=None):
+    """ This function parses the archived pages of input rcp_no in a process
+        of the pool made by get_reparse_executor
+        @param target_list - report targets to parse, every target if None
+        @return - dictionary of target name: value
+    """
+    company_data = CompanyData(stock_code, rcp_no_list=[], fin_period_list=[],
+                               archive=worker_archive, offline=True)
+    company_data.debug = debug
+    return company_data.dart_crawl_report(rcp_no, target_list)
+
+def get_reparse_executor(max_workers=None, archive_dir=htmlArchive.ARCHIVE_DIR):
+    """ This function makes the process pool parsing archived reports
+        @param max_workers - number of processes, the number of cores if None
+    """
+    return ProcessPoolExecutor(max_workers=max_workers,
+                               initializer=init_reparse_worker,
+                               initargs=(archive_dir,))
+
+def crawl_company(stock_code, read_fin_csv=False, update=False, debug=False,
+                  debug_list=[], file_format="csv", archive=None, offline=False,
+                  executor=None, field_list=None, data_target=1):
+    """ This function crawls data of the input stock_code and writes
+        raw financial data and financial ratios of the company
+        @param update - crawls only the reports not in raw_fin_data
+        @param field_list - ratios or raw columns to crawl, the other columns
+                            are kept from the stored tables, all if None
+        @param data_target - 1 for quarterly data, 2 for yearly data only
+                             (사업보고서) written to the "_yr" tables
+        @param file_format - format of the tables (finStore.FORMAT_LIST)
+        @param archive - htmlArchive.HtmlArchive for DART pages or None
+        @param offline - re-parses archived reports without downloading
+        @param executor - process pool parsing archived reports in offline mode
+        @return - FinancialData object of the company
+    """
+    company_data = CompanyData(stock_code, data_target=data_target,
+                               file_format=file_format, archive=archive,
+                               offline=offline)
+    company_fin_data = company_data.set_fin_data(read_fin_csv=read_fin_csv,
+                                    update=update, debug=debug,
+                                    debug_list=debug_list, executor=executor,
+                                    field_list=field_list)
+    if not read_fin_csv:
+        company_fin_data.write_raw_fin_data()
+    company_fin_data.get_fin_data()
+    company_fin_data.write_fin_data()
+    return company_fin_data
+
+def batch_crawl(stock_code_list, max_workers=4, read_fin_csv=False,
+                update=False, file_format="csv", archive=None, offline=False,
+                executor=None, field_list=None, data_target=1):
+    """ This function crawls data of the companies in stock_code_list
+        with max_workers companies processed at the same time
+        All workers share the connections and rate limiter of webClient,
+        and the failure of a company does not stop the others
+        @param archive - htmlArchive.HtmlArchive shared by all workers or None
+        @param offline, executor - re-parse archived reports (see crawl_company)
+        @param field_list - ratios or raw columns to crawl (see crawl_company)
+        @param data_target - 1 for quarterly data, 2 for yearly data only
+        @return - list of stock codes that failed
+    """
+    failed_list = []
+    total_cnt = len(stock_code_list)
+    with ThreadPoolExecutor(max_workers=max_workers) as thread_executor:
+        future_dict = {thread_executor.submit(crawl_company, stock_code,
+                                       read_fin_csv=read_fin_csv,
+                                       update=update,
+                                       file_format=file_format,
+                                       archive=archive, offline=offline,
+                                       executor=executor,
+                                       field_list=field_list,
+                                       data_target=data_target): stock_code
+                       for stock_code in stock_code_list}
+        for done_cnt, future in enumerate(as_completed(future_dict), 1):
+            stock_code = future_dict[future]
+            try:
+                future.result()
+                print("[%d/%d] finished code %s" % (done_cnt, total_cnt, stock_code))
+            except Exception:
+                failed_list.append(stock_code)
+                print("[%d/%d] warning - failed code %s" % (done_cnt, total_cnt,
+                                                            stock_code))
+                traceback.print_exc()
+    print("%d of %d companies failed" % (len(failed_list), total_cnt))
+    webClient.client.print_connection_stats()
+    return failed_list
+
+def batch_reparse(stock_code_list, max_workers=4, max_processes=None,
+                  file_format="csv", archive_dir=htmlArchive.ARCHIVE_DIR,
+                  field_list=None, data_target=1):
+    """ This function rebuilds raw financial data and financial ratios of the
+        companies by parsing archived reports again, e.g. after a parser fix
+        Reports of max_workers companies are parsed by one process pool
+        so that parsing scales with the number of cores
+        @param max_processes - number of parsing processes,
+                               the number of cores if None
+        @param field_list - ratios or raw columns to parse (see crawl_company)
+        @param data_target - 1 for quarterly data, 2 for yearly data only
+        @return - list of stock codes that failed
+    """
+    archive = htmlArchive.HtmlArchive(archive_dir)
+    with get_reparse_executor(max_processes, archive_dir) as executor:
+        return batch_crawl(stock_code_list, max_workers=max_workers,
+                           file_format=file_format, archive=archive,
+                           offline=True, executor=executor,
+                           field_list=field_list, data_target=data_target)
+
+def read_stock_codes(filename):
+    """ This function reads the list of stock codes from the input file
+        Codes are separated by whitespace or comma, and lines starting
+        with '#' are ignored
+    """
+    stock_code_list = []
+    with open(filename, 'r') as code_file:
+        for line in code_file:
+            if line.strip().startswith('#'):
+                continue
+            stock_code_list += line.replace(',', ' ').split()
+    return stock_code_list
+
+
 if __name__ == "__main__":
     start_time = time.time()
     # add debug mode and read mode
     parser = argparse.ArgumentParser(description="Choose option for the program.")
     parser.add_argument('-debug', action="store_true")
     parser.add_argument('-read', action="store_true")
-    debug_mode = vars(parser.parse_args())["debug"]
-    read_fin_csv = vars(parser.parse_args())["read"]
+    parser.add_argument('-update', action="store_true",
+                        help="crawl only reports not in raw_fin_data")
+    parser.add_argument('-codes', nargs='+', default=[],
+                        help="stock codes to crawl")
+    parser.add_argument('-code_file', help="file containing stock codes to crawl")
+    parser.add_argument('-workers', type=int, default=4,
+                        help="number of companies crawled at the same time")
+    parser.add_argument('-format', default="csv", choices=finStore.FORMAT_LIST,
+                        help="format of the stored tables")
+    parser.add_argument('-archive', action="store_true",
+                        help="read DART pages from and add them to the archive")
+    parser.add_argument('-reparse', action="store_true",
+                        help="parse archived reports again without downloading")
+    parser.add_argument('-processes', type=int, default=None,
+                        help="number of processes parsing archived reports")
+    parser.add_argument('-fields', nargs='+', default=None,
+                        help="ratios or raw columns to crawl e.g. pbr, "
+                             "the other columns are kept from stored data")
+    parser.add_argument('-yearly', action="store_true",
+                        help="crawl only 사업보고서 into the yearly tables")
+    args = vars(parser.parse_args())
+    debug_mode = args["debug"]
+    read_fin_csv = args["read"]
+    update_mode = args["update"]
+    data_target = 2 if args["yearly"] else 1
     
-    company_data = CompanyData("002140")
-    debug_list = ['20161111000236']
-    company_fin_data = company_data.set_fin_data(read_fin_csv=read_fin_csv,
-                                    debug=debug_mode, debug_list=debug_list)
-    if not read_fin_csv:
-        company_fin_data.write_raw_fin_data()
-    company_fin_data.get_fin_data()
-    company_fin_data.write_fin_data()
+    stock_code_list = list(args["codes"])
+    if args["code_file"] is not None:
+        stock_code_list += read_stock_codes(args["code_file"])
+    if len(stock_code_list) == 0:
+        stock_code_list = ["002140"]
+    archive = htmlArchive.HtmlArchive() if args["archive"] else None
+    
+    if args["reparse"]:
+        batch_reparse(stock_code_list, max_workers=args["workers"],
+                      max_processes=args["processes"],
+                      file_format=args["format"], field_list=args["fields"],
+                      data_target=data_target)
+    elif debug_mode:
+        debug_list = ['20161111000236']
+        crawl_company(stock_code_list[0], read_fin_csv=read_fin_csv,
+                      update=update_mode, debug=debug_mode, debug_list=debug_list,
+                      file_format=args["format"], archive=archive,
+                      field_list=args["fields"], data_target=data_target)
+    else:
+        batch_crawl(stock_code_list, max_workers=args["workers"],
+                    read_fin_csv=read_fin_csv, update=update_mode,
+                    file_format=args["format"], archive=archive,
+                    field_list=args["fields"], data_target=data_target)
 
-    print("Elapsed time: %s" % (time.time() - start_time))
\ No newline at end of file
+    print("Elapsed time: %s" % (time.time() - start_time))
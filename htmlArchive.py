@@ -0,0 +1,138 @@
+#-*- coding:utf-8 -*-
+
+import os
+import zlib
+import threading
+
+# archive under ~/workspace/data/archive directory
+HOME_DIR = os.path.join(os.path.expanduser("~"), "workspace")
+DATA_DIR = os.path.join(HOME_DIR, "data")
+ARCHIVE_DIR = os.path.join(DATA_DIR, "archive")
+INDEX_NAME = "index.tsv"
+SEGMENT_FORMAT = "segment_%05d.dat"
+# a new segment is started when the last one exceeds this size in bytes
+SEGMENT_SIZE = 256 * 1024 * 1024
+# section name of main.do (index page of a report) in the archive,
+# the other pages are named by the keys of utils.page_pattern
+MAIN_SECTION = "main"
+# section of the report list of a company searched at DART, archived under
+# the stock code instead of rcp_no so that reports are re-parsed offline
+REPORT_LIST_SECTION = "report_list"
+
+class HtmlArchive:
+    """ This class keeps every downloaded DART page in append-only segments
+        Each page is compressed separately and appended to the last segment,
+        then (segment, offset, length) of the page is appended to the index
+        file under (rcp_no, section), so that any page is read with one read
+        Pages of a filed report never change, so a page is stored only once,
+        while an entry put with replace is appended again and the last one
+        is used
+        Only one process should write to an archive at a time
+    """
+
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        """ Initializes HtmlArchive object, loading the index of archive_dir
+            @param archive_dir - directory of segments and index file
+        """
+        self.archive_dir = archive_dir
+        if not os.path.isdir(archive_dir):
+            os.makedirs(archive_dir, exist_ok=True)
+        self.index_path = os.path.join(archive_dir, INDEX_NAME)
+        # (rcp_no, section): (segment number, offset, length)
+        self.index_dict = {}
+        self.fd_dict = {} # segment number: file descriptor for reading
+        self.lock = threading.Lock()
+        self.load_index()
+        segment_no_list = [segment_no for segment_no, _, _
+                           in self.index_dict.values()]
+        self.segment_no = max(segment_no_list + [0])
+
+    def get_segment_path(self, segment_no):
+        """ This function returns the path of the segment file """
+        return os.path.join(self.archive_dir, SEGMENT_FORMAT % segment_no)
+
+    def load_index(self):
+        """ This function reads the index file
+            A last line cut by an interrupted write is removed so that
+            the next entry starts on its own line
+        """
+        if not os.path.isfile(self.index_path):
+            return
+        valid_size = 0
+        with open(self.index_path, 'r', newline='\n') as index_file:
+            for line in index_file:
+                if not line.endswith('\n'):
+                    break
+                valid_size += len(line.encode('utf-8'))
+                field_list = line.rstrip('\n').split('\t')
+                if len(field_list) != 5:
+                    continue
+                rcp_no, section, segment_no, offset, length = field_list
+                self.index_dict[(rcp_no, section)] = (int(segment_no),
+                                                      int(offset), int(length))
+        if valid_size < os.path.getsize(self.index_path):
+            with open(self.index_path, 'r+b') as index_file:
+                index_file.truncate(valid_size)
+
+    def contains(self, rcp_no, section):
+        """ This function checks whether the page is archived """
+        return (rcp_no, section) in self.index_dict
+
+    def get_section_list(self, rcp_no):
+        """ This function returns the archived sections of the report """
+        return [section for key_rcp_no, section in self.index_dict
+                if key_rcp_no == rcp_no]
+
+    def get(self, rcp_no, section):
+        """ This function reads the archived page
+            @param section - section name of utils.page_pattern or MAIN_SECTION
+            @return - html in bytes, None if not archived
+        """
+        location = self.index_dict.get((rcp_no, section))
+        if location is None:
+            return None
+        segment_no, offset, length = location
+        fd = self.fd_dict.get(segment_no)
+        if fd is None:
+            with self.lock:
+                if segment_no not in self.fd_dict:
+                    self.fd_dict[segment_no] = os.open(
+                        self.get_segment_path(segment_no), os.O_RDONLY)
+                fd = self.fd_dict[segment_no]
+        # pread does not move the file offset, so threads share descriptors
+        return zlib.decompress(os.pread(fd, length, offset))
+
+    def put(self, rcp_no, section, content, replace=False):
+        """ This function appends the page to the archive
+            The page is written to the segment before the index, so the index
+            never points to data that has not been written
+            @param content - html in bytes
+            @param replace - appends the page even if archived e.g. for the
+                             report list that grows over time
+        """
+        if self.contains(rcp_no, section) and not replace:
+            return
+        data = zlib.compress(content)
+        with self.lock:
+            if self.contains(rcp_no, section) and not replace:
+                return
+            segment_path = self.get_segment_path(self.segment_no)
+            if os.path.isfile(segment_path) and \
+               os.path.getsize(segment_path) >= SEGMENT_SIZE:
+                self.segment_no += 1
+                segment_path = self.get_segment_path(self.segment_no)
+            with open(segment_path, 'ab') as segment_file:
+                offset = segment_file.tell()
+                segment_file.write(data)
+            with open(self.index_path, 'a', newline='\n') as index_file:
+                index_file.write("%s\t%s\t%d\t%d\t%d\n" % (rcp_no, section,
+                                 self.segment_no, offset, len(data)))
+            self.index_dict[(rcp_no, section)] = (self.segment_no, offset,
+                                                  len(data))
+
+    def close(self):
+        """ This function closes the file descriptors of segments """
+        with self.lock:
+            for fd in self.fd_dict.values():
+                os.close(fd)
+            self.fd_dict = {}
@@ -0,0 +1,147 @@
+#-*- coding:utf-8 -*-
+
+import os
+import json
+import hashlib
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+import get_findata
+import utils
+import webClient
+
+MANIFEST_NAME = "manifest.json"
+
+def record_reports(company_data, rcp_no_list, fixture_dir):
+    """ This function saves main.do and every section page (viewer.do) of the
+        reports, and the first page of daily prices, so that they can be
+        replayed without network
+        @param company_data - CompanyData object of the company
+        @param rcp_no_list - list of rcp_no's to record
+        @param fixture_dir - directory to save the pages
+    """
+    page_dir = os.path.join(fixture_dir, "pages")
+    if not os.path.isdir(page_dir):
+        os.makedirs(page_dir)
+    period_dict = dict(zip(company_data.rcp_no_list, company_data.fin_period_list))
+    manifest = {"stock_code": company_data.stock_code, "reports": [],
+                "pages": {}}
+    for rcp_no in rcp_no_list:
+        url_list = ["http://dart.fss.or.kr/dsaf001/main.do?rcpNo=" + rcp_no]
+        report_index = company_data.get_report_index(rcp_no)
+        for target in utils.page_pattern:
+            url = report_index.get_url(target)
+            if url is not None and url not in url_list:
+                url_list.append(url)
+        for url in url_list:
+            content = webClient.fetch(url)
+            filename = hashlib.sha1(url.encode('utf-8')).hexdigest() + ".html"
+            with open(os.path.join(page_dir, filename), 'wb') as page_file:
+                page_file.write(content)
+            manifest["pages"][url] = filename
+        manifest["reports"].append({"rcp_no": rcp_no,
+                                    "period": period_dict.get(rcp_no)})
+        print("Recorded rcp %s (%d pages)" % (rcp_no, len(url_list)))
+    # the first page of daily prices, with and without page number
+    price_url = company_data.PRICE_URL + company_data.stock_code
+    for url in [price_url, price_url + "&page=1"]:
+        content = webClient.fetch(url)
+        filename = hashlib.sha1(url.encode('utf-8')).hexdigest() + ".html"
+        with open(os.path.join(page_dir, filename), 'wb') as page_file:
+            page_file.write(content)
+        manifest["pages"][url] = filename
+    manifest["price_url"] = price_url
+    print("Recorded price page of code %s" % company_data.stock_code)
+    with open(os.path.join(fixture_dir, MANIFEST_NAME), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+
+class ReplayAdapter(BaseAdapter):
+    """ This class is a transport of requests that serves recorded pages
+        instead of sending requests, pages not recorded get 404 response
+    """
+
+    def __init__(self, fixture_dir):
+        """ Initializes ReplayAdapter object
+            @param fixture_dir - directory saved by record_reports
+        """
+        super().__init__()
+        self.page_dir = os.path.join(fixture_dir, "pages")
+        with open(os.path.join(fixture_dir, MANIFEST_NAME), 'r') as manifest_file:
+            self.page_dict = json.load(manifest_file)["pages"]
+
+    def send(self, request, **kwargs):
+        """ This function returns the recorded response of the request """
+        response = Response()
+        response.url = request.url
+        response.request = request
+        response.headers = CaseInsensitiveDict({"Content-Type": "text/html"})
+        response.encoding = 'utf-8'
+        filename = self.page_dict.get(request.url)
+        if filename is None:
+            response.status_code = 404
+            response._content = b""
+        else:
+            response.status_code = 200
+            with open(os.path.join(self.page_dir, filename), 'rb') as page_file:
+                response._content = page_file.read()
+        return response
+
+    def close(self):
+        pass
+
+def check_fixture(fixture_dir):
+    """ This function checks that every page replayed for the fixture was
+        recorded, i.e. main.do and every section page of each report and the
+        price page, so that no check is skipped for a missing page
+        AssertionError listing the missing pages is raised if not
+    """
+    manifest_path = os.path.join(fixture_dir, MANIFEST_NAME)
+    assert os.path.isfile(manifest_path), \
+        "%s not found, record the fixture with -record first" % manifest_path
+    with open(manifest_path, 'r') as manifest_file:
+        manifest = json.load(manifest_file)
+    page_dict = manifest["pages"]
+    assert len(manifest["reports"]) != 0, "no report in %s" % manifest_path
+    url_list = []
+    for report in manifest["reports"]:
+        main_url = get_findata.ReportIndex.main_url + report["rcp_no"]
+        url_list.append(main_url)
+        if main_url in page_dict:
+            with open(os.path.join(fixture_dir, "pages", page_dict[main_url]),
+                      'rb') as page_file:
+                page_html = page_file.read().decode('utf-8')
+            url_list += [url for url in get_findata.ReportIndex.parse_index(
+                         page_html).values() if url is not None]
+    assert "price_url" in manifest, "no price page in %s" % manifest_path
+    url_list += [manifest["price_url"], manifest["price_url"] + "&page=1"]
+    missing_list = [url for url in url_list if url not in page_dict or
+                    not os.path.isfile(os.path.join(fixture_dir, "pages",
+                                                    page_dict[url]))]
+    assert len(missing_list) == 0, "pages not recorded in %s: %s" % (
+        fixture_dir, ", ".join(missing_list))
+    return manifest
+
+def install_replay(fixture_dir):
+    """ This function makes webClient serve recorded pages of fixture_dir
+        Response cache and rate limit are turned off so that every request
+        reaches the recorded pages
+    """
+    adapter = ReplayAdapter(fixture_dir)
+    webClient.client.session.mount("http://", adapter)
+    webClient.client.session.mount("https://", adapter)
+    webClient.cache = None
+    webClient.rate_limiter.default_rate = None
+
+def load_company(fixture_dir):
+    """ This function creates CompanyData of the recorded reports
+        without searching DART
+    """
+    with open(os.path.join(fixture_dir, MANIFEST_NAME), 'r') as manifest_file:
+        manifest = json.load(manifest_file)
+    rcp_no_list = [report["rcp_no"] for report in manifest["reports"]]
+    fin_period_list = [report["period"] for report in manifest["reports"]]
+    return get_findata.CompanyData(manifest["stock_code"],
+                                   rcp_no_list=rcp_no_list,
+                                   fin_period_list=fin_period_list)
@@ -1,20 +1,51 @@
 #-*- coding:utf-8 -*-
 import re
-import requests
 from statistics import mean
 from statistics import median
 from statistics import pstdev
 from statistics import stdev
 
+from bs4 import BeautifulSoup
+
+import webClient
+
+# BeautifulSoup backend used by make_soup
+# lxml is much faster than the pure python html.parser on large DART pages
+# and gives the same outputs on the fixtures (benchmark.py)
+# it closes an unclosed <p> before a <table>, which html.parser nests in the
+# <p>, so that the table is a sibling of the <p> as the parse functions expect
+try:
+    import lxml
+    HTML_PARSER = "lxml"
+except ImportError: # lxml is not installed
+    HTML_PARSER = "html.parser"
+
 def url_exists(url):
     """ This function checks whether the input url exists """
-    request = requests.get(url)
+    request = webClient.client.get(url)
     if request.status_code == 200:
         exist = True
     else:
         exist = False
     return exist
 
+def set_html_parser(parser):
+    """ This function sets the BeautifulSoup backend used by make_soup
+        @param parser - "lxml", "html.parser" or any backend BeautifulSoup
+                        supports
+    """
+    global HTML_PARSER
+    HTML_PARSER = parser
+
+def make_soup(page_html, parser=None, encoding=None):
+    """ This function parses the input html with the selected backend
+        @param parser - backend to use, HTML_PARSER if None
+        @param encoding - encoding of page_html in bytes, detected if None
+    """
+    if parser is None:
+        parser = HTML_PARSER
+    return BeautifulSoup(page_html, parser, from_encoding=encoding)
+
 def get_quarter(date):
     """ Determines the period of input date
         @param date - "YYYY.MM.DD"
@@ -23,19 +54,51 @@ def get_quarter(date):
     yr, mth, day = list(map(lambda x: int(x), date.split('.')))
     return "%d-%d" % (yr, (mth-1)/3 + 1)
     
+def get_year(date):
+    """ Determines the yearly period of input date
+        @param date - "YYYY.MM.DD"
+        @return - "YYYY-4" i.e. the period of 사업보고서 of the year
+    """
+    return "%s-4" % date.split('.')[0]
+
+def period_key(period):
+    """ Converts period into a key that can be compared in the order of time
+        @param period - "YYYY-quarter"
+        @return - (year, quarter) in int
+    """
+    yr, quarter = period.split('-')
+    return (int(yr), int(quarter))
+    
 def num_format(inputStr):
     """ This function removes possible elements of string to make it convertible
     to int """
     return inputStr.replace(',', '').replace(' ', '').replace('\n', '').replace("=", '')
 
+# old html tags that hinder crawling, removed in a single pass
+# (&nbsp; with whitespace around it, <BR/>, <SPAN ...>, </SPAN>)
+# <SPAN ...> may contain &nbsp; but not <BR/>, as if &nbsp; and <BR/> had
+# been replaced before <SPAN ...>
+format_pattern = re.compile(r'''\s*&nbsp;\s*|(?P<br><BR/>)
+                               |<SPAN(?:\s*&nbsp;\s*|(?!<BR/>).)*?>|</SPAN>''',
+                            re.VERBOSE)
+# utf-8 encoded whitespace that \s of str patterns matches
+utf8_space = (rb'(?:[\t-\r\x1c-\x20]|\xc2[\x85\xa0]|\xe1\x9a\x80'
+              rb'|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80)')
+utf8_nbsp = utf8_space + rb'*&nbsp;' + utf8_space + rb'*'
+format_pattern_bytes = re.compile(utf8_nbsp + rb'|(?P<br><BR/>)|<SPAN(?:'
+                                  + utf8_nbsp + rb'|(?!<BR/>).)*?>|</SPAN>')
+
 def format_page_html(page_html):
     """ This function remove some html tags of old formats that hinder crawling
+        @param page_html - html in str, or in bytes encoded in utf-8 so that
+                           the page does not need to be decoded first
+        @return - formatted html of the same type as page_html
     """
-    page_html = re.sub(r'\s*&nbsp;\s*','', page_html)
-    page_html = re.sub(r'<BR/>', '\n', page_html)
-    page_html = re.sub(r'<SPAN.*?>', '', page_html)
-    page_html = re.sub(r'</SPAN>', '', page_html)
-    return page_html
+    if isinstance(page_html, bytes):
+        return format_pattern_bytes.sub(
+            lambda match: b'\n' if match.lastgroup == "br" else b'', page_html)
+    return format_pattern.sub(
+        lambda match: '\n' if match.lastgroup == "br" else '', page_html)
 
 # list of patterns used to search DART data page
 page_pattern = {
@@ -108,6 +171,65 @@ target_pattern_list = {
     "cost_type": [r"\s비용의\s성격별"],
 }
 
+class TargetPattern:
+    """ This class holds the patterns of a target in target_pattern_list
+        compiled once, with all the patterns merged into a single alternation
+        whose named group p<i> tells that i-th pattern matched
+    """
+
+    def __init__(self, pattern_list):
+        """ Initializes TargetPattern object
+            @param pattern_list - list of patterns in order of priority
+        """
+        self.pattern_list = pattern_list
+        self.regex_list = [re.compile(pattern) for pattern in pattern_list]
+        self.merged_regex = re.compile("|".join("(?P<p%d>%s)" % (i, pattern)
+                                       for i, pattern in enumerate(pattern_list)))
+
+    def match_idx_list(self, text):
+        """ This function obtains the patterns found in text
+            Most texts match no pattern and are rejected by a single search
+            of the merged regex
+            @return - list of indices of patterns found in text
+        """
+        if text is None:
+            return []
+        match = self.merged_regex.search(text)
+        if match is None:
+            return []
+        first_idx = int(match.lastgroup[1:])
+        if len(self.regex_list) == 1:
+            return [first_idx]
+        # other patterns may also be found elsewhere in the text
+        return [i for i, regex in enumerate(self.regex_list)
+                if i == first_idx or regex.search(text) is not None]
+
+    def find_all(self, source, tag):
+        """ This function classifies the tag elements of source by pattern
+            in one scan, each element matches if its string contains the
+            pattern as in source.findAll(tag, text=re.compile(pattern))
+            @return - list whose i-th element is the list of tag elements
+                      matching i-th pattern in document order
+        """
+        found_list = [[] for _ in self.pattern_list]
+        for element in source.find_all(tag):
+            for idx in self.match_idx_list(element.string):
+                found_list[idx].append(element)
+        return found_list
+
+    def find(self, source, tag):
+        """ This function returns the first tag element of source matching
+            each pattern as in source.find(tag, text=re.compile(pattern))
+            @return - list whose i-th element is the element matching i-th
+                      pattern, None if there is no such element
+        """
+        return [element_list[0] if element_list else None
+                for element_list in self.find_all(source, tag)]
+
+# target_pattern_list compiled at import
+target_pattern = {target: TargetPattern(pattern_list)
+                  for target, pattern_list in target_pattern_list.items()}
+
 unit_convert = {
     "": "",
     "십": "0",
@@ -0,0 +1,215 @@
+#-*- coding:utf-8 -*-
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import zlib
+from urllib.parse import urlencode
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# time to live (seconds) of cached Naver Finance price pages
+# a filed DART report never changes, so DART pages never expire
+PRICE_TTL = 60 * 60 * 6
+# time to live (seconds) of cached DART search results, which grow as
+# new reports are filed
+SEARCH_TTL = 60 * 60 * 24
+# maximum number of requests per second sent to one host
+DEFAULT_RATE = 5
+# seconds to wait for establishing connection and for reading response
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+# number of retries for failed requests, waiting backoff * 2^n seconds
+RETRY_NUM = 3
+RETRY_BACKOFF = 0.5
+# maximum number of kept-alive connections per host
+POOL_SIZE = 32
+
+class ResponseCache:
+    """ This class manages the on-disk cache of http responses
+        Each response is stored compressed in a file named by the hash of url
+    """
+
+    def __init__(self, cache_dir):
+        """ Initializes ResponseCache object
+            @param cache_dir - directory to store cached responses
+        """
+        self.cache_dir = cache_dir
+
+    def get_path(self, url):
+        """ This function returns the file path of cached response for url """
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + ".z")
+
+    def get(self, url, ttl=None):
+        """ This function reads the cached response for url
+            @param ttl - time to live of the cached response in seconds
+                         the response never expires if None
+            @return - content of response in bytes
+                      None if not cached or expired
+        """
+        path = self.get_path(url)
+        try:
+            if ttl is not None and time.time() - os.path.getmtime(path) > ttl:
+                return None
+            with open(path, 'rb') as cache_file:
+                return zlib.decompress(cache_file.read())
+        except (OSError, zlib.error):
+            return None
+
+    def put(self, url, content):
+        """ This function writes the response for url to cache
+            @param content - content of response in bytes
+        """
+        path = self.get_path(url)
+        cache_dir = os.path.dirname(path)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        # write to temporary file first so that readers never see partial data
+        fd, temp_path = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(zlib.compress(content))
+        os.replace(temp_path, path)
+
+class RateLimiter:
+    """ This class limits the number of requests per second sent to each host
+        It is shared by all threads so that concurrent crawling stays polite
+    """
+
+    def __init__(self, default_rate=DEFAULT_RATE):
+        """ Initializes RateLimiter object
+            @param default_rate - requests per second for hosts without rate set
+                                  no limit if None
+        """
+        self.default_rate = default_rate
+        self.rate_dict = {} # host: requests per second
+        self.next_time_dict = {} # host: earliest time of the next request
+        self.lock = threading.Lock()
+
+    def set_rate(self, host, rate):
+        """ This function sets the rate of input host
+            @param rate - requests per second, no limit if None
+        """
+        with self.lock:
+            self.rate_dict[host] = rate
+
+    def wait(self, host):
+        """ This function blocks until a request to host is allowed """
+        with self.lock:
+            rate = self.rate_dict.get(host, self.default_rate)
+            if rate is None:
+                return
+            now = time.time()
+            # reserve the next slot for this request
+            request_time = max(now, self.next_time_dict.get(host, now))
+            self.next_time_dict[host] = request_time + 1.0 / rate
+        if request_time > now:
+            time.sleep(request_time - now)
+
+class HttpClient:
+    """ This class manages the http session shared by all modules
+        Connections are pooled and kept alive per host, gzip responses are
+        decoded, and failed requests are retried with backoff
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, retry_num=RETRY_NUM,
+                 retry_backoff=RETRY_BACKOFF):
+        """ Initializes HttpClient object
+            @param pool_size - maximum number of kept-alive connections per host
+            @param retry_num - number of retries for a failed request
+            @param retry_backoff - backoff factor of retries in seconds
+        """
+        retry = Retry(total=retry_num, backoff_factor=retry_backoff,
+                      status_forcelist=[500, 502, 503, 504],
+                      allowed_methods=["GET", "HEAD"])
+        self.adapter = HTTPAdapter(pool_connections=pool_size,
+                                   pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+        self.stats_dict = {} # host: [number of requests, seconds elapsed]
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None):
+        """ This function sends GET request to url through the pooled session
+            @return - requests.Response object
+        """
+        host = urlparse(url).netloc
+        start_time = time.time()
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        elapsed = time.time() - start_time
+        with self.lock:
+            host_stats = self.stats_dict.setdefault(host, [0, 0.0])
+            host_stats[0] += 1
+            host_stats[1] += elapsed
+        return response
+
+    def connection_stats(self):
+        """ This function returns the connection statistics of each host
+            @return - dictionary of host: {"requests", "connections", "reused",
+                      "elapsed"} where connections is the number of new
+                      connections (handshakes) and reused is the number of
+                      requests sent over kept-alive connections
+        """
+        conn_num_dict = {}
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = pool.host if pool.port in (None, 80, 443) else \
+                   "%s:%d" % (pool.host, pool.port)
+            conn_num_dict[host] = conn_num_dict.get(host, 0) + pool.num_connections
+        stats = {}
+        with self.lock:
+            for host, (request_num, elapsed) in self.stats_dict.items():
+                conn_num = conn_num_dict.get(host, 0)
+                stats[host] = {"requests": request_num, "connections": conn_num,
+                               "reused": request_num - conn_num,
+                               "elapsed": elapsed}
+        return stats
+
+    def print_connection_stats(self):
+        """ This function prints the connection statistics of each host """
+        for host, host_stats in self.connection_stats().items():
+            print("%s: %d requests, %d connections, %d reused, %.2fs elapsed" %
+                  (host, host_stats["requests"], host_stats["connections"],
+                   host_stats["reused"], host_stats["elapsed"]))
+
+# cache under ~/workspace/data directory
+HOME_DIR = os.path.join(os.path.expanduser("~"), "workspace")
+DATA_DIR = os.path.join(HOME_DIR, "data")
+cache = ResponseCache(os.path.join(DATA_DIR, "cache"))
+rate_limiter = RateLimiter()
+client = HttpClient()
+
+def fetch(url, params=None, ttl=None, use_cache=True):
+    """ This function returns the content of url, reading from cache if possible
+        @param params - dictionary of query parameters added to url
+        @param ttl - time to live of the cached response in seconds
+                     the response never expires if None
+        @param use_cache - whether to read and write cache
+                           cache is not used if webClient.cache is None
+        @return - content of response in bytes
+    """
+    if params:
+        url += ('&' if '?' in url else '?') + urlencode(params)
+    use_cache = use_cache and cache is not None
+    if use_cache:
+        content = cache.get(url, ttl)
+        if content is not None:
+            return content
+    rate_limiter.wait(urlparse(url).netloc)
+    response = client.get(url)
+    response.raise_for_status()
+    content = response.content
+    if use_cache:
+        cache.put(url, content)
+    return content